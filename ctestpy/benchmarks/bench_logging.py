@@ -0,0 +1,94 @@
+"""
+Benchmark the throughput of ctestpy's log output.
+
+Formats (and writes to ``os.devnull``) a large number of records with the
+formatter and handler configured by ``configure_logger``, with and without
+colours, and reports the number of records per second:
+
+.. code-block:: bash
+
+    $ python benchmarks/bench_logging.py --records 1000000
+"""
+import argparse
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+
+# Benchmarks run from a source checkout, without ctestpy being installed.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from ctestpy.logging import configure_logger  # noqa: E402
+
+DEFAULT_RECORDS = 1000000
+
+# Levels of the records, in the proportions of a typical test run.
+LEVELS = ("RUNNING", "INFO", "PASSED", "INFO", "DEBUG")
+
+
+def _records(count):
+    """
+    Return `count` records, created up front so only the output is timed.
+    """
+    logger = logging.getLogger("bench")
+    levels = [getattr(logging, name) for name in LEVELS]
+    return [
+        logger.makeRecord(
+            "bench", levels[index % len(levels)], __file__, 0,
+            "test_%d: %s", (index, "message"), None)
+        for index in range(count)]
+
+
+def _bench(records, colorise):
+    """
+    Return the records per second of the formatter alone, and of the handler
+    (formatting and writing).
+    """
+    with open(os.devnull, "w") as stream:
+        configure_logger(level=logging.DEBUG, stream=stream, colorise=colorise)
+        handler = logging.getLogger().handlers[-1]
+        formatter = handler.formatter
+        start = time.perf_counter()
+        for record in records:
+            formatter.format(record)
+        formatted = time.perf_counter() - start
+        start = time.perf_counter()
+        for record in records:
+            handler.handle(record)
+        handled = time.perf_counter() - start
+        configure_logger(stream=None)
+    return {
+        "format": len(records) / formatted,
+        "handle": len(records) / handled,
+    }
+
+
+def main():
+    """
+    Entry point, see ``--help``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--records", type=int, default=DEFAULT_RECORDS,
+        help="number of records to output")
+    parser.add_argument(
+        "--output", type=pathlib.Path, help="write the results as JSON")
+    args = parser.parse_args()
+
+    configure_logger(stream=None)
+    records = _records(args.records)
+    results = {}
+    print(f"{'colours':<8} {'format (records/s)':>20} {'handle (records/s)':>20}")
+    for colorise in (False, True):
+        result = results["colour" if colorise else "plain"] = _bench(records, colorise)
+        print(
+            f"{'yes' if colorise else 'no':<8} {result['format']:>20,.0f} "
+            f"{result['handle']:>20,.0f}")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
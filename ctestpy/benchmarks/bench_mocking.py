@@ -0,0 +1,70 @@
+"""
+Benchmark the cost of setting up and verifying mocks, as the size of the
+mocked header grows.
+
+Each run builds a code under test that calls three functions from a synthetic
+mock header, then times ``MockedMethods`` creation, setting expectations on
+the three mocks, calling the code under test and ``verify``. The build itself
+is not timed.
+
+Usage:
+
+.. code-block:: bash
+
+    $ python benchmarks/bench_mocking.py 100 1000 5000
+"""
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+from synthetic import write_cut
+
+# Benchmarks run from a source checkout, without ctestpy being installed.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from ctestpy.builder import CodeUnderTest, MockedMethods  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+REPEATS = 200
+
+
+def _bench_size(num_mocked):
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        sys.path.insert(0, directory)
+        try:
+            source, header, mock_header = write_cut(".", num_mocked)
+            cut = CodeUnderTest(pathlib.Path(source), pathlib.Path(header))
+            testing, mocking = cut.generate([pathlib.Path(mock_header)])
+            ffi = mocking._ffi
+            externs = mocking._methods
+            referenced = set(mocking.__dict__)
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                mocks = MockedMethods(ffi, externs, referenced)
+                for index in range(3):
+                    getattr(mocks, f"hal_fn_{index}").expect_and_return(
+                        1, index, retval=index)
+                testing.cut(1)
+                mocks.verify()
+            return (time.perf_counter() - start) / REPEATS
+        finally:
+            sys.path.remove(directory)
+            os.chdir(cwd)
+
+
+def main():
+    """
+    Entry point, arguments are the mock header sizes to benchmark.
+    """
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'functions':>10} {'setup+verify (us)':>18}")
+    for size in sizes:
+        print(f"{size:>10} {_bench_size(size) * 1e6:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
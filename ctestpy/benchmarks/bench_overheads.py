@@ -0,0 +1,301 @@
+"""
+Benchmark the overheads of ctestpy itself, as the size of the code under test
+grows.
+
+For each size a synthetic code under test is generated (see ``synthetic.py``)
+whose mock header declares that many functions, then the following stages are
+timed separately:
+
+    * preprocess: running the preprocessor over the source.
+    * index: looking up the headers in the (warm) header index.
+    * parse: parsing the whole preprocessed source with pycparser.
+    * function_list: discovering the local and external functions, parsing
+      only the code of the source file (``CodeUnderTest._functions``).
+    * build: generating the cdef, compiling and importing the module with
+      cffi (``CodeUnderTest._build``).
+    * mock_setup: creating the ``MockedMethods`` of a built module.
+    * mock_call: a call from the code under test into a mocked function.
+
+The per-test cost of ``TestSuite.run`` (a worker process per test method) is
+measured once, with a suite of trivial tests, as ``test_process``. The start
+up of the CLI is measured with a tree of such suites, as ``import`` (importing
+ctestpy in a fresh interpreter) and ``collect_only`` (``ctestpy
+--collect-only`` over all suites).
+
+All times are in seconds per operation. The results are written as JSON, which
+can be compared against the results of another commit:
+
+.. code-block:: bash
+
+    $ python benchmarks/bench_overheads.py --output before.json
+    $ git checkout my-branch
+    $ python benchmarks/bench_overheads.py --output after.json --compare before.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pycparser
+
+from synthetic import write_cut
+
+# Benchmarks run from a source checkout, without ctestpy being installed.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from ctestpy import index  # noqa: E402
+from ctestpy.builder import (  # noqa: E402
+    CodeUnderTest, MockedMethods, preprocess)
+from ctestpy.logging import _configure_custom_log_levels  # noqa: E402
+from ctestpy.test import TestSuite  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_REPEATS = 20
+DEFAULT_BUILD_REPEATS = 3
+DEFAULT_TESTS = 20
+DEFAULT_SUITES = 100
+MOCK_CALLS = 1000
+
+TRIVIAL_SUITE = "def test_{index}():\n    pass\n"
+
+
+def _measure(function, repeats, operations=1):
+    """
+    Call `function` `repeats` times, returns the timings per operation.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) / operations)
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "repeats": repeats,
+    }
+
+
+def _bench_mock_calls(testing, mocking):
+    """
+    Return a function which calls the code under test, with enough
+    expectations set for `MOCK_CALLS` calls to each mocked function.
+    """
+    def calls():
+        for index in range(3):
+            mock = getattr(mocking, f"hal_fn_{index}")
+            for _ in range(MOCK_CALLS):
+                mock.expect_and_return(1, index, retval=index)
+        start = time.perf_counter()
+        for _ in range(MOCK_CALLS):
+            testing.cut(1)
+        elapsed = time.perf_counter() - start
+        mocking.verify()
+        return elapsed
+    return calls
+
+
+def _bench_size(num_mocked, repeats, build_repeats):
+    """
+    Benchmark each stage of building and mocking a code under test, whose
+    mock header declares `num_mocked` functions.
+    """
+    source, header, mock_header = write_cut(".", num_mocked)
+    include_dirs = [str(source.parent)]
+    source_text = source.read_text()
+    preprocessed_source = preprocess(source_text, include_dirs, markers=True)
+    headers = [mock_header, header]
+    entries = index.HeaderIndex().lookup_all(headers, include_dirs)
+
+    results = {
+        "preprocess": _measure(
+            lambda: preprocess(source_text, include_dirs, markers=True), repeats),
+        "index": _measure(
+            lambda: index.HeaderIndex().lookup_all(headers, include_dirs),
+            repeats),
+        "parse": _measure(
+            lambda: pycparser.CParser().parse(preprocessed_source), repeats),
+        "function_list": _measure(
+            lambda: CodeUnderTest._functions(entries, preprocessed_source), repeats),
+    }
+
+    # A fresh CodeUnderTest (i.e. module name) for each build, as the module
+    # would otherwise be imported from the first build:
+    timings = []
+    for _ in range(build_repeats):
+        cut = CodeUnderTest(source, header)
+        start = time.perf_counter()
+        module, externs, referenced = \
+            cut._build(source_text, entries, preprocessed_source)
+        timings.append(time.perf_counter() - start)
+    results["build"] = {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "repeats": build_repeats,
+    }
+
+    results["mock_setup"] = _measure(
+        lambda: MockedMethods(module.ffi, externs, referenced), repeats)
+
+    # Time only the calls, not setting the expectations:
+    calls = _bench_mock_calls(
+        module.lib, MockedMethods(module.ffi, externs, referenced))
+    timings = [calls() / (3 * MOCK_CALLS) for _ in range(repeats)]
+    results["mock_call"] = {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "repeats": repeats,
+    }
+    return results
+
+
+def _bench_test_process(num_tests, repeats):
+    """
+    Benchmark the cost per test of running a suite of trivial tests.
+    """
+    suite = pathlib.Path("tests") / "test_overhead.py"
+    suite.parent.mkdir(exist_ok=True)
+    suite.write_text(
+        "\n\n".join(TRIVIAL_SUITE.format(index=index) for index in range(num_tests)))
+    test_suite = TestSuite(suite)
+    return _measure(test_suite.run, repeats, operations=num_tests)
+
+
+def _bench_startup(num_suites, num_tests, repeats):
+    """
+    Benchmark importing ctestpy, and collecting the tests of `num_suites`
+    suites of `num_tests` trivial tests, each in a fresh interpreter.
+    """
+    suites = pathlib.Path("tests") / "startup"
+    suites.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(num_suites):
+        path = suites / f"test_suite_{index}.py"
+        path.write_text("import ctestpy\n\n\n" + "\n\n".join(
+            TRIVIAL_SUITE.format(index=test) for test in range(num_tests)))
+        paths.append(str(path))
+    env = dict(os.environ, PYTHONPATH=str(pathlib.Path(__file__).resolve().parents[1]))
+
+    def run(*args):
+        subprocess.run(
+            [sys.executable] + list(args), env=env, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return {
+        "import": _measure(lambda: run("-c", "import ctestpy"), repeats),
+        "collect_only": _measure(
+            lambda: run("-m", "ctestpy", "--collect-only", *paths), repeats),
+    }
+
+
+def _commit():
+    """
+    Return the git commit of the checkout, or None if it is unknown.
+    """
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=pathlib.Path(__file__).parent,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return process.stdout.strip()
+
+
+def run(sizes, repeats, build_repeats, num_tests, num_suites):
+    """
+    Run all benchmarks, returns the results as a dict.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        sys.path.insert(0, directory)
+        os.environ[index.CACHE_ENVIRONMENT_VARIABLE] = directory
+        try:
+            for size in sizes:
+                for name, timing in _bench_size(
+                        size, repeats, build_repeats).items():
+                    results.append(dict(timing, benchmark=name, size=size))
+            timing = _bench_test_process(num_tests, max(repeats // 10, 1))
+            results.append(dict(timing, benchmark="test_process", size=num_tests))
+            for name, timing in _bench_startup(
+                    num_suites, num_tests, max(repeats // 2, 1)).items():
+                results.append(dict(timing, benchmark=name, size=num_suites))
+        finally:
+            sys.path.remove(directory)
+            os.chdir(cwd)
+    return {
+        "commit": _commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def _print_results(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {
+            (result["benchmark"], result["size"]): result["median"]
+            for result in baseline["results"]}
+    print(f"{'benchmark':<14} {'size':>6} {'median (us)':>12} {'change':>8}")
+    for result in results["results"]:
+        key = (result["benchmark"], result["size"])
+        change = ""
+        if previous.get(key):
+            change = f"{result['median'] / previous[key] - 1:+.0%}"
+        print(
+            f"{result['benchmark']:<14} {result['size']:>6} "
+            f"{result['median'] * 1e6:>12.1f} {change:>8}")
+
+
+def main():
+    """
+    Entry point, see ``--help``.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+        help="numbers of functions in the mocked header")
+    parser.add_argument(
+        "--repeats", type=int, default=DEFAULT_REPEATS,
+        help="number of times each stage is timed")
+    parser.add_argument(
+        "--build-repeats", type=int, default=DEFAULT_BUILD_REPEATS,
+        help="number of times the cffi build is timed")
+    parser.add_argument(
+        "--tests", type=int, default=DEFAULT_TESTS,
+        help="number of tests in the suite used to time test processes")
+    parser.add_argument(
+        "--suites", type=int, default=DEFAULT_SUITES,
+        help="number of suites used to time the start up of the CLI")
+    parser.add_argument(
+        "--output", type=pathlib.Path, help="write the results as JSON")
+    parser.add_argument(
+        "--compare", type=pathlib.Path,
+        help="JSON results (of another commit) to compare against")
+    args = parser.parse_args()
+
+    _configure_custom_log_levels()
+    logging.disable(logging.FAILED)
+    results = run(
+        args.sizes, args.repeats, args.build_repeats, args.tests, args.suites)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    _print_results(results, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
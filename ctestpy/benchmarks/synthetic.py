@@ -0,0 +1,48 @@
+"""
+Helpers to generate synthetic code under test for the ctestpy benchmarks.
+
+The generated project follows the layout that ctestpy expects, i.e. the C
+source and headers live in ``src/`` relative to the directory the build runs
+from.
+"""
+import pathlib
+
+
+def write_header(path, num_functions, prefix="hal_fn"):
+    """
+    Write a header declaring ``num_functions`` functions, each of which takes
+    two ints and returns an int.
+    """
+    path.write_text(
+        "\n".join(
+            f"int {prefix}_{index}(int a, int b);"
+            for index in range(num_functions)) + "\n")
+    return path
+
+
+def write_cut(directory, num_mocked, num_called=3):
+    """
+    Write a code under test (``src/cut.c`` and ``src/cut.h``) to `directory`,
+    that includes a mock header (``src/hal.h``) with `num_mocked` functions of
+    which the first `num_called` are called by the code under test.
+
+    Returns:
+        tuple: paths of the source, header and the mock header.
+    """
+    src = pathlib.Path(directory) / "src"
+    src.mkdir(parents=True, exist_ok=True)
+    mock_header = write_header(src / "hal.h", num_mocked)
+    header = src / "cut.h"
+    header.write_text("int cut(int value);\n")
+    calls = " + ".join(
+        f"hal_fn_{index}(value, {index})" for index in range(num_called))
+    source = src / "cut.c"
+    source.write_text(
+        '#include "cut.h"\n'
+        '#include "hal.h"\n'
+        "\n"
+        "int cut(int value)\n"
+        "{\n"
+        f"    return {calls or '0'};\n"
+        "}\n")
+    return source, header, mock_header
@@ -1,2 +1,29 @@
-from .builder import Builder
-from .test import fixture
+import importlib
+
+# The decorator shadows its module, so it must be bound eagerly (importing
+# `ctestpy.benchmark` later would otherwise replace it with the module).
+from .benchmark import benchmark
+
+# The rest of the public API is imported on first use (PEP 562), so that
+# importing ctestpy (e.g. to run `ctestpy --collect-only`) does not import
+# cffi and pycparser.
+_EXPORTS = {
+    "Builder": "ctestpy.builder",
+    "fixture": "ctestpy.test",
+    "parametrize": "ctestpy.test",
+    "shared_fixture": "ctestpy.shared",
+}
+
+__all__ = ["benchmark"] + list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,9 +1,9 @@
+import argparse
 import os
 import sys
 import logging
 
-from ctestpy.test import TestSuite
-from ctestpy.logging import configure_logger
+from ctestpy.logging import TestLogListener, configure_logger
 
 
 LOGGER = logging.getLogger()
@@ -27,9 +27,93 @@ def _add_cwd_to_pythonpath():
     sys.path.append(os.getcwd())
 
 
+def _parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="ctestpy",
+        description="Run ctestpy test suites.",
+        epilog="Run `ctestpy fuzz --help` to fuzz a function of the code "
+        "under test, and `ctestpy worker --help` to run the tests of a "
+        "coordinator (`--serve`).")
+    parser.add_argument(
+        "suites", nargs="+", metavar="SUITE",
+        help="path to a Python test file")
+    # The defaults of the options are those of `ctestpy.benchmark` and
+    # `ctestpy.coverage`, which are only imported when the tests run.
+    benchmarks = parser.add_argument_group("benchmarks")
+    benchmarks.add_argument(
+        "--benchmark-baseline", metavar="PATH",
+        help="baseline of benchmark results (default: .ctestpy-benchmarks.json)")
+    benchmarks.add_argument(
+        "--benchmark-save", action="store_true",
+        help="update the baseline with the results of this run")
+    benchmarks.add_argument(
+        "--benchmark-threshold", type=float, metavar="FRACTION",
+        help="relative slow down reported as a regression (default: 0.1)")
+    parser.add_argument(
+        "--coverage", nargs="?", const=True, metavar="DIR",
+        help="collect gcov coverage of the code under test, and write a summary "
+        "and an lcov file to DIR (default: .ctestpy-coverage)")
+    parser.add_argument(
+        "--collect-only", action="store_true",
+        help="only list the tests of the suites, without importing or running "
+        "them")
+    parser.add_argument(
+        "--log-failed-only", action="store_true",
+        help="only output the logs of failing tests (and the result of each "
+        "passing test)")
+    parser.add_argument(
+        "--show-output", action="store_true",
+        help="output the captured stdout/stderr of all tests, by default it is "
+        "only output for failing tests")
+    parser.add_argument(
+        "--report-jsonl", metavar="PATH",
+        help="write the result and resource usage of each test to PATH as JSON "
+        "Lines, as the tests complete")
+    parser.add_argument(
+        "--junit-xml", metavar="PATH",
+        help="write the results to PATH as JUnit XML")
+    parser.add_argument(
+        "--allocations", action="store_true",
+        help="count the allocations made by the code under test, and summarise "
+        "the hot spots")
+    parser.add_argument(
+        "--artifacts", metavar="DIR",
+        help="store the modules built for the code under test in DIR, and load "
+        "them from it rather than building them again")
+    distributed = parser.add_argument_group("distributed")
+    distributed.add_argument(
+        "--serve", metavar="[HOST:]PORT",
+        help="hand out the tests to the `ctestpy worker` processes connecting "
+        "to this address, rather than running them")
+    distributed.add_argument(
+        "--local-workers", type=int, default=0, metavar="N",
+        help="start N workers on this host (implies --serve)")
+    return parser.parse_args(args)
+
+
+def _collect(suites):
+    """
+    Print the tests of each suite (statically discovered, see
+    `ctestpy.collect`).
+    """
+    from ctestpy.collect import collect
+    total = 0
+    for path in suites:
+        for test in collect(path):
+            cases = "" if test.cases == 1 else \
+                f" ({test.cases if test.cases is not None else 'parametrized'} cases)"
+            print(f"{path}::{test.name}{cases}")
+            total += test.cases or 1
+    LOGGER.info("%d tests collected", total)
+
+
 def main():
     """
     arguments are path to Python test file(s) that contain ctestpy unittests.
+
+    ``ctestpy fuzz ...`` fuzzes a function of the code under test instead,
+    see ``ctestpy fuzz --help``; ``ctestpy worker ...`` runs the tests handed
+    out by a coordinator, see ``ctestpy.distributed``.
     """
     if len(sys.argv) <= 1:
         LOGGER.error("ctestpy needs to know which test suites to run.")
@@ -38,10 +122,52 @@ def main():
         sys.exit(1)
     _add_cwd_to_pythonpath()
     configure_logger()
-    args = sys.argv[1:]
-    LOGGER.info("CTestPy: running tests")
-    for suite in (TestSuite(arg) for arg in args):
-        suite.run()
+    if sys.argv[1] == "fuzz":
+        from ctestpy.fuzz import main as fuzz
+        fuzz(sys.argv[2:])
+    if sys.argv[1] == "worker":
+        from ctestpy.distributed import main as worker
+        worker(sys.argv[2:])
+    args = _parse_args(sys.argv[1:])
+    if args.collect_only:
+        _collect(args.suites)
+        return
+    from ctestpy import allocations, artifacts, capture, coverage, report
+    from ctestpy.benchmark import Baseline, DEFAULT_BASELINE, DEFAULT_THRESHOLD
+    from ctestpy.test import TestSuite
+    baseline = Baseline(
+        args.benchmark_baseline or DEFAULT_BASELINE,
+        DEFAULT_THRESHOLD if args.benchmark_threshold is None
+        else args.benchmark_threshold)
+    if args.coverage:
+        coverage.enable(
+            coverage.DEFAULT_DIRECTORY if args.coverage is True else args.coverage)
+    if args.allocations:
+        allocations.enable()
+    if args.show_output:
+        capture.enable_show_output()
+    if args.artifacts:
+        artifacts.enable(args.artifacts)
+    with TestLogListener(failed_only=args.log_failed_only), \
+            report.Results(args.report_jsonl) as results:
+        LOGGER.info("CTestPy: running tests")
+        suites = [TestSuite(path, baseline, results) for path in args.suites]
+        if args.serve or args.local_workers:
+            from ctestpy import distributed
+            distributed.serve(suites, args.serve, args.local_workers)
+        else:
+            for suite in suites:
+                suite.run()
+        profiled = {}
+        for suite in suites:
+            profiled.update(suite.allocations)
+        allocations.summarise(profiled)
+        if args.benchmark_save:
+            baseline.save()
+        if args.coverage:
+            coverage.report()
+        if args.junit_xml:
+            report.write_junit(results.results, args.junit_xml)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,374 @@
+"""
+Allocation profiling of the code under test.
+
+When enabled (``CodeUnderTest(..., allocations=True)`` or ``ctestpy
+--allocations``), calls to ``malloc``, ``calloc``, ``realloc`` and ``free``
+made by the code under test are redirected to counting wrappers, which record
+the number of allocations, the bytes allocated and the peak usage. The
+counters are reset for each ``Builder``, so they cover a single test:
+
+.. code-block:: python
+
+    with builder() as build:
+        with build.allocations.assert_none():
+            build.testing.filter_sample(1024)
+
+Blocks still allocated when the ``Builder`` exits are reported as a leak.
+
+Note:
+    The wrappers are applied to the source of the code under test (with the
+    preprocessor), memory allocated by libraries it calls (e.g. ``strdup``)
+    is not counted and must not be freed by the code under test.
+"""
+import collections
+import contextlib
+import functools
+import os
+
+from logging import getLogger
+
+LOGGER = getLogger("allocations")
+
+# Set (to "1") to enable allocation profiling for all code under test; it is
+# inherited by the test processes.
+ENVIRONMENT_VARIABLE = "CTESTPY_ALLOCATIONS"
+
+# Option of the code under test to attribute allocations to each function.
+PER_CALL = "calls"
+
+# Functions redirected to the counting wrappers, which are therefore not
+# mocked.
+FUNCTIONS = ("malloc", "calloc", "realloc", "free")
+
+# Declarations of the counters for cffi.
+DECLARATIONS = """
+struct ctestpy_allocations {
+    unsigned long long count;
+    unsigned long long frees;
+    unsigned long long bytes;
+    long long current;
+    long long peak;
+    long long blocks;
+};
+struct ctestpy_allocations *ctestpy_allocation_counters(void);
+"""
+
+# Counting wrappers, which precede the source of the code under test. Each
+# block is preceded by its size, padded to keep the alignment of malloc.
+PREFIX = DECLARATIONS + r"""
+#include <stdlib.h>
+
+#define CTESTPY_HEADER 16
+
+static struct ctestpy_allocations ctestpy_allocations;
+
+struct ctestpy_allocations *ctestpy_allocation_counters(void)
+{
+    return &ctestpy_allocations;
+}
+
+static void *ctestpy_track(char *block, size_t size)
+{
+    if (block == NULL)
+        return NULL;
+    *(size_t *)block = size;
+    ctestpy_allocations.count++;
+    ctestpy_allocations.bytes += size;
+    ctestpy_allocations.blocks++;
+    ctestpy_allocations.current += size;
+    if (ctestpy_allocations.current > ctestpy_allocations.peak)
+        ctestpy_allocations.peak = ctestpy_allocations.current;
+    return block + CTESTPY_HEADER;
+}
+
+void *ctestpy_malloc(size_t size)
+{
+    return ctestpy_track(malloc(CTESTPY_HEADER + size), size);
+}
+
+void *ctestpy_calloc(size_t count, size_t size)
+{
+    if (size && count > ((size_t)-1 - CTESTPY_HEADER) / size)
+        return NULL;
+    return ctestpy_track(calloc(1, CTESTPY_HEADER + count * size), count * size);
+}
+
+void ctestpy_free(void *ptr)
+{
+    char *block;
+    if (ptr == NULL)
+        return;
+    block = (char *)ptr - CTESTPY_HEADER;
+    ctestpy_allocations.frees++;
+    ctestpy_allocations.blocks--;
+    ctestpy_allocations.current -= *(size_t *)block;
+    free(block);
+}
+
+void *ctestpy_realloc(void *ptr, size_t size)
+{
+    char *block;
+    size_t previous;
+    if (ptr == NULL)
+        return ctestpy_malloc(size);
+    block = (char *)ptr - CTESTPY_HEADER;
+    previous = *(size_t *)block;
+    block = realloc(block, CTESTPY_HEADER + size);
+    if (block == NULL)
+        return NULL;
+    ctestpy_allocations.blocks--;
+    ctestpy_allocations.current -= previous;
+    return ctestpy_track(block, size);
+}
+
+#define malloc(size) ctestpy_malloc(size)
+#define calloc(count, size) ctestpy_calloc(count, size)
+#define realloc(ptr, size) ctestpy_realloc(ptr, size)
+#define free(ptr) ctestpy_free(ptr)
+"""
+
+# Follows the source of the code under test, so the cffi wrappers are not
+# affected.
+SUFFIX = """
+#undef malloc
+#undef calloc
+#undef realloc
+#undef free
+"""
+
+# Number of hot spots summarised by the CLI.
+HOT_SPOTS = 10
+
+# Reports of the Builders which exited in this (test) process.
+_REPORTS = []
+
+
+AllocationStats = collections.namedtuple(
+    "AllocationStats", ["count", "frees", "bytes", "peak", "blocks"])
+AllocationStats.__doc__ = """
+Allocations made by the code under test: the number of allocations (each
+``realloc`` counts as one), frees, bytes allocated, peak bytes in use and the
+number of blocks still allocated.
+"""
+
+
+def enabled(requested=None):
+    """
+    Return True if allocation profiling is enabled, `requested` is the option
+    given to the code under test (None to use the environment).
+    """
+    if requested is not None:
+        return bool(requested)
+    return bool(os.environ.get(ENVIRONMENT_VARIABLE))
+
+
+def enable():
+    """
+    Enable allocation profiling for all code under test of this process and
+    the test processes it starts.
+    """
+    os.environ[ENVIRONMENT_VARIABLE] = "1"
+
+
+def instrument(source):
+    """
+    Return `source` with its allocations redirected to the counting wrappers.
+    """
+    return f"{PREFIX}\n{source}\n{SUFFIX}"
+
+
+class Allocations:
+    """
+    Allocation counters of a module built for the code under test.
+
+    :param: lib the built module's library
+    """
+
+    def __init__(self, lib):
+        self._counters = lib.ctestpy_allocation_counters()
+        self.calls = {}
+
+    def reset(self):
+        """
+        Reset all counters (done by ``Builder`` for each test).
+        """
+        for field in ("count", "frees", "bytes", "current", "peak", "blocks"):
+            setattr(self._counters, field, 0)
+        self.calls = {}
+
+    def stats(self):
+        """
+        Return the ``AllocationStats`` since the counters were reset.
+        """
+        counters = self._counters
+        return AllocationStats(
+            counters.count, counters.frees, counters.bytes, counters.peak,
+            counters.blocks)
+
+    @contextlib.contextmanager
+    def measure(self):
+        """
+        Context manager measuring the allocations made within it. It yields a
+        list, which holds the ``AllocationStats`` once the context exits (the
+        peak being relative to the bytes in use on entry).
+
+        :example:
+            >>> with build.allocations.measure() as measured:
+            >>>     build.testing.parse(message, len(message))
+            >>> [stats] = measured
+            >>> assert stats.peak <= 256
+        """
+        counters = self._counters
+        current = counters.current
+        peak = counters.peak
+        before = self.stats()
+        counters.peak = current
+        measured = []
+        try:
+            yield measured
+        finally:
+            after = self.stats()
+            measured.append(AllocationStats(
+                after.count - before.count,
+                after.frees - before.frees,
+                after.bytes - before.bytes,
+                after.peak - current,
+                after.blocks - before.blocks))
+            counters.peak = max(peak, counters.peak)
+
+    @contextlib.contextmanager
+    def assert_none(self):
+        """
+        Context manager which asserts that the code under test performs no
+        allocations within it.
+        """
+        with self.measure() as measured:
+            yield
+        [stats] = measured
+        assert stats.count == 0, \
+            f"{stats.count} allocation(s) of {stats.bytes} bytes, expected none"
+
+    def track(self, lib):
+        """
+        Return a proxy for `lib` which attributes allocations to each function
+        called through it (see ``calls``).
+        """
+        return _TrackedLibrary(lib, self)
+
+    def report(self):
+        """
+        Return the allocations of the test as a dict (see ``collect``).
+        """
+        stats = self.stats()
+        return {
+            "count": stats.count,
+            "bytes": stats.bytes,
+            "peak": stats.peak,
+            "leaked": stats.blocks,
+            "calls": {name: list(entry) for name, entry in self.calls.items()},
+        }
+
+
+class _TrackedLibrary:
+    """
+    Proxy for the library of the code under test, recording the calls,
+    allocations and bytes allocated by each function.
+    """
+
+    def __init__(self, lib, allocations):
+        object.__setattr__(self, "_lib", lib)
+        object.__setattr__(self, "_allocations", allocations)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._lib, name)
+        if not callable(attribute):
+            return attribute
+        allocations = self._allocations
+        counters = allocations._counters
+
+        @functools.wraps(attribute)
+        def call(*args):
+            count, size = counters.count, counters.bytes
+            try:
+                return attribute(*args)
+            finally:
+                entry = allocations.calls.setdefault(name, [0, 0, 0])
+                entry[0] += 1
+                entry[1] += counters.count - count
+                entry[2] += counters.bytes - size
+        object.__setattr__(self, name, call)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._lib, name, value)
+
+    def __dir__(self):
+        return dir(self._lib)
+
+
+def record(report):
+    """
+    Record the allocation report of a ``Builder`` which exited.
+    """
+    _REPORTS.append(report)
+
+
+def collect():
+    """
+    Return the allocations of all ``Builder`` which exited since the last
+    call (i.e. during a test) merged into a dict, or None if none were
+    profiled. The dict has ``count``, ``bytes``, ``peak`` and ``leaked``
+    (blocks), and ``calls`` with ``[calls, allocations, bytes]`` keyed by the
+    name of each function called through ``Allocations.track``.
+    """
+    if not _REPORTS:
+        return None
+    merged = {"count": 0, "bytes": 0, "peak": 0, "leaked": 0, "calls": {}}
+    for report in _REPORTS:
+        for field in ("count", "bytes", "leaked"):
+            merged[field] += report[field]
+        merged["peak"] = max(merged["peak"], report["peak"])
+        for name, entry in report["calls"].items():
+            total = merged["calls"].setdefault(name, [0, 0, 0])
+            for index, value in enumerate(entry):
+                total[index] += value
+    _REPORTS.clear()
+    return merged
+
+
+def summarise(reports):
+    """
+    Log the allocation hot spots of a run, `reports` maps the name of each
+    test to its allocations (see ``collect``).
+    """
+    if not reports:
+        return
+    tests = sorted(
+        (item for item in reports.items() if item[1]["count"]),
+        key=lambda item: item[1]["count"], reverse=True)
+    functions = {}
+    for report in reports.values():
+        for name, entry in report["calls"].items():
+            total = functions.setdefault(name, [0, 0, 0])
+            for index, value in enumerate(entry):
+                total[index] += value
+    if not tests:
+        LOGGER.info("No allocations were made by the code under test")
+        return
+    LOGGER.info("Allocation hot spots (tests):")
+    for name, report in tests[:HOT_SPOTS]:
+        LOGGER.info(
+            "  %s: %d allocations, %d bytes, peak %d bytes",
+            name, report["count"], report["bytes"], report["peak"])
+    allocating = sorted(
+        (item for item in functions.items() if item[1][1]),
+        key=lambda item: item[1][1], reverse=True)
+    if allocating:
+        LOGGER.info("Allocation hot spots (functions):")
+        for name, (calls, count, size) in allocating[:HOT_SPOTS]:
+            LOGGER.info(
+                "  %s: %d allocations, %d bytes in %d calls",
+                name, count, size, calls)
+    leaks = [name for name, report in tests if report["leaked"]]
+    if leaks:
+        LOGGER.warning("Tests with leaks: %s", ", ".join(leaks))
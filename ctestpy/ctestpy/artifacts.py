@@ -0,0 +1,147 @@
+"""
+On-disk store of the modules built for the code under test.
+
+Each test process builds the code under test it uses. When the store is
+enabled (``ctestpy --artifacts DIR``, and always for ``ctestpy worker``), a
+module is only compiled once per store, then loaded from the store by any
+process using it. The store is keyed by everything that goes into the build
+(see ``CodeUnderTest.generate``), and by the Python and cffi versions.
+
+The artifacts of a store can be exported and installed elsewhere, which is
+how ``ctestpy worker`` processes share their builds through the coordinator
+(see ``ctestpy.distributed``).
+
+Note:
+    Modules built with coverage are never stored, as their gcov notes
+    belong to a single build.
+"""
+import hashlib
+import importlib.machinery
+import importlib.util
+import os
+import pathlib
+import pickle
+import shutil
+import sys
+import sysconfig
+import tempfile
+
+from logging import getLogger
+
+import cffi
+
+LOGGER = getLogger("artifacts")
+
+# Set (to the absolute path of the store) to enable the store, it is inherited
+# by the test processes.
+ENVIRONMENT_VARIABLE = "CTESTPY_ARTIFACTS"
+
+# Name of the file describing the build of an artifact.
+BUILD_FILENAME = "build.pickle"
+
+
+def directory():
+    """
+    Return the directory of the store, or None if it is not enabled.
+    """
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    return pathlib.Path(path) if path else None
+
+
+def enable(path):
+    """
+    Enable the store at `path` for this process and the test processes it
+    starts.
+    """
+    path = pathlib.Path(path).resolve()
+    path.mkdir(parents=True, exist_ok=True)
+    os.environ[ENVIRONMENT_VARIABLE] = str(path)
+    return path
+
+
+def store():
+    """
+    Return the ``ArtifactStore`` enabled for this process, or None.
+    """
+    path = directory()
+    return ArtifactStore(path) if path else None
+
+
+class ArtifactStore:
+    """
+    A directory of built modules, each in a directory named after its key.
+
+    :param: path of the directory
+    """
+
+    def __init__(self, path):
+        self._path = pathlib.Path(path)
+
+    def key(self, build_key):
+        """
+        Return the key of an artifact, from the key of its build.
+        """
+        return hashlib.sha256("\0".join([
+            build_key, sys.version, sysconfig.get_config_var("EXT_SUFFIX") or "",
+            cffi.__version__]).encode()).hexdigest()
+
+    def keys(self):
+        """
+        Return the keys of the artifacts in the store.
+        """
+        if not self._path.is_dir():
+            return set()
+        return {
+            path.parent.name for path in self._path.glob(f"*/{BUILD_FILENAME}")}
+
+    def load(self, key):
+        """
+        Import the module of the artifact `key`, returns the module, the
+        functions to be mocked and the names referenced by the code under
+        test (see ``CodeUnderTest._build``), or None if it is not stored.
+        """
+        try:
+            with open(self._path / key / BUILD_FILENAME, "rb") as stream:
+                name, filename, externs, referenced = pickle.load(stream)
+        except OSError:
+            return None
+        path = self._path / key / filename
+        loader = importlib.machinery.ExtensionFileLoader(name, str(path))
+        spec = importlib.util.spec_from_file_location(name, path, loader=loader)
+        module = importlib.util.module_from_spec(spec)
+        loader.exec_module(module)
+        sys.modules[name] = module
+        return module, externs, referenced
+
+    def save(self, key, module, externs, referenced):
+        """
+        Store the (built) `module` as the artifact `key`.
+        """
+        path = pathlib.Path(module.__file__)
+        build = pickle.dumps((module.__name__, path.name, externs, referenced))
+        self.install(key, {path.name: path.read_bytes(), BUILD_FILENAME: build})
+
+    def export(self, key):
+        """
+        Return the files of the artifact `key`, as bytes keyed by name.
+        """
+        return {
+            path.name: path.read_bytes()
+            for path in (self._path / key).iterdir()}
+
+    def install(self, key, files):
+        """
+        Add the artifact `key` from its `files` (see ``export``). The artifact
+        is written to a temporary directory first, so concurrent processes
+        never load a partial artifact.
+        """
+        self._path.mkdir(parents=True, exist_ok=True)
+        staging = pathlib.Path(tempfile.mkdtemp(dir=self._path, prefix=".tmp-"))
+        try:
+            for name, data in files.items():
+                (staging / pathlib.PurePath(name).name).write_bytes(data)
+            os.replace(staging, self._path / key)
+        except OSError as error:
+            # Most likely another process stored the same artifact first:
+            LOGGER.debug("Could not store the artifact %s: %s", key, error)
+            shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,338 @@
+"""
+Micro-benchmarks of functions of the code under test.
+
+A benchmark test is a test method decorated with ``ctestpy.benchmark``, which
+receives a ``Benchmark`` as its `bench` parameter:
+
+.. code-block:: python
+
+    @ctestpy.benchmark
+    def test_add_latency(bench):
+        with builder() as build:
+            bench(build.testing.add, 5, 6)
+
+The results are compared against a baseline file, and reported as failed when
+they are slower than the baseline by more than a threshold.
+"""
+import gc
+import itertools
+import json
+import math
+import pathlib
+import sys
+import time
+
+from logging import getLogger
+
+LOGGER = getLogger("benchmark")
+
+DEFAULT_BASELINE = ".ctestpy-benchmarks.json"
+DEFAULT_THRESHOLD = 0.1
+
+# z-score for the 95% confidence intervals.
+_Z_95 = 1.96
+
+# No-op functions (keyed by C signature) used to measure FFI call overhead.
+_NOP_FUNCTIONS = {}
+
+
+def benchmark(func=None, **options):
+    """
+    Decorator used within test suites to define a benchmark test method. The
+    test method receives a ``Benchmark`` as its `bench` parameter, the
+    options (if any) are passed to ``Benchmark``.
+
+    :example:
+        >>> import ctestpy
+        >>>
+        >>> @ctestpy.benchmark(samples=200)
+        >>> def test_crc_latency(bench):
+        >>>     with builder() as build:
+        >>>         bench(build.testing.crc32, build.ffi.new("uint8_t[]", 64), 64)
+    """
+    def decorator(func):
+        func.__ctestpy_benchmark__ = options
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _quantile_interval(ordered, quantile):
+    """
+    Return the estimate and the distribution-free 95% confidence interval of
+    a quantile of the sorted samples `ordered`.
+    """
+    count = len(ordered)
+    rank = quantile * (count - 1)
+    spread = _Z_95 * math.sqrt(count * quantile * (1 - quantile))
+    lower = max(int(math.floor(rank - spread)), 0)
+    upper = min(int(math.ceil(rank + spread)), count - 1)
+    return ordered[round(rank)], ordered[lower], ordered[upper]
+
+
+def _nanoseconds(value, resolution):
+    """
+    Format a time (in ns) with the FFI call overhead subtracted, a time within
+    the `resolution` of the overhead is only known to be below it.
+    """
+    if value < resolution:
+        return f"<{resolution:.1f}"
+    return f"{value:.1f}"
+
+
+class BenchmarkResult:
+    """
+    Statistics of the time taken per call of a benchmarked function, in
+    nanoseconds with the FFI call overhead subtracted.
+
+    The `resolution` is the uncertainty of the measured overhead: statistics
+    below it (which may be negative) are only known to be below it, and are
+    described as such. A result whose median is below it is not `resolved`,
+    i.e. the function is too cheap to be told apart from the overhead.
+    """
+
+    def __init__(self, name, samples, iterations, overhead, resolution=0.0):
+        ordered = sorted(samples)
+        self.name = name
+        self.iterations = iterations
+        self.overhead = overhead
+        self.resolution = resolution
+        self.samples = len(ordered)
+        self.min = ordered[0]
+        self.median, self.median_low, self.median_high = \
+            _quantile_interval(ordered, 0.5)
+        self.p99, self.p99_low, self.p99_high = _quantile_interval(ordered, 0.99)
+        self.resolved = self.median >= resolution
+
+    def as_dict(self):
+        """
+        Return the result as a dict (as stored in the baseline file).
+        """
+        return dict(vars(self))
+
+    @staticmethod
+    def describe(result):
+        """
+        Return a one line description of a result (dict).
+        """
+        resolution = result.get("resolution", 0.0)
+        (minimum, median, median_low, median_high, p99, p99_low, p99_high) = (
+            _nanoseconds(result[key], resolution) for key in (
+                "min", "median", "median_low", "median_high", "p99", "p99_low",
+                "p99_high"))
+        return (
+            f"{result['name']}: min {minimum}ns, "
+            f"median {median}ns [{median_low}, {median_high}], "
+            f"p99 {p99}ns [{p99_low}, {p99_high}] "
+            f"({result['samples']}x{result['iterations']} calls, "
+            f"overhead {result['overhead']:.1f}ns +/- {resolution:.1f}ns)")
+
+    def __str__(self):
+        return self.describe(self.as_dict())
+
+
+def _time_calls(function, args, iterations):
+    """
+    Return the time (in ns) taken to call `function` `iterations` times.
+    """
+    loop = itertools.repeat(None, iterations)
+    start = time.perf_counter_ns()
+    for _ in loop:
+        function(*args)
+    return time.perf_counter_ns() - start
+
+
+def _nop_function(ffi, function):
+    """
+    Return a compiled C function which does nothing, with the same signature
+    as `function`, or None if the signature uses types (such as structs) that
+    cannot be declared without the headers of the code under test.
+    """
+    ctype = ffi.typeof(function)
+    supported = ("primitive", "pointer", "void")
+    if ctype.result.kind not in supported or \
+            any(arg.kind not in supported for arg in ctype.args):
+        return None
+    if ctype.cname not in _NOP_FUNCTIONS:
+        import cffi
+        import hashlib
+        import importlib.machinery
+        import importlib.util
+        import shutil
+        import tempfile
+        params = ", ".join(
+            ffi.getctype(arg, f"arg{index}")
+            for index, arg in enumerate(ctype.args)) or "void"
+        prototype = f"{ffi.getctype(ctype.result, f'ctestpy_nop({params})')}"
+        body = "" if ctype.result.kind == "void" else \
+            f"return ({ffi.getctype(ctype.result)})0;"
+        name = "_ctestpy_nop_" + hashlib.sha1(ctype.cname.encode()).hexdigest()[:16]
+        builder = cffi.FFI()
+        builder.cdef(f"{prototype};")
+        builder.set_source(name, f"{prototype} {{ {body} }}")
+        tmpdir = tempfile.mkdtemp(prefix="ctestpy-")
+        try:
+            path = builder.compile(tmpdir=tmpdir)
+            loader = importlib.machinery.ExtensionFileLoader(name, path)
+            spec = importlib.util.spec_from_file_location(
+                name, path, loader=loader)
+            module = importlib.util.module_from_spec(spec)
+            loader.exec_module(module)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        _NOP_FUNCTIONS[ctype.cname] = module.lib.ctestpy_nop
+    return _NOP_FUNCTIONS[ctype.cname]
+
+
+class Benchmark:
+    """
+    Repeatedly calls a function (of the code under test) and measures the
+    time taken per call.
+
+    Each measurement warms up the function, then calibrates the number of
+    calls per sample so that a sample takes at least `sample_time` seconds.
+    The time taken to call a C function which does nothing (with the same
+    signature) is subtracted from each sample, so that the results do not
+    include the cost of calling through cffi.
+
+    :param: ffi optional cffi ``FFI`` of the module the function belongs to,
+        by default it is found from the function's module.
+    :param: samples number of samples to take
+    :param: sample_time minimum duration of a sample, in seconds
+    :param: warmup duration of the warmup, in seconds
+    :param: threshold relative slow down beyond which the result is reported
+        as a regression against the baseline, by default the threshold of the
+        baseline.
+    """
+
+    def __init__(
+            self,
+            ffi=None,
+            samples=100,
+            sample_time=0.001,
+            warmup=0.05,
+            threshold=None):
+        self._ffi = ffi
+        self._samples = samples
+        self._sample_time = sample_time
+        self._warmup = warmup
+        self.threshold = threshold
+        self.results = []
+
+    def _calibrate(self, function, args):
+        """
+        Warm up `function` and return the number of calls per sample.
+        """
+        deadline = time.perf_counter() + self._warmup
+        while time.perf_counter() < deadline:
+            _time_calls(function, args, 100)
+        iterations = 1
+        target = self._sample_time * 1e9
+        while True:
+            elapsed = _time_calls(function, args, iterations)
+            if elapsed >= target:
+                return iterations
+            iterations = max(
+                iterations * 2, int(iterations * target / max(elapsed, 1)))
+
+    def _sample(self, function, args, iterations):
+        return [
+            _time_calls(function, args, iterations) / iterations
+            for _ in range(self._samples)]
+
+    def __call__(self, function, *args, name=None):
+        """
+        Benchmark calling ``function(*args)``, returns a ``BenchmarkResult``
+        (which is also reported by ctestpy).
+
+        Args:
+            function: the function to call, e.g. ``build.testing.add``.
+            args: the arguments to call the function with.
+            name: name of the result, by default the name of the function.
+        """
+        import inspect
+        # Measure the function itself, not a wrapper (e.g. of the allocation
+        # profiling):
+        function = inspect.unwrap(function)
+        ffi = self._ffi
+        if ffi is None:
+            # Functions of a module built by cffi belong to that module:
+            module = sys.modules.get(getattr(function, "__module__", None) or "")
+            ffi = getattr(module, "ffi", None)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            iterations = self._calibrate(function, args)
+            samples = self._sample(function, args, iterations)
+            overhead = resolution = 0.0
+            nop = _nop_function(ffi, function) if ffi is not None else None
+            if nop is not None:
+                _time_calls(nop, args, iterations)
+                overhead, low, high = _quantile_interval(
+                    sorted(self._sample(nop, args, iterations)), 0.5)
+                resolution = (high - low) / 2
+        finally:
+            if gc_enabled:
+                gc.enable()
+        result = BenchmarkResult(
+            name or getattr(function, "__name__", repr(function)),
+            [sample - overhead for sample in samples],
+            iterations,
+            overhead,
+            resolution)
+        if not result.resolved:
+            LOGGER.warning(
+                "%s: too cheap to be measured, its median is below the "
+                "resolution of the FFI call overhead (%.1fns +/- %.1fns)",
+                result.name, overhead, resolution)
+        self.results.append(result)
+        return result
+
+
+class Baseline:
+    """
+    Benchmark results of a previous run, stored as JSON in `path`.
+
+    :param: path of the baseline file
+    :param: threshold default relative slow down beyond which a result is
+        reported as a regression
+    """
+
+    def __init__(self, path=DEFAULT_BASELINE, threshold=DEFAULT_THRESHOLD):
+        self._path = pathlib.Path(path)
+        self._threshold = threshold
+        self._results = {}
+        if self._path.exists():
+            self._results = json.loads(self._path.read_text())
+        self._updates = {}
+
+    def check(self, key, result, threshold=None):
+        """
+        Compare a result (dict) with the baseline, returns a message
+        describing the regression or None if there is no regression.
+
+        A regression is only reported when the lower bound of the median's
+        confidence interval is slower than the baseline median (plus the
+        threshold), so noisy measurements are not flagged. The raw timings
+        (with the FFI call overhead) are compared, so that functions cheaper
+        than the overhead are not compared against a baseline of about 0.
+        """
+        self._updates[key] = result
+        baseline = self._results.get(key)
+        if baseline is None:
+            return None
+        threshold = self._threshold if threshold is None else threshold
+        limit = (baseline["median"] + baseline.get("overhead", 0.0)) * (1 + threshold)
+        if result["median_low"] + result.get("overhead", 0.0) <= limit:
+            return None
+        return (
+            f"median {result['median']:.1f}ns is slower than the baseline "
+            f"{baseline['median']:.1f}ns by more than {threshold:.0%}")
+
+    def save(self):
+        """
+        Update the baseline file with the results checked during this run.
+        """
+        self._results.update(self._updates)
+        self._path.write_text(json.dumps(self._results, indent=2, sort_keys=True))
@@ -6,28 +6,39 @@ import cffi
 import sys
 import uuid
 import re
-import inspect
+import struct
 import glob
+import hashlib
 import os
 import subprocess
 import importlib
 from typing import List
 import warnings
+from ctestpy import allocations, artifacts, coverage, index
 from ctestpy.test import fail
 from logging import getLogger
 
 
 LOGGER = getLogger("builder")
 
+# Modules built by this process, keyed by a hash of everything that goes into
+# the build. A worker process which runs many tests against the same code
+# under test then only compiles it once.
+_BUILD_CACHE = {}
 
-def preprocess(source, include_dirs):
+# Hits and misses of `_BUILD_CACHE` since they were last collected.
+_BUILD_STATS = {"hits": 0, "misses": 0, "stored": 0}
+
+
+def preprocess(source, include_dirs, markers=False):
     """
-    Run the preprocessor and return the stdout result.
+    Run the preprocessor and return the stdout result, with linemarkers if
+    `markers` (see ``ctestpy.index.source_code``).
     """
     cmd_includes = [f"-I{inc}" for inc in include_dirs]
     process = \
         subprocess.run(
-            ['gcc', '-E', '-P', '-'] + cmd_includes,
+            ['gcc', '-E'] + ([] if markers else ['-P']) + ['-'] + cmd_includes,
             input=source,
             stdout=subprocess.PIPE,
             universal_newlines=True,
@@ -37,10 +48,18 @@ def preprocess(source, include_dirs):
 
 class Function:
     """
+    Represents a function declaration.
+
+    :param: name of this function
+    :param: args parameter names for this function
+    :param: params C types of each parameter, e.g. ``["const int", "char *"]``
+    :param: result C return type of this function
     """
-    def __init__(self, name, args):
+    def __init__(self, name, args, params=None, result=None):
         self.name = name
         self.args = args
+        self.params = params if params is not None else []
+        self.result = result
 
 
 class FunctionList(pycparser.c_ast.NodeVisitor):
@@ -58,6 +77,7 @@ class FunctionList(pycparser.c_ast.NodeVisitor):
         self._local_functions = set()
         self._all_functions = set()
         self._external_functions = set()
+        self._referenced_names = set()
         self.visit(pycparser.CParser().parse(source))
         self._verify()
 
@@ -77,14 +97,29 @@ class FunctionList(pycparser.c_ast.NodeVisitor):
         return self._external_functions
         return {fn.name for fn in self._external_functions}
 
+    @property
+    def referenced(self):
+        """
+        set: names of every identifier used by the code under test, i.e. the
+        external functions that the code under test could actually call.
+        """
+        return self._referenced_names
+
     def visit_FuncDef(self, node):
         # Only local functions (i.e. those that exist in the source code file)
         # are considered locally defined.
         self._add_local_function(node.decl)
+        self.visit(node.body)
 
     def visit_Decl(self, node):
         if isinstance(node.type, pycparser.c_ast.FuncDecl):
             self._add_function(node)
+        elif node.init is not None:
+            # Initialisers may take the address of a function (callbacks).
+            self.visit(node.init)
+
+    def visit_ID(self, node):
+        self._referenced_names.add(node.name)
 
     def _add_local_function(self, node):
         self._local_functions.add(node)
@@ -93,7 +128,13 @@ class FunctionList(pycparser.c_ast.NodeVisitor):
         self._all_functions.add(node)
 
     def _parse_FuncDef(self, node):
-        return Function(node.name, [arg.name for arg in node.type.args])
+        generator = pycparser.c_generator.CGenerator()
+        args = node.type.args.params if node.type.args else []
+        return Function(
+            node.name,
+            [arg.name for arg in args],
+            [generator.visit(arg.type) for arg in args],
+            generator.visit(node.type.type))
 
     def _get_external_functions(self):
         """
@@ -121,18 +162,41 @@ class FunctionList(pycparser.c_ast.NodeVisitor):
             [self._parse_FuncDef(node) for node in self._local_functions]
 
 
+def collect_build_stats():
+    """
+    Return the hits and misses of the build cache since the last call (i.e.
+    during a test), as a dict. ``stored`` counts the misses which were loaded
+    from the artifact store rather than built.
+    """
+    stats = dict(_BUILD_STATS)
+    _BUILD_STATS.update(hits=0, misses=0, stored=0)
+    return stats
+
+
 class CodeUnderTest:
     """
     Represents the Code Under Test.
 
     :param: source - file path for the CUT source file
     :param: header - file path for the CUT header file
+    :param: batch - optional list of names of CUT functions to generate a
+        batch wrapper for; see ``BatchedMethods``.
+    :param: allocations - True to count the allocations made by the CUT, or
+        "calls" to also attribute them to each CUT function called; see
+        ``ctestpy.allocations``. By default it is enabled by
+        ``ctestpy --allocations``, which also attributes them (see
+        ``tracks_calls``).
     """
 
-    def __init__(self, source, header):
+    def __init__(self, source, header, batch=None, allocations=None):
         self._source = source
         self._header = header
+        self._batch = list(batch) if batch else []
         self._unique_name = f"__{self._source.stem}__{uuid.uuid4().hex}"
+        self._ffi = None
+        self._batched = None
+        self._profile_allocations = allocations
+        self._allocations = None
 
     @property
     def unique_name(self):
@@ -142,6 +206,114 @@ class CodeUnderTest:
         """
         return self._unique_name
 
+    @property
+    def ffi(self):
+        """
+        cffi.FFI: FFI instance of the built module (None until generated).
+
+        Use it to pass buffers (``bytearray``, NumPy arrays, ...) to the code
+        under test without copying them, e.g.
+        ``ffi.from_buffer("int16_t[]", samples)``.
+        """
+        return self._ffi
+
+    @property
+    def batched(self):
+        """
+        BatchedMethods: batch wrappers of the built module (None until
+            generated).
+        """
+        return self._batched
+
+    @property
+    def allocations(self):
+        """
+        ctestpy.allocations.Allocations: allocation counters of the built
+            module (None until generated, or if not enabled).
+        """
+        return self._allocations
+
+    @property
+    def tracks_calls(self):
+        """
+        bool: True if allocations are attributed to each CUT function called.
+
+        Attributing them wraps every call into the CUT, which slows it down.
+        A CUT built with ``allocations=True`` only counts them, as a test
+        asking for the counters (e.g. ``assert_none``) does not need more;
+        ``allocations="calls"`` asks for the attribution. When profiling is
+        enabled by ``ctestpy --allocations`` (i.e. `allocations` is None),
+        the allocations are attributed, as the CLI summarises the functions
+        which allocate the most.
+        """
+        return self._allocations is not None and (
+            self._profile_allocations == allocations.PER_CALL
+            or self._profile_allocations is None)
+
+    def _get_batch_wrappers(self, local_functions):
+        """
+        Generate C batch wrappers for the functions named in `batch`.
+
+        A wrapper calls its function once per element of its input arrays,
+        e.g. for ``int add(int first, int second)``::
+
+            void add__batch(
+                const int *first, const int *second, int *out, size_t n);
+
+        Returns:
+            tuple: the declarations (for CFFI) and the definitions (C source)
+                of the batch wrappers.
+        """
+        functions = {fn.name: fn for fn in local_functions}
+        unknown = [name for name in self._batch if name not in functions]
+        if unknown:
+            raise ValueError(
+                f"Cannot generate batch wrappers for {', '.join(unknown)}: "
+                "not defined by the code under test")
+        declarations = []
+        definitions = ["#include <stddef.h>"]
+        for name in self._batch:
+            function = functions[name]
+            params = list(zip(function.args, function.params))
+            if params == [(None, "void")]:
+                params = []
+            types = [param_type for _, param_type in params]
+            types.append(function.result)
+            if function.result == "void" or \
+                    any(char in "*[(" for char in "".join(types)):
+                raise ValueError(
+                    f"Cannot generate a batch wrapper for `{name}`, it must "
+                    "take and return scalar values")
+            used = set()
+
+            def unique(ident):
+                while ident in used:
+                    ident += "_"
+                used.add(ident)
+                return ident
+
+            args = [unique(arg or f"arg{index}")
+                    for index, (arg, _) in enumerate(params)]
+            out, size, index = unique("out"), unique("n"), unique("i")
+            prototype = "void {}__batch({})".format(
+                name,
+                ", ".join(
+                    [f"const {_unqualified(param_type)} *{arg}"
+                     for arg, (_, param_type) in zip(args, params)]
+                    + [f"{_unqualified(function.result)} *{out}",
+                       f"size_t {size}"]))
+            declarations.append(prototype + ";")
+            definitions.append(
+                f"{prototype}\n"
+                "{\n"
+                f"    size_t {index};\n"
+                f"    for ({index} = 0; {index} < {size}; {index}++) {{\n"
+                f"        {out}[{index}] = {name}("
+                + ", ".join(f"{arg}[{index}]" for arg in args) + ");\n"
+                "    }\n"
+                "}\n")
+        return "\n".join(declarations), "\n".join(definitions)
+
     def _get_method_declarations(self, source, local_methods):
         """
         Generate a list of method declarations that can be passed to CFFI.
@@ -190,22 +362,290 @@ class CodeUnderTest:
             include_dir = str(header.parents[0])
             if include_dir not in include_dirs:
                 include_dirs.append(include_dir)
-        inc_directives = "\n".join([f'#include "{inc}"' for inc in headers])
-        includes = preprocess(inc_directives, include_dirs)
-        function_list = FunctionList(preprocess(source, include_dirs))
-        local_function_names = {fn.name for fn in function_list.locals}
-        includes = self._get_method_declarations(includes, local_function_names)
+        entries = index.HeaderIndex().lookup_all(headers, include_dirs)
+        includes = None
+        if any(entry.declarations is None for entry in entries):
+            # A header relies on declarations of another header, so they can
+            # only be parsed together:
+            inc_directives = "\n".join([f'#include "{inc}"' for inc in headers])
+            includes = preprocess(inc_directives, include_dirs)
+        preprocessed_source = preprocess(source, include_dirs, markers=True)
+
+        # Reuse the module if this process has already built the same code
+        # (e.g. for each case of a parametrized test):
+        key = hashlib.sha256(
+            "\0".join(
+                [source, includes or "", preprocessed_source,
+                 str(coverage.directory()),
+                 str(allocations.enabled(self._profile_allocations))]
+                + [entry.digest for entry in entries]
+                + self._batch
+            ).encode()).hexdigest()
+        if key in _BUILD_CACHE:
+            _BUILD_STATS["hits"] += 1
+        else:
+            _BUILD_STATS["misses"] += 1
+            _BUILD_CACHE[key] = self._load_or_build(
+                key, source, entries, preprocessed_source, includes)
+        module, externs, referenced = _BUILD_CACHE[key]
+
+        # Generate the mocked methods and return the bindings:
+        self._ffi = module.ffi
+        self._batched = BatchedMethods(module.ffi, module.lib, self._batch)
+        if allocations.enabled(self._profile_allocations):
+            self._allocations = allocations.Allocations(module.lib)
+        mocked_methods = MockedMethods(module.ffi, externs, referenced)
+        return module.lib, mocked_methods
+
+    def _load_or_build(self, key, source, entries, preprocessed_source, includes):
+        """
+        Load the module from the artifact store (see ``ctestpy.artifacts``) if
+        it is enabled and has it, otherwise build it (and store it).
+        """
+        store = None if coverage.directory() else artifacts.store()
+        if store is None:
+            return self._build(source, entries, preprocessed_source, includes)
+        artifact = store.key(key)
+        built = store.load(artifact)
+        if built is not None:
+            _BUILD_STATS["stored"] += 1
+            return built
+        built = self._build(source, entries, preprocessed_source, includes)
+        store.save(artifact, *built)
+        return built
+
+    def _build(self, source, entries, preprocessed_source, includes=None):
+        """
+        Compile and import the module for the code under test.
+
+        The ``cdef`` is assembled from the index `entries` of the headers,
+        unless `includes` (the headers preprocessed together) is given. The
+        integer macros of the headers are available as constants of the
+        module.
+
+        Returns:
+            tuple: the module, a dict of the functions to be mocked (keyed by
+                name) and the set of names referenced by the code under test.
+        """
+        local_functions, externs, referenced = self._functions(
+            entries, preprocessed_source, includes)
+        local_function_names = {fn.name for fn in local_functions}
+        if includes is None:
+            includes = index.declarations(entries, local_function_names)
+        else:
+            includes = self._get_method_declarations(
+                includes, local_function_names)
+        macro_declarations, macro_definitions = \
+            index.macro_definitions(index.macros(entries))
+        batch_declarations, batch_definitions = \
+            self._get_batch_wrappers(local_functions)
 
         # Compile:
         ffibuilder = cffi.FFI()
         ffibuilder.cdef(includes)
-        ffibuilder.set_source(self.unique_name, source, include_dirs=["src/"])
+        ffibuilder.cdef(macro_declarations)
+        options = {}
+        if coverage.directory():
+            ffibuilder.cdef(coverage.DECLARATIONS)
+            source = coverage.instrument(source, self._source)
+            options = coverage.build_options(self._source)
+        if allocations.enabled(self._profile_allocations):
+            ffibuilder.cdef(allocations.DECLARATIONS)
+            source = allocations.instrument(source)
+        if self._batch:
+            ffibuilder.cdef(batch_declarations)
+            source = f"{source}\n{batch_definitions}"
+        source = f"{source}\n{macro_definitions}"
+        ffibuilder.set_source(
+            self.unique_name, source, include_dirs=["src/"], **options)
         ffibuilder.compile()
+        if coverage.directory():
+            coverage.keep_notes(self.unique_name)
 
-        # Generate the mocked methods and return the bindings:
         module = importlib.import_module(self.unique_name)
-        mocked_methods = MockedMethods(module.ffi, function_list.externs)
-        return module.lib, mocked_methods
+        if coverage.directory():
+            coverage.register(module.lib)
+        externs = {fn.name: fn for fn in externs}
+        if allocations.enabled(self._profile_allocations):
+            for name in allocations.FUNCTIONS:
+                externs.pop(name, None)
+        return module, externs, referenced
+
+    @staticmethod
+    def _functions(entries, preprocessed_source, includes=None):
+        """
+        Return the functions defined by the code under test, the external
+        functions (to be mocked) and the names it references.
+
+        Only the code of the source file itself is parsed, the functions of
+        the headers are those of their index `entries`. The whole
+        `preprocessed_source` is parsed when the headers could not be indexed
+        (`includes`), or the source file cannot be parsed without the code of
+        its headers (e.g. it uses a type of a header which is not indexed).
+        """
+        if includes is None:
+            # The parser only needs to know which names are types:
+            typedefs = sorted({name for entry in entries for name in entry.typedefs})
+            code = "".join(f"typedef int {name};\n" for name in typedefs) \
+                + index.source_code(preprocessed_source)
+            try:
+                function_list = FunctionList(code)
+            except pycparser.c_parser.ParseError as error:
+                LOGGER.debug("Parsing the headers of the source: %s", error)
+            else:
+                local_names = {fn.name for fn in function_list.locals}
+                externs = {}
+                for entry in entries:
+                    for name, signature in entry.functions.items():
+                        if name not in local_names:
+                            externs.setdefault(name, Function(name, **signature))
+                return (
+                    function_list.locals, list(externs.values()),
+                    function_list.referenced)
+        function_list = FunctionList(preprocessed_source)
+        return function_list.locals, function_list.externs, function_list.referenced
+
+
+def _unqualified(c_type):
+    """
+    Remove type qualifiers from a scalar C type, e.g. "const int" -> "int".
+    """
+    return " ".join(
+        token for token in c_type.split()
+        if token not in ("const", "volatile", "restrict"))
+
+
+def _buffer_format(ffi, ctype):
+    """
+    Return the ``struct`` format character for a primitive cffi `ctype`.
+    """
+    size = ffi.sizeof(ctype)
+    if ctype.cname in ("float", "double"):
+        return {4: "f", 8: "d"}[size]
+    if ctype.cname in ("_Bool", "bool"):
+        return "?"
+    signed = "bhiq"[(1, 2, 4, 8).index(size)]
+    if ctype.cname != "char" and int(ffi.cast(ctype, -1)) < 0:
+        return signed
+    return signed.upper()
+
+
+def _format_kind(fmt):
+    """
+    Return whether a ``struct`` format is for floats ("f"), signed ("i") or
+    unsigned ("u") values.
+    """
+    fmt = fmt.lstrip("@=<>!")
+    if fmt in ("e", "f", "d"):
+        return "f"
+    return "i" if fmt.islower() else "u"
+
+
+class BatchFunction:
+    """
+    Calls the batch wrapper of a CUT function over arrays, in a single call
+    into the code under test.
+
+    Inputs may be any C-contiguous object supporting the buffer protocol
+    whose elements match the C parameter type (NumPy arrays,
+    ``array.array``, ...), or cffi arrays. They are passed to the code under
+    test without being copied.
+
+    :param: ffi the cffi ``FFI`` instance of the compiled module
+    :param: function the compiled batch wrapper, e.g. ``lib.add__batch``
+    """
+
+    def __init__(self, ffi, function):
+        self._ffi = ffi
+        self._function = function
+        ctypes = [arg.item for arg in ffi.typeof(function).args[:-1]]
+        # The generated wrapper compiles for struct (or union) values, which
+        # cannot be passed as arrays of scalars:
+        unsupported = [ctype.cname for ctype in ctypes if ctype.kind != "primitive"]
+        if unsupported:
+            raise ValueError(
+                f"Cannot generate a batch wrapper for `{function.__name__[:-7]}`, "
+                f"it must take and return scalar values, not "
+                f"{', '.join(unsupported)}")
+        self._inputs = [
+            (ffi.getctype(ctype, "[]"), _buffer_format(ffi, ctype))
+            for ctype in ctypes[:-1]]
+        self._output = (
+            ffi.getctype(ctypes[-1], "[]"), _buffer_format(ffi, ctypes[-1]))
+
+    def _pointer(self, array, ctype, fmt):
+        if isinstance(array, self._ffi.CData):
+            return array
+        view = memoryview(array)
+        if view.itemsize != struct.calcsize(fmt) or \
+                _format_kind(view.format) != _format_kind(fmt):
+            raise TypeError(
+                f"Expected an array of `{ctype[:-2]}`, got format "
+                f"{view.format!r} with itemsize {view.itemsize}")
+        return self._ffi.from_buffer(ctype, array)
+
+    def __call__(self, *arrays, out=None, count=None):
+        """
+        Call the function for each element of the input `arrays`.
+
+        Args:
+            arrays: one array for each parameter of the function, all of
+                the same length.
+            out: optional array to store the results in, by default a new
+                array is allocated.
+            count: number of calls of a function without parameters, by
+                default the length of `out`.
+
+        Returns:
+            `out`, or a typed ``memoryview`` of the results (use
+            ``numpy.asarray`` to view it as a NumPy array without copying).
+        """
+        if len(arrays) != len(self._inputs):
+            raise TypeError(
+                f"Expected {len(self._inputs)} arrays, got {len(arrays)}")
+        pointers = [
+            self._pointer(array, ctype, fmt)
+            for array, (ctype, fmt) in zip(arrays, self._inputs)]
+        if pointers:
+            size = len(pointers[0])
+        elif count is not None:
+            size = count
+        elif out is not None:
+            size = len(out)
+        else:
+            raise TypeError(
+                "Expected `count` or `out` for a function without parameters")
+        if any(len(pointer) != size for pointer in pointers):
+            raise ValueError("All input arrays must have the same length")
+        ctype, fmt = self._output
+        if out is None:
+            result = self._ffi.new(ctype, size)
+        else:
+            result = self._pointer(out, ctype, fmt)
+            if len(result) < size:
+                raise ValueError(f"`out` must hold at least {size} elements")
+        self._function(*pointers, result, size)
+        if out is not None:
+            return out
+        return memoryview(self._ffi.buffer(result)).cast(fmt)
+
+
+class BatchedMethods:
+    """
+    Represents the batch wrappers generated for the code under test (see the
+    `batch` parameter of ``CodeUnderTest``), each is a ``BatchFunction``
+    named after the function it wraps.
+
+    :example:
+        >>> add = builder.batch.add
+        >>> first = numpy.arange(1_000_000, dtype=numpy.intc)
+        >>> second = numpy.full_like(first, 5)
+        >>> assert (numpy.asarray(add(first, second)) == first + 5).all()
+    """
+
+    def __init__(self, ffi, lib, names):
+        for name in names:
+            setattr(self, name, BatchFunction(ffi, getattr(lib, f"{name}__batch")))
 
 
 class MockFunction:
@@ -214,11 +654,17 @@ class MockFunction:
 
     :param: name of this function
     :param: args parameter names for this function
+    :param: registry optional dict, this mock adds itself to it (keyed by
+        name) once it has an expectation, so that it can be verified.
+    :param: ffi optional cffi ``FFI`` of the compiled module, required to
+        match pointer arguments against expected buffers.
     """
 
-    def __init__(self, name, args):
+    def __init__(self, name, args, registry=None, ffi=None):
         self._name = name
         self._args = args
+        self._registry = registry
+        self._ffi = ffi
         self._call_args = []
         self._call_retvals = []
 
@@ -229,7 +675,11 @@ class MockFunction:
         Args:
             args: comma separated list of argument values; denotes the
                 expected values of each argument that is passed to the mock
-                function by the code under test.
+                function by the code under test. For pointer arguments the
+                expected value may be any object supporting the buffer
+                protocol (``bytes``, ``bytearray``, NumPy arrays, ...), the
+                memory the pointer refers to is then compared (without being
+                copied) against the expected contents.
             retval: the value which this mocked method shall return to the
                 code under test when it is called.
 
@@ -244,6 +694,8 @@ class MockFunction:
             retval)
         self._call_retvals.append(retval)
         self._call_args.append(args)
+        if self._registry is not None:
+            self._registry[self._name] = self
 
     def _validate_call(self, *args, **kwargs):
         if not self._call_args:
@@ -255,13 +707,55 @@ class MockFunction:
         self._call_args = self._call_args[1:]
         for name, expected, actual \
                 in zip(list(self._args), list(expected_args), list(args)):
-            if expected != actual:
+            view = self._pointed_to(expected, actual)
+            if view is not None:
+                self._validate_buffer(name, view, actual)
+            elif expected != actual:
                 fail(
                     f"method={self._name}, "
                     f"arg={name}: "
                     f"{actual=} but "
                     f"{expected=}")
 
+    def _pointed_to(self, expected, actual):
+        """
+        Return `expected` as a byte ``memoryview`` if it is to be compared
+        with the memory that `actual` points to, otherwise return None.
+        """
+        if self._ffi is None or not isinstance(actual, self._ffi.CData):
+            return None
+        if self._ffi.typeof(actual).kind not in ("pointer", "array"):
+            return None
+        try:
+            view = memoryview(expected)
+        except TypeError:
+            return None
+        try:
+            return view.cast("B")
+        except (TypeError, ValueError):
+            # The view is not contiguous (or has a format which cannot be
+            # cast), compare a copy of its bytes:
+            return memoryview(view.tobytes())
+
+    def _validate_buffer(self, name, view, actual):
+        if actual == self._ffi.NULL:
+            fail(
+                f"method={self._name}, "
+                f"arg={name}: actual=NULL but "
+                f"expected {view.nbytes} bytes")
+        buffer = self._ffi.buffer(actual, view.nbytes)
+        if buffer != view:
+            actual_bytes = buffer[:]
+            offset = next(
+                index for index, (left, right)
+                in enumerate(zip(actual_bytes, view))
+                if left != right)
+            fail(
+                f"method={self._name}, "
+                f"arg={name}: buffers differ at byte {offset}: "
+                f"actual={actual_bytes[offset:offset + 16].hex()} but "
+                f"expected={view[offset:offset + 16].hex()}")
+
     def _get_retval(self):
         retval = self._call_retvals[0]
         self._call_retvals = self._call_retvals[1:]
@@ -290,19 +784,57 @@ class MockedMethods:
     """
     Public methods from the `mocking` headers shall all be "mocked"; this
     class shall represent a public list of all available mocked methods.
+
+    Mock headers can declare thousands of functions of which a test only
+    touches a few, so each ``MockFunction`` is created (and bound to the
+    compiled module) the first time it is accessed. Functions which the code
+    under test references are bound straight away, so that an unexpected call
+    from the code under test still fails the test.
+
+    :param: ffi the cffi ``FFI`` instance of the compiled module
+    :param: mocked_methods list of ``Function`` that shall be mocked, or a
+        dict of those functions keyed by name (which avoids re-indexing a
+        large header for every test).
+    :param: referenced optional set of names used by the code under test, if
+        not given then every mocked method is bound up front.
     """
 
-    def __init__(self, ffi, mocked_methods):
-        for method in mocked_methods:
-            setattr(self, method.name, MockFunction(method.name, method.args))
-            ffi.def_extern(method.name)(getattr(self, method.name))
+    def __init__(self, ffi, mocked_methods, referenced=None):
+        self._ffi = ffi
+        if not isinstance(mocked_methods, dict):
+            mocked_methods = {method.name: method for method in mocked_methods}
+        self._methods = mocked_methods
+        self._expecting = {}
+        names = self._methods.keys()
+        if referenced is not None:
+            names = names & referenced
+        for name in names:
+            self._create(name)
+
+    def __getattr__(self, name):
+        # Only invoked for mocks that have not yet been created.
+        methods = self.__dict__.get("_methods", {})
+        if name not in methods:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}")
+        return self._create(name)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | self._methods.keys())
+
+    def _create(self, name):
+        method = self._methods[name]
+        mock = MockFunction(
+            method.name, method.args, self._expecting, self._ffi)
+        self._ffi.def_extern(method.name)(mock)
+        setattr(self, method.name, mock)
+        return mock
 
     def verify(self):
-        mocked_methods = \
-            (method[1] for method in inspect.getmembers(
-                self,
-                lambda member: isinstance(member, MockFunction)))
-        for method in mocked_methods:
+        """
+        Verify every mock which has been given expectations.
+        """
+        for method in self._expecting.values():
             method.verify()
 
 
@@ -316,7 +848,9 @@ class Builder:
     This class can then be used as a context manager to build the cffi
     module including code under test and mock stubs. The ``testing`` and
     ``mocking`` members of this class provide access to the CodeUnderTest
-    and MockedMethod instances for this test.
+    and MockedMethod instances for this test, and ``ffi`` provides the cffi
+    ``FFI`` instance of the built module. When allocation profiling is
+    enabled, ``allocations`` provides the ``Allocations`` of this test.
 
     :param testing: instance of ``CodeUnderTest`` - the code that is being tested
     :param mocking: list of ``pathlib.Path`` of the header files for the dependencies
@@ -326,6 +860,11 @@ class Builder:
         >>> with Builder(CodeUnderTest('a.c', 'a.h'), ['mock.h']) as builder:
         >>>     builder.mocking.mock_expect_and_return(1985, retval=88)
         >>>     builder.testing.call()
+        >>>
+        >>>     # Pass a NumPy array to `int sum(const int16_t *, size_t)`:
+        >>>     samples = numpy.arange(1024, dtype=numpy.int16)
+        >>>     builder.testing.sum(
+        >>>         builder.ffi.from_buffer("int16_t[]", samples), len(samples))
     """
 
     def __init__(
@@ -339,6 +878,13 @@ class Builder:
         testing, mocking = self._testing.generate(self._mock_headers)
         setattr(self, "testing", testing)
         setattr(self, "mocking", mocking)
+        setattr(self, "ffi", self._testing.ffi)
+        setattr(self, "batch", self._testing.batched)
+        setattr(self, "allocations", self._testing.allocations)
+        if self.allocations is not None:
+            self.allocations.reset()
+            if self._testing.tracks_calls:
+                setattr(self, "testing", self.allocations.track(testing))
         return self
 
     def __exit__(self, type, value, traceback):
@@ -348,3 +894,10 @@ class Builder:
             os.remove(this_file)
         # Enusre all expectations have been satisfied for each mock
         self.mocking.verify()
+        if self.allocations is not None:
+            report = self.allocations.report()
+            allocations.record(report)
+            if report["leaked"] and type is None:
+                raise AssertionError(
+                    f"{report['leaked']} block(s) allocated by the code under "
+                    "test were not freed")
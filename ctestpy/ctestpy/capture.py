@@ -0,0 +1,187 @@
+"""
+Capture of the output of each test.
+
+The standard output and error of a test process are redirected, at the file
+descriptor level, to a file for the duration of each test, so that the output
+of the code under test (e.g. ``printf``) is captured along with the output of
+Python. The captured output is only logged when the test fails, or for all
+tests with ``ctestpy --show-output``.
+
+The output is written to a file (rather than kept in memory), and only its
+head and tail are read back, so chatty code under test neither fills the
+memory of the test process nor floods the log.
+"""
+import os
+import pathlib
+import sys
+import tempfile
+
+# Set (to "1") to log the captured output of all tests, it is inherited by the
+# test processes.
+ENVIRONMENT_VARIABLE = "CTESTPY_SHOW_OUTPUT"
+
+# Number of bytes kept from the start, and from the end, of the output.
+DEFAULT_LIMIT = 16 * 1024
+
+# File descriptors which are captured (standard output and error).
+FILE_DESCRIPTORS = (1, 2)
+
+# The capture running in this process, if any.
+_ACTIVE = None
+
+# The cffi FFI and the C standard library, loaded on first use.
+_LIBC = None
+
+
+def show_output():
+    """
+    Return True if the captured output of all tests should be logged (not
+    only of failing tests).
+    """
+    return bool(os.environ.get(ENVIRONMENT_VARIABLE))
+
+
+def enable_show_output():
+    """
+    Log the captured output of all tests run by this process and the test
+    processes it starts.
+    """
+    os.environ[ENVIRONMENT_VARIABLE] = "1"
+
+
+def output_path(pid=None):
+    """
+    Return the path of the file capturing the output of the process `pid` (by
+    default this process).
+    """
+    return pathlib.Path(
+        tempfile.gettempdir(), f"ctestpy-output-{pid or os.getpid()}.log")
+
+
+def _flush():
+    """
+    Flush the buffers of Python and of the C standard library, so buffered
+    output is written to the file descriptors it was intended for.
+    """
+    for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+        if stream is not None:
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+    ffi, libc = _libc()
+    libc.fflush(ffi.NULL)
+
+
+def _libc():
+    global _LIBC
+    if _LIBC is None:
+        import cffi
+        ffi = cffi.FFI()
+        ffi.cdef("int fflush(void *stream);")
+        _LIBC = (ffi, ffi.dlopen(None))
+    return _LIBC
+
+
+def _read(path, limit):
+    """
+    Read the head and tail of the file at `path`, replacing the middle of
+    files larger than twice `limit` bytes with a note.
+    """
+    with open(path, "rb") as stream:
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        if size <= 2 * limit:
+            data = stream.read()
+        else:
+            head = stream.read(limit)
+            stream.seek(size - limit)
+            data = head + \
+                f"\n[... {size - 2 * limit} bytes omitted ...]\n".encode() + \
+                stream.read()
+    return data.decode(errors="replace")
+
+
+class OutputCapture:
+    """
+    Context manager which captures the standard output and error of this
+    process, including the output of the code under test.
+
+    :param: limit number of bytes kept from the start, and from the end, of
+        the output.
+
+    :example:
+        >>> with OutputCapture() as capture:
+        >>>     build.testing.dump_state()
+        >>> print(capture.output)
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT):
+        self._limit = limit
+        self._saved = None
+        self.output = ""
+
+    def start(self):
+        global _ACTIVE
+        _flush()
+        path = output_path()
+        descriptor = os.open(
+            path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o600)
+        try:
+            self._saved = [os.dup(fd) for fd in FILE_DESCRIPTORS]
+            for fd in FILE_DESCRIPTORS:
+                os.dup2(descriptor, fd)
+        finally:
+            os.close(descriptor)
+        _ACTIVE = self
+
+    def stop(self):
+        """
+        Stop capturing, returns the captured output (also kept as `output`).
+        """
+        global _ACTIVE
+        if self._saved is None:
+            return self.output
+        _flush()
+        for fd, saved in zip(FILE_DESCRIPTORS, self._saved):
+            os.dup2(saved, fd)
+            os.close(saved)
+        self._saved = None
+        _ACTIVE = None
+        self.output = recover(limit=self._limit)
+        return self.output
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+
+def stop():
+    """
+    Stop the capture running in this process (e.g. when a test fails and the
+    process exits), returns its output or None if there is none.
+    """
+    if _ACTIVE is None:
+        return None
+    return _ACTIVE.stop()
+
+
+def recover(pid=None, limit=DEFAULT_LIMIT):
+    """
+    Return the output captured by the process `pid` (by default this process),
+    e.g. of a test process which crashed, and remove its file. Returns an
+    empty string if there is no captured output.
+    """
+    path = output_path(pid)
+    try:
+        return _read(path, limit)
+    except OSError:
+        return ""
+    finally:
+        try:
+            path.unlink()
+        except OSError:
+            pass
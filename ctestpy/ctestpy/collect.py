@@ -0,0 +1,82 @@
+"""
+Static discovery of the tests of a test suite.
+
+The source of a suite is scanned with ``ast``, so its tests can be listed
+(``ctestpy --collect-only``) without importing the suite, or the code under
+test and the modules it depends on (e.g. cffi and pycparser).
+
+Only test methods and fixtures defined at the top level of the suite are
+found; when a suite runs, it is imported and its tests are discovered from
+the module itself (see ``ctestpy.test.TestSuite``).
+"""
+import ast
+import collections
+import pathlib
+
+CollectedTest = collections.namedtuple(
+    "CollectedTest", ["name", "line", "requests", "cases"])
+CollectedTest.__doc__ = """
+A test method found in the source of a suite: its name, line, the names of the
+fixtures it requests and its number of cases (1 unless parametrized, or None
+if the cases are not literals).
+"""
+
+
+def _decorator(node, name):
+    """
+    Return the decorator `name` of a function (e.g. ``@ctestpy.fixture`` or
+    ``@fixture``), as an ``ast.Call`` if it is called, or None.
+    """
+    for decorator in node.decorator_list:
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        if isinstance(target, ast.Attribute) and target.attr == name \
+                or isinstance(target, ast.Name) and target.id == name:
+            return decorator
+    return None
+
+
+def _parametrized(decorator):
+    """
+    Return the argument names and number of cases of a parametrize decorator,
+    the number of cases is None if the values are not literals.
+    """
+    # The arguments of ``ctestpy.parametrize``, positional or keyword:
+    arguments = dict(zip(("argnames", "argvalues", "ids"), decorator.args))
+    arguments.update(
+        (keyword.arg, keyword.value) for keyword in decorator.keywords
+        if keyword.arg is not None)
+    try:
+        argnames = ast.literal_eval(arguments["argnames"])
+    except (KeyError, ValueError):
+        return [], None
+    if isinstance(argnames, str):
+        argnames = [name.strip() for name in argnames.split(",") if name.strip()]
+    try:
+        cases = len(ast.literal_eval(arguments["argvalues"]))
+    except (KeyError, TypeError, ValueError):
+        cases = None
+    return list(argnames), cases
+
+
+def collect(path):
+    """
+    Return the ``CollectedTest`` of each test method of the suite at `path`,
+    in the order they are defined.
+    """
+    path = pathlib.Path(path)
+    tree = ast.parse(path.read_bytes(), filename=str(path))
+    tests = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) \
+                or not node.name.startswith("test_"):
+            continue
+        argnames, cases = [], 1
+        parametrize = _decorator(node, "parametrize")
+        if isinstance(parametrize, ast.Call):
+            argnames, cases = _parametrized(parametrize)
+        if _decorator(node, "benchmark") is not None:
+            argnames.append("bench")
+        arguments = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        requests = [arg.arg for arg in arguments if arg.arg not in argnames]
+        tests.append(CollectedTest(node.name, node.lineno, requests, cases))
+    return tests
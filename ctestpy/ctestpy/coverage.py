@@ -0,0 +1,257 @@
+"""
+Coverage of the code under test, collected with gcov.
+
+When coverage is enabled (``ctestpy --coverage``), the code under test is
+built with gcov instrumentation. Only the source directory of the code under
+test is instrumented, so the cffi wrapper code neither slows down the tests
+nor shows up in the report.
+
+Each test process writes its counters to its own directory (via
+``GCOV_PREFIX``) when it exits, so parallel workers never contend for the same
+``.gcda`` file. Once all suites have run, the counters of all processes are
+merged into a summary and an lcov file.
+"""
+import concurrent.futures
+import json
+import os
+import pathlib
+import re
+import shutil
+import subprocess
+
+from logging import getLogger
+
+LOGGER = getLogger("coverage")
+
+# Set (to the absolute path of the coverage directory) to enable coverage, it
+# is inherited by the test processes.
+ENVIRONMENT_VARIABLE = "CTESTPY_COVERAGE"
+
+DEFAULT_DIRECTORY = ".ctestpy-coverage"
+
+# Declarations of the gcov functions used to write the counters of a module.
+DECLARATIONS = "void __gcov_dump(void);\nvoid __gcov_reset(void);\n"
+
+# File name given to the code following the code under test in the source
+# of a module (i.e. the cffi wrappers).
+WRAPPER_FILENAME = "<ctestpy-wrapper>"
+
+# Number of .gcda files passed to each gcov process.
+_GCOV_BATCH = 64
+
+# Libraries (of modules built by this process) with gcov instrumentation.
+_LIBRARIES = []
+
+
+def directory():
+    """
+    Return the coverage directory, or None if coverage is not enabled.
+    """
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    return pathlib.Path(path) if path else None
+
+
+def enable(path=DEFAULT_DIRECTORY):
+    """
+    Enable coverage for this process and the test processes it starts,
+    discarding the results of any previous run in `path`.
+    """
+    path = pathlib.Path(path).resolve()
+    for name in ("counters", "notes"):
+        shutil.rmtree(path / name, ignore_errors=True)
+        (path / name).mkdir(parents=True)
+    os.environ[ENVIRONMENT_VARIABLE] = str(path)
+    return path
+
+
+def _posix_escape(text):
+    """
+    Escape the metacharacters of a POSIX extended regular expression in
+    `text`. Unlike ``re.escape``, other characters are left as they are: a
+    backslash before them is undefined in POSIX regular expressions.
+    """
+    return re.sub(r"([.\[\]()*+?{}|^$\\])", r"\\\1", text)
+
+
+def build_options(source):
+    """
+    Return the extra keyword arguments to cffi's ``set_source`` which
+    instrument the code under test at `source` (a path).
+    """
+    source_dir = pathlib.Path(source).resolve().parent
+    return {
+        "extra_compile_args": [
+            "--coverage",
+            "-O0",
+            f"-fprofile-filter-files=^{_posix_escape(str(source_dir))}/"],
+        "extra_link_args": ["--coverage"],
+    }
+
+
+def instrument(source, path):
+    """
+    Return the `source` of the code under test with line markers, so that
+    gcov attributes its lines to `path` and anything appended (the wrappers)
+    to ``WRAPPER_FILENAME``.
+    """
+    path = pathlib.Path(path).resolve()
+    return (
+        f'#line 1 "{path}"\n{source}\n'
+        f'#line 1 "{WRAPPER_FILENAME}"\n{DECLARATIONS}')
+
+
+def keep_notes(unique_name):
+    """
+    Move the gcov notes (``.gcno``) of a build to the coverage directory,
+    before the build files are removed.
+    """
+    notes = directory() / "notes"
+    for path in pathlib.Path().glob(f"{unique_name}*.gcno"):
+        shutil.move(str(path), notes / path.name)
+
+
+def register(lib):
+    """
+    Register the library of an instrumented module, its counters are written
+    when the (test) process exits.
+    """
+    if not _LIBRARIES:
+        from ctestpy.test import at_exit
+        at_exit(dump)
+    _LIBRARIES.append(lib)
+
+
+def dump():
+    """
+    Write the counters of all instrumented modules of this process to its own
+    directory, then reset them (so they are never counted twice).
+    """
+    path = directory()
+    if path is None or not _LIBRARIES:
+        return
+    os.environ["GCOV_PREFIX"] = str(path / "counters" / str(os.getpid()))
+    # Strip all directories from the path of the object files:
+    os.environ["GCOV_PREFIX_STRIP"] = "1000"
+    for lib in _LIBRARIES:
+        lib.__gcov_dump()
+        lib.__gcov_reset()
+
+
+def _run_gcov(data_files):
+    """
+    Run gcov on a batch of ``.gcda`` files, returns the JSON documents.
+    """
+    process = subprocess.run(
+        ["gcov", "--json-format", "--stdout"] + [str(path) for path in data_files],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=True)
+    return [json.loads(line) for line in process.stdout.splitlines() if line]
+
+
+def merge(path=None, root=None):
+    """
+    Merge the counters written by all test processes.
+
+    Only files under `root` (by default the current working directory) are
+    reported, which excludes the cffi wrappers and any system headers.
+
+    Returns:
+        dict: keyed by source file, a dict with ``lines`` (counts keyed by
+            line number) and ``functions`` (``[line, count]`` keyed by name).
+    """
+    path = pathlib.Path(path) if path else directory()
+    root = str(pathlib.Path(root or os.getcwd()).resolve())
+    notes = path / "notes"
+    data_files = []
+    for data_file in sorted((path / "counters").glob("*/*.gcda")):
+        note = notes / data_file.with_suffix(".gcno").name
+        if not note.exists():
+            LOGGER.warning("No gcov notes for %s", data_file)
+            continue
+        # gcov expects the notes next to the counters:
+        target = data_file.with_suffix(".gcno")
+        if not target.exists():
+            try:
+                os.link(note, target)
+            except OSError:
+                shutil.copy(note, target)
+        data_files.append(data_file)
+
+    batches = [
+        data_files[index:index + _GCOV_BATCH]
+        for index in range(0, len(data_files), _GCOV_BATCH)]
+    coverage = {}
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        for documents in executor.map(_run_gcov, batches):
+            for document in documents:
+                for source in document["files"]:
+                    name = source["file"]
+                    if not name.startswith(root + os.sep):
+                        continue
+                    merged = coverage.setdefault(
+                        name, {"lines": {}, "functions": {}})
+                    for line in source["lines"]:
+                        number = line["line_number"]
+                        merged["lines"][number] = \
+                            merged["lines"].get(number, 0) + line["count"]
+                    for function in source["functions"]:
+                        entry = merged["functions"].setdefault(
+                            function["name"], [function["start_line"], 0])
+                        entry[1] += function["execution_count"]
+    return coverage
+
+
+def write_lcov(coverage, path):
+    """
+    Write merged coverage (see ``merge``) as an lcov tracefile.
+    """
+    records = []
+    for name, merged in sorted(coverage.items()):
+        lines = merged["lines"]
+        functions = merged["functions"]
+        records.append("TN:")
+        records.append(f"SF:{name}")
+        for function, (line, _) in sorted(functions.items()):
+            records.append(f"FN:{line},{function}")
+        for function, (_, count) in sorted(functions.items()):
+            records.append(f"FNDA:{count},{function}")
+        records.append(f"FNF:{len(functions)}")
+        records.append(
+            f"FNH:{sum(1 for _, count in functions.values() if count)}")
+        for number, count in sorted(lines.items()):
+            records.append(f"DA:{number},{count}")
+        records.append(f"LF:{len(lines)}")
+        records.append(f"LH:{sum(1 for count in lines.values() if count)}")
+        records.append("end_of_record")
+    pathlib.Path(path).write_text("\n".join(records) + "\n")
+
+
+def report(path=None):
+    """
+    Merge the counters of all test processes, log a summary and write an
+    lcov file (``coverage.info``) to the coverage directory.
+
+    Returns:
+        pathlib.Path: path of the lcov file.
+    """
+    path = pathlib.Path(path) if path else directory()
+    coverage = merge(path)
+    total = hit = 0
+    LOGGER.info("Coverage:")
+    for name, merged in sorted(coverage.items()):
+        lines = merged["lines"]
+        covered = sum(1 for count in lines.values() if count)
+        total += len(lines)
+        hit += covered
+        LOGGER.info(
+            "  %s: %d/%d lines (%.1f%%)",
+            os.path.relpath(name), covered, len(lines),
+            100.0 * covered / max(len(lines), 1))
+    LOGGER.info(
+        "  total: %d/%d lines (%.1f%%)", hit, total, 100.0 * hit / max(total, 1))
+    lcov = path / "coverage.info"
+    write_lcov(coverage, lcov)
+    LOGGER.info("Coverage written to %s", lcov)
+    return lcov
@@ -0,0 +1,341 @@
+"""
+Distribution of the tests of a run across workers, on one or more hosts.
+
+``ctestpy --serve [HOST:]PORT SUITE...`` starts a coordinator, which queues
+the test methods of the suites and hands them out to ``ctestpy worker
+HOST:PORT`` processes as they become idle, so fast hosts run more tests
+rather than waiting behind a static split. Each worker runs the test methods
+it is given as ``ctestpy`` would (in test processes, outputting their logs),
+and sends the report of each case back to the coordinator, which records the
+results (``--report-jsonl``, ``--junit-xml``, benchmarks, ...) and outputs the
+failures. A test method whose worker is lost is handed out again, from the
+case the worker was running.
+
+.. code-block:: bash
+
+    $ export CTESTPY_AUTHKEY=...
+    $ ctestpy --serve 0.0.0.0:7357 tests/test_foo.py tests/test_bar.py
+    # on each build host, in a checkout of the same project:
+    $ ctestpy worker coordinator:7357
+
+``ctestpy --local-workers N`` starts N workers on the same host (with
+``--serve``, or on a free port of the loopback interface).
+
+Workers use an artifact store (see ``ctestpy.artifacts``) and upload the
+modules they build to the coordinator, which ships them to the other workers,
+so the code under test is compiled once per run rather than once per host.
+
+Note:
+    Connections are authenticated with ``$CTESTPY_AUTHKEY`` (generated, and
+    passed to the local workers, if it is not set). Messages are pickles, so
+    the key must only be given to trusted hosts.
+"""
+import argparse
+import collections
+import contextlib
+import multiprocessing
+import multiprocessing.connection
+import os
+import secrets
+import subprocess
+import sys
+import threading
+
+from logging import getLogger
+
+from ctestpy import artifacts
+
+LOGGER = getLogger("distributed")
+
+# The key authenticating the coordinator and its workers.
+AUTHKEY_ENVIRONMENT_VARIABLE = "CTESTPY_AUTHKEY"
+
+DEFAULT_HOST = "127.0.0.1"
+
+
+def parse_address(address):
+    """
+    Return the ``(host, port)`` of an address given as ``[HOST:]PORT``.
+    """
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_HOST, int(port)
+
+
+def authkey():
+    """
+    Return the authentication key of this process as bytes, or None.
+    """
+    key = os.environ.get(AUTHKEY_ENVIRONMENT_VARIABLE)
+    return key.encode() if key else None
+
+
+class _Item:
+    """
+    A test method queued by the coordinator, to be run from the case `start`.
+    """
+
+    def __init__(self, suite, method):
+        self.suite = suite
+        self.method = method
+        self.start = 0
+
+    def __str__(self):
+        return f"{self.suite.name}::{self.method.case_name(self.start)}"
+
+
+class Coordinator:
+    """
+    Hands out the test methods of `suites` (``ctestpy.test.TestSuite``) to the
+    workers which connect to `address`, and reports the results of their
+    cases through the suites.
+
+    :param: suites the test suites to run
+    :param: address ``(host, port)`` to listen on, the port may be 0
+    :param: authkey key the workers must authenticate with
+    """
+
+    def __init__(self, suites, address=(DEFAULT_HOST, 0), authkey=None):
+        self._suites = suites
+        self._listener = multiprocessing.connection.Listener(
+            address, authkey=authkey)
+        self._closed = False
+        self._queue = collections.deque()
+        self._outstanding = 0
+        self._condition = threading.Condition()
+        # The modules built by the workers, keyed by artifact key:
+        self._artifacts = {}
+        # Number of failed and passed cases:
+        self._counts = [0, 0]
+
+    @property
+    def address(self):
+        """
+        The ``(host, port)`` the coordinator listens on.
+        """
+        return self._listener.address
+
+    def run(self):
+        """
+        Run the suites, returns once the cases of all their test methods
+        have been reported.
+        """
+        for suite in self._suites:
+            LOGGER.running(f"{suite.name}")
+            self._queue.extend(_Item(suite, method) for method in suite.methods)
+        self._outstanding = len(self._queue)
+        threading.Thread(target=self._accept, daemon=True).start()
+        try:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._outstanding)
+        finally:
+            self._closed = True
+            self._listener.close()
+        LOGGER.info("%d passed, %d failed", self._counts[True], self._counts[False])
+
+    def _accept(self):
+        """
+        Serve each worker which connects, in its own thread.
+        """
+        while not self._closed:
+            try:
+                connection = self._listener.accept()
+            except multiprocessing.AuthenticationError as error:
+                LOGGER.warning("Rejected a worker: %s", error)
+                continue
+            except (EOFError, OSError) as error:
+                if self._closed:
+                    return
+                # A peer which closed its connection during the handshake
+                # (e.g. a port scan), keep accepting workers:
+                LOGGER.warning("Failed to accept a worker: %r", error)
+                continue
+            threading.Thread(
+                target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        """
+        Hand out test methods to the worker at the other end of `connection`
+        until none are left, then tell it it is done.
+        """
+        item = None
+        try:
+            with connection:
+                while True:
+                    message = connection.recv()
+                    if message[0] == "report":
+                        _, index, report = message
+                        item.start = index + 1
+                        self._report(item, index, report)
+                        continue
+                    # The worker is ready: it completed its test method (if
+                    # any) and sends the artifacts it built meanwhile.
+                    _, uploads, stored = message
+                    if item is not None:
+                        self._complete()
+                        item = None
+                    downloads = self._exchange(uploads, stored)
+                    item = self._next()
+                    if item is None:
+                        connection.send(("done",))
+                        return
+                    connection.send((
+                        "run", item.suite.path.as_posix(), item.method.name,
+                        item.start, downloads))
+        except (EOFError, OSError) as error:
+            if item is None:
+                return
+            if item.start < item.method.cases:
+                LOGGER.warning("Lost the worker running %s (%s)", item, error)
+                self._requeue(item)
+            else:
+                self._complete()
+
+    def _exchange(self, uploads, stored):
+        """
+        Keep the artifacts uploaded by a worker, returns those it does not
+        have (`stored` are the keys of its artifacts).
+        """
+        with self._condition:
+            self._artifacts.update(uploads)
+            return {
+                key: files for key, files in self._artifacts.items()
+                if key not in stored and key not in uploads}
+
+    def _next(self):
+        """
+        Return the next queued test method, waiting for one to be requeued
+        while test methods are still running, or None once all are done.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._queue or not self._outstanding)
+            return self._queue.popleft() if self._queue else None
+
+    def _complete(self):
+        with self._condition:
+            self._outstanding -= 1
+            self._condition.notify_all()
+
+    def _requeue(self, item):
+        with self._condition:
+            self._queue.appendleft(item)
+            self._condition.notify_all()
+
+    def _report(self, item, index, report):
+        """
+        Record the report of a case run by a worker. The workers output the
+        logs of their tests, only failures are also output here.
+        """
+        with self._condition:
+            failed = not report["passed"]
+            # Which fails the case on a benchmark regression:
+            item.suite._report_case(item.method, index, report)
+            self._counts[report["passed"]] += 1
+            if failed:
+                LOGGER.failed(
+                    "%s::%s: %s", item.suite.name, item.method.case_name(index),
+                    report.get("error", "failed"))
+
+
+def run_worker(address, authkey):
+    """
+    Run the test methods handed out by the coordinator at `address`, until
+    it has none left. The artifact store must be enabled.
+    """
+    from ctestpy.test import TestSuite
+    store = artifacts.store()
+    # Only the artifacts built (or received) during the run are uploaded:
+    known = store.keys()
+    suites = {}
+    with contextlib.ExitStack() as stack:
+        connection = stack.enter_context(
+            multiprocessing.connection.Client(address, authkey=authkey))
+        while True:
+            stored = store.keys()
+            uploads = {key: store.export(key) for key in stored - known}
+            known |= stored
+            connection.send(("ready", uploads, stored))
+            message = connection.recv()
+            if message[0] == "done":
+                return
+            _, path, name, start, downloads = message
+            for key, files in downloads.items():
+                store.install(key, files)
+            known |= downloads.keys()
+            suite = suites.get(path)
+            if suite is None:
+                suite = suites[path] = TestSuite(path)
+                stack.enter_context(suite.shared_fixtures())
+            TestSuite._run_method(
+                suite.method(name),
+                lambda index, report: connection.send(("report", index, report)),
+                start)
+
+
+def start_local_workers(address, count):
+    """
+    Start `count` ``ctestpy worker`` processes connecting to `address`,
+    returns them. They inherit the environment (i.e. the authentication key
+    and artifact store) of this process.
+    """
+    host, port = address
+    return [
+        subprocess.Popen([
+            sys.executable, "-m", "ctestpy", "worker", f"{host}:{port}"])
+        for _ in range(count)]
+
+
+def serve(suites, address=None, local_workers=0):
+    """
+    Run `suites` on the workers connecting to `address` (``[HOST:]PORT``) and
+    on `local_workers` workers started on this host.
+    """
+    if authkey() is None:
+        os.environ[AUTHKEY_ENVIRONMENT_VARIABLE] = secrets.token_hex(16)
+        if address is not None:
+            LOGGER.info(
+                "Workers must set %s=%s", AUTHKEY_ENVIRONMENT_VARIABLE,
+                os.environ[AUTHKEY_ENVIRONMENT_VARIABLE])
+    coordinator = Coordinator(
+        suites, parse_address(address) if address else (DEFAULT_HOST, 0),
+        authkey())
+    LOGGER.info("Coordinator listening on %s:%d", *coordinator.address)
+    workers = start_local_workers(coordinator.address, local_workers)
+    try:
+        coordinator.run()
+    finally:
+        for worker in workers:
+            worker.wait()
+
+
+def main(args):
+    """
+    Entry point for `ctestpy worker`.
+    """
+    from ctestpy import index
+    from ctestpy.logging import TestLogListener
+    parser = argparse.ArgumentParser(
+        prog="ctestpy worker",
+        description="Run the tests handed out by a ctestpy coordinator "
+        "(`ctestpy --serve`).")
+    parser.add_argument("address", help="[HOST:]PORT of the coordinator")
+    parser.add_argument(
+        "--artifacts", metavar="DIR",
+        help="store of the built modules (default: $CTESTPY_ARTIFACTS, or the "
+        "artifacts directory of the ctestpy cache)")
+    parser.add_argument(
+        "--log-failed-only", action="store_true",
+        help="only output the logs of failing tests")
+    options = parser.parse_args(args)
+    key = authkey()
+    if key is None:
+        LOGGER.error(
+            "The worker needs the key of the coordinator in $%s",
+            AUTHKEY_ENVIRONMENT_VARIABLE)
+        sys.exit(1)
+    if options.artifacts or not artifacts.directory():
+        artifacts.enable(
+            options.artifacts or index.cache_directory().parent / "artifacts")
+    with TestLogListener(failed_only=options.log_failed_only):
+        run_worker(parse_address(options.address), key)
+    sys.exit(0)
@@ -0,0 +1,421 @@
+"""
+In-process fuzzing of functions of the code under test.
+
+The function is called in a tight loop by a worker process, with arguments
+decoded from a mutated byte string (an "input"). The parent process
+supervises the worker: when the worker crashes (or hangs), the parent saves
+the input that caused it, minimises it and restarts the worker.
+
+Usage:
+
+.. code-block:: bash
+
+    $ ctestpy fuzz src/framer.c src/framer.h parse_frame --mock src/uart.h
+"""
+import argparse
+import faulthandler
+import glob
+import hashlib
+import mmap
+import multiprocessing
+import os
+import pathlib
+import random
+import struct
+import sys
+import time
+
+from logging import getLogger
+
+from ctestpy.builder import CodeUnderTest, _buffer_format
+
+LOGGER = getLogger("fuzz")
+
+DEFAULT_MAX_LEN = 4096
+DEFAULT_TIMEOUT = 10.0
+
+# Layout of the memory shared by the parent and the worker: the number of
+# executions and the length of the current input, followed by the input.
+_STATUS = struct.Struct("=QI")
+_DATA_OFFSET = 16
+
+# Values that commonly trigger edge cases:
+_INTERESTING = (0x00, 0x01, 0x7f, 0x80, 0xfe, 0xff)
+
+# Inputs are only added to the corpus for this many distinct return values.
+_MAX_RESULTS = 256
+
+
+class FuzzTarget:
+    """
+    Calls a function of the code under test with arguments decoded from an
+    input.
+
+    Scalar arguments are read from the start of the input, the remainder of
+    the input is shared between the pointer arguments, each of which refers to
+    its own (fixed) region of scratch memory. An integer argument which
+    directly follows a pointer argument is given the number of elements in
+    that pointer's buffer.
+
+    :param: ffi the cffi ``FFI`` instance of the compiled module
+    :param: function the compiled function, e.g. ``lib.parse_frame``
+    :param: max_len maximum length of an input
+    """
+
+    def __init__(self, ffi, function, max_len=DEFAULT_MAX_LEN):
+        self._function = function
+        self._args = []
+        self._scalars = []
+        self._buffers = []
+        formats = "="
+        previous = None
+        for position, ctype in enumerate(ffi.typeof(function).args):
+            self._args.append(None)
+            if ctype.kind == "pointer":
+                item = ctype.item
+                if item.kind == "void":
+                    item = ffi.typeof("char")
+                if item.kind not in ("primitive", "enum", "struct", "union"):
+                    raise ValueError(
+                        f"Cannot fuzz `{ctype.cname}` arguments of the function")
+                scratch = bytearray(max_len)
+                self._args[position] = ffi.cast(
+                    ffi.getctype(item, "*"), ffi.from_buffer(scratch))
+                previous = [memoryview(scratch), ffi.sizeof(item), None]
+                self._buffers.append(previous)
+                continue
+            if ctype.kind not in ("primitive", "enum"):
+                raise ValueError(
+                    f"Cannot fuzz `{ctype.cname}` arguments of the function")
+            fmt = _scalar_format(ffi, ctype)
+            if previous is not None and fmt in "bhiqBHIQ":
+                # The length of the preceding buffer
+                previous[2] = position
+            else:
+                self._scalars.append(position)
+                formats += fmt
+            previous = None
+        self._format = struct.Struct(formats)
+        self._zeros = memoryview(bytes(self._format.size))
+
+    @property
+    def header_size(self):
+        """
+        int: number of bytes at the start of the input used by scalar args.
+        """
+        return self._format.size
+
+    def execute(self, data, length):
+        """
+        Call the function with the input ``data[:length]``; `data` must be a
+        writable buffer, at least `header_size` bytes long.
+        """
+        args = self._args
+        header = self._format.size
+        if length < header:
+            data[length:header] = self._zeros[:header - length]
+        for position, value in zip(self._scalars, self._format.unpack_from(data)):
+            args[position] = value
+        size = max(length - header, 0)
+        count = len(self._buffers)
+        start = header
+        for index, (scratch, itemsize, length_position) in enumerate(self._buffers):
+            end = header + size * (index + 1) // count
+            scratch[:end - start] = data[start:end]
+            if length_position is not None:
+                args[length_position] = (end - start) // itemsize
+            start = end
+        return self._function(*args)
+
+
+def _scalar_format(ffi, ctype):
+    if ctype.kind == "enum":
+        return "i" if ffi.sizeof(ctype) == 4 else "q"
+    if ctype.cname == "char":
+        return "c"
+    return _buffer_format(ffi, ctype)
+
+
+def _default_return(ffi, ctype):
+    """
+    Return a default value of the C type `ctype` (e.g. zero or NULL).
+    """
+    if ctype.kind == "void":
+        return None
+    if ctype.kind == "pointer":
+        return ffi.NULL
+    if ctype.kind == "struct" or ctype.kind == "union":
+        return ffi.new(ffi.getctype(ctype, "*"))[0]
+    if ctype.cname == "char":
+        return b"\0"
+    if ctype.cname in ("float", "double"):
+        return 0.0
+    return 0
+
+
+def bind_default_returns(ffi, lib, names):
+    """
+    Replace the mocks of the externs `names` with functions that return a
+    default value (zero or NULL) without any further checks, so that mocked
+    dependencies add as little overhead as possible to the fuzzing loop.
+    """
+    for name in names:
+        value = _default_return(ffi, ffi.typeof(getattr(lib, name)).result)
+        ffi.def_extern(name)(lambda *args, _value=value: _value)
+
+
+class Fuzzer:
+    """
+    Fuzz a ``FuzzTarget``, keeping the corpus of inputs in `corpus` on disk.
+
+    Inputs which produce a previously unseen return value are added to the
+    corpus. Inputs which crash the worker are saved to ``<corpus>/crashes``,
+    along with a minimised version (``.min``), and inputs which stop it making
+    progress for `timeout` seconds are saved to ``<corpus>/hangs``.
+
+    :param: target the ``FuzzTarget`` to fuzz
+    :param: corpus path of the corpus directory
+    :param: max_len maximum length of an input
+    :param: seed seed for the random number generator
+    :param: timeout seconds without progress after which the worker is
+        considered to have hung
+    """
+
+    def __init__(
+            self,
+            target,
+            corpus,
+            max_len=DEFAULT_MAX_LEN,
+            seed=None,
+            timeout=DEFAULT_TIMEOUT):
+        self._target = target
+        self._corpus = pathlib.Path(corpus)
+        self._crashes = self._corpus / "crashes"
+        self._hangs = self._corpus / "hangs"
+        self._max_len = max(max_len, target.header_size)
+        self._seed = seed if seed is not None else random.randrange(2 ** 32)
+        self._timeout = timeout
+        self._shared = mmap.mmap(-1, _DATA_OFFSET + self._max_len)
+        self._crashes.mkdir(parents=True, exist_ok=True)
+        self._hangs.mkdir(exist_ok=True)
+
+    def _load_corpus(self):
+        inputs = [
+            path.read_bytes()[:self._max_len]
+            for path in sorted(self._corpus.iterdir()) if path.is_file()]
+        return inputs or [bytes(self._target.header_size + 16)]
+
+    def _save(self, directory, data, suffix=""):
+        path = directory / (hashlib.sha1(data).hexdigest() + suffix)
+        path.write_bytes(data)
+        return path
+
+    def _fuzz(self, runs, seed):
+        """
+        Worker process: execute `runs` mutated inputs.
+        """
+        # Crashes are expected, there is no need to dump tracebacks for them.
+        faulthandler.disable()
+        rng = random.Random(seed)
+        inputs = self._load_corpus()
+        shared = self._shared
+        data = memoryview(shared)[_DATA_OFFSET:]
+        execute = self._target.execute
+        mutate = self._mutate
+        pack_into = _STATUS.pack_into
+        results = set()
+        for execs in range(runs):
+            base = inputs[rng.randrange(len(inputs))]
+            length = len(base)
+            data[:length] = base
+            length = mutate(rng, data, length)
+            pack_into(shared, 0, execs, length)
+            result = execute(data, length)
+            if isinstance(result, (int, float)) and \
+                    result not in results and len(results) < _MAX_RESULTS:
+                results.add(result)
+                inputs.append(bytes(data[:length]))
+                self._save(self._corpus, inputs[-1])
+        pack_into(shared, 0, runs, 0)
+
+    def _mutate(self, rng, data, length):
+        """
+        Apply a few random mutations to ``data[:length]`` in place, returns
+        the new length.
+        """
+        randrange = rng.randrange
+        for _ in range(1 + randrange(4)):
+            operation = randrange(6)
+            if length == 0 or operation == 0:
+                if length < self._max_len:
+                    # insert a random byte
+                    position = randrange(length + 1)
+                    data[position + 1:length + 1] = data[position:length]
+                    data[position] = randrange(256)
+                    length += 1
+            elif operation == 1:
+                position = randrange(length)
+                data[position] ^= 1 << randrange(8)
+            elif operation == 2:
+                data[randrange(length)] = randrange(256)
+            elif operation == 3:
+                data[randrange(length)] = _INTERESTING[randrange(len(_INTERESTING))]
+            elif operation == 4:
+                # delete a byte
+                position = randrange(length)
+                data[position:length - 1] = data[position + 1:length]
+                length -= 1
+            else:
+                # overwrite with a copy of another part of the input
+                start, position = randrange(length), randrange(length)
+                size = randrange(1, length - max(start, position) + 1)
+                data[position:position + size] = data[start:start + size]
+        return length
+
+    def _execute_once(self, data):
+        faulthandler.disable()
+        buffer = bytearray(max(len(data), self._target.header_size))
+        buffer[:len(data)] = data
+        self._target.execute(buffer, len(data))
+
+    def crashes(self, data):
+        """
+        Return True if executing `data` crashes a worker process.
+        """
+        process = multiprocessing.Process(target=self._execute_once, args=(data,))
+        process.start()
+        process.join(self._timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        return process.exitcode != 0
+
+    def minimise(self, data, max_attempts=1000):
+        """
+        Return the smallest input (found within `max_attempts` executions) that
+        still crashes, by removing ever smaller chunks of `data`.
+        """
+        attempts = 0
+        chunk = len(data) // 2
+        while chunk >= 1 and attempts < max_attempts:
+            start = 0
+            while start < len(data) and attempts < max_attempts:
+                candidate = data[:start] + data[start + chunk:]
+                attempts += 1
+                if self.crashes(candidate):
+                    data = candidate
+                else:
+                    start += chunk
+            chunk //= 2
+        return data
+
+    def run(self, runs, max_crashes=1):
+        """
+        Fuzz for `runs` executions, or until `max_crashes` crashing (or
+        hanging) inputs have been found, returns the paths of those inputs.
+        """
+        found = []
+        done = 0
+        rng = random.Random(self._seed)
+        started = time.monotonic()
+        while done < runs:
+            worker = multiprocessing.Process(
+                target=self._fuzz, args=(runs - done, rng.randrange(2 ** 32)))
+            worker.start()
+            execs, progress, reported = 0, time.monotonic(), time.monotonic()
+            hung = False
+            while worker.is_alive():
+                worker.join(0.5)
+                now = time.monotonic()
+                count, _ = _STATUS.unpack_from(self._shared)
+                if count != execs:
+                    execs, progress = count, now
+                elif now - progress > self._timeout:
+                    hung = True
+                    worker.kill()
+                    worker.join()
+                if now - reported > 5:
+                    reported = now
+                    LOGGER.info(
+                        "%d execs, %.0f execs/s",
+                        done + execs,
+                        (done + execs) / (now - started))
+            execs, length = _STATUS.unpack_from(self._shared)
+            if worker.exitcode == 0:
+                done = runs
+                break
+            data = bytes(self._shared[_DATA_OFFSET:_DATA_OFFSET + length])
+            if hung:
+                path = self._save(self._hangs, data)
+                LOGGER.error(
+                    "Hang (no progress for %ss) after %d execs, input: %s",
+                    self._timeout,
+                    done + execs,
+                    path)
+            else:
+                path = self._save(self._crashes, data)
+                LOGGER.error(
+                    "Crash (exit code %s) after %d execs, input: %s",
+                    worker.exitcode,
+                    done + execs,
+                    path)
+                self._save(self._crashes, self.minimise(data), ".min")
+            found.append(path)
+            # Skip the crashing input:
+            done += execs + 1
+            if len(found) >= max_crashes:
+                break
+        elapsed = time.monotonic() - started
+        LOGGER.info(
+            "%d execs in %.1fs (%.0f execs/s), %d crashes",
+            done,
+            elapsed,
+            done / elapsed if elapsed else 0,
+            len(found))
+        return found
+
+
+def main(args):
+    """
+    Entry point for `ctestpy fuzz`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="ctestpy fuzz",
+        description="Fuzz a function of the code under test.")
+    parser.add_argument("source", type=pathlib.Path, help="CUT source file")
+    parser.add_argument("header", type=pathlib.Path, help="CUT header file")
+    parser.add_argument("function", help="name of the function to fuzz")
+    parser.add_argument(
+        "--mock", type=pathlib.Path, action="append", default=[],
+        help="header of a dependency to mock (may be repeated)")
+    parser.add_argument(
+        "--corpus", type=pathlib.Path, default=pathlib.Path("corpus"),
+        help="corpus directory (default: %(default)s)")
+    parser.add_argument(
+        "--runs", type=int, default=1000000,
+        help="number of executions (default: %(default)s)")
+    parser.add_argument(
+        "--max-len", type=int, default=DEFAULT_MAX_LEN,
+        help="maximum input length in bytes (default: %(default)s)")
+    parser.add_argument("--seed", type=int, help="random seed")
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_TIMEOUT,
+        help="seconds without progress before a hang is reported")
+    parser.add_argument(
+        "--max-crashes", type=int, default=1,
+        help="stop after this many crashes (default: %(default)s)")
+    options = parser.parse_args(args)
+
+    cut = CodeUnderTest(options.source, options.header)
+    lib, mocking = cut.generate(options.mock)
+    for this_file in glob.glob(f"{cut.unique_name}*"):
+        os.remove(this_file)
+    bind_default_returns(cut.ffi, lib, mocking._methods)
+    fuzzer = Fuzzer(
+        FuzzTarget(cut.ffi, getattr(lib, options.function), options.max_len),
+        options.corpus,
+        options.max_len,
+        options.seed,
+        options.timeout)
+    crashes = fuzzer.run(options.runs, options.max_crashes)
+    sys.exit(1 if crashes else 0)
@@ -0,0 +1,416 @@
+"""
+Persistent index of the headers used by the code under test.
+
+For each header, the index records the declarations it contributes to the
+cffi ``cdef`` (split per top-level declaration), its functions with their
+signatures, its typedefs and its integer macros. Entries are keyed by a hash
+of the preprocessed header, and stored as JSON in a cache directory shared by
+all projects and runs, so a header (e.g. a large vendor header) is only ever
+parsed once. The builds only parse the code of the source file of the code
+under test itself, the functions of its headers come from the index.
+
+A header is only preprocessed again when one of the files it includes (or
+one of the include directories) changed since it was last looked up, so a
+warm lookup does not run the preprocessor.
+
+The cache directory is ``$CTESTPY_CACHE_DIR``, or by default
+``$XDG_CACHE_HOME/ctestpy`` (``~/.cache/ctestpy``).
+"""
+import ast
+import concurrent.futures
+import hashlib
+import json
+import os
+import pathlib
+import re
+import subprocess
+import tempfile
+import time
+
+from logging import getLogger
+
+import pycparser
+import pycparser.c_ast
+import pycparser.c_generator
+
+LOGGER = getLogger("index")
+
+CACHE_ENVIRONMENT_VARIABLE = "CTESTPY_CACHE_DIR"
+
+# Changing the format of the entries must invalidate the index.
+INDEX_VERSION = 1
+
+# Entries already loaded by this process, keyed by digest.
+_ENTRIES = {}
+
+_LINEMARKER = re.compile(r'^# \d+ "(?P<file>[^"]*)"(?P<flags>( \d)*)$')
+_DEFINE = re.compile(r"^#define (?P<name>[A-Za-z]\w*)(?P<params>\()?\s*(?P<value>.*)$")
+_INTEGER = re.compile(
+    r"^(?:0[xX](?P<hex>[0-9a-fA-F]+)|0(?P<oct>[0-7]+)|(?P<dec>\d+))[uUlL]*$")
+_TOKEN = re.compile(r"\s*(?:(?P<number>\d\w*)|(?P<name>[A-Za-z_]\w*)|(?P<op><<|>>|\S))")
+
+
+def cache_directory():
+    """
+    Return the directory holding the header index.
+    """
+    path = os.environ.get(CACHE_ENVIRONMENT_VARIABLE)
+    if not path:
+        path = pathlib.Path(
+            os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache",
+            "ctestpy")
+    return pathlib.Path(path) / "headers"
+
+
+class HeaderEntry:
+    """
+    The index entry of a header.
+
+    :param: digest content hash of the preprocessed header
+    :param: declarations list of ``[text, function name or None]`` for each
+        top-level declaration, or None if the header cannot be parsed on its
+        own (e.g. it relies on types declared by another header).
+    :param: functions signatures of the declared functions, keyed by name, as
+        dicts with ``args``, ``params`` and ``result``.
+    :param: typedefs names of the declared types
+    :param: macros values of the integer macros defined by the header (and
+        any non-system header it includes), keyed by name.
+    """
+
+    def __init__(self, digest, declarations, functions, typedefs, macros):
+        self.digest = digest
+        self.declarations = declarations
+        self.functions = functions
+        self.typedefs = typedefs
+        self.macros = macros
+
+    def as_dict(self):
+        return dict(vars(self), version=INDEX_VERSION)
+
+
+def _split(output):
+    """
+    Split the output of ``gcc -E -dD`` into the code, the macros defined
+    outside of system headers (as text, keyed by name) and the files it
+    includes.
+    """
+    code = []
+    macros = {}
+    files = set()
+    user_file = False
+    for line in output.splitlines():
+        if not line.startswith("#"):
+            code.append(line)
+            continue
+        marker = _LINEMARKER.match(line)
+        if marker:
+            user_file = not marker.group("file").startswith("<") \
+                and "3" not in marker.group("flags").split()
+            if not marker.group("file").startswith("<"):
+                files.add(marker.group("file"))
+            continue
+        define = _DEFINE.match(line)
+        if define and user_file and not define.group("params"):
+            macros[define.group("name")] = define.group("value").strip()
+        elif line.startswith("#undef "):
+            macros.pop(line.split()[1], None)
+    return "\n".join(code), macros, sorted(files)
+
+
+def source_code(output):
+    """
+    Return the code of the file preprocessed by ``gcc -E`` (without ``-P``,
+    from standard input), without the code of the headers it includes.
+    """
+    code = []
+    source = False
+    for line in output.splitlines():
+        marker = _LINEMARKER.match(line)
+        if marker:
+            source = marker.group("file") == "<stdin>"
+        elif source:
+            code.append(line)
+    return "\n".join(code)
+
+
+def _stat(paths):
+    """
+    Return the modification time and size of each of `paths` (None for those
+    which do not exist), to detect changes.
+    """
+    stats = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stats[path] = None
+        else:
+            stats[path] = [stat.st_mtime_ns, stat.st_size]
+    return stats
+
+
+def _evaluate(expression, macros, evaluated):
+    """
+    Evaluate an integer macro, returns None if it is not an integer
+    constant expression (e.g. a string, a float or a cast).
+    """
+    python = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        token = _TOKEN.match(expression, position)
+        if not token:
+            return None
+        position = token.end()
+        if token.group("number"):
+            number = _INTEGER.match(token.group("number"))
+            if not number:
+                return None
+            if number.group("hex"):
+                python.append(str(int(number.group("hex"), 16)))
+            elif number.group("oct"):
+                python.append(str(int(number.group("oct"), 8)))
+            else:
+                python.append(number.group("dec"))
+        elif token.group("name"):
+            value = _macro_value(token.group("name"), macros, evaluated)
+            if value is None:
+                return None
+            python.append(str(value))
+        elif token.group("op") in ("(", ")", "+", "-", "*", "%", "<<", ">>",
+                                   "&", "|", "^", "~"):
+            python.append(token.group("op"))
+        elif token.group("op") == "/":
+            python.append("//")
+        else:
+            return None
+    if not python:
+        return None
+    if ("//" in python or "%" in python) and "-" in python:
+        # Python rounds down rather than towards zero.
+        return None
+    try:
+        tree = ast.parse(" ".join(python), mode="eval")
+    except SyntaxError:
+        return None
+    allowed = (
+        ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.operator,
+        ast.unaryop)
+    if not all(isinstance(node, allowed) for node in ast.walk(tree)):
+        return None
+    try:
+        value = eval(compile(tree, "<macro>", "eval"), {"__builtins__": {}})
+    except (ArithmeticError, ValueError):
+        return None
+    if not isinstance(value, int) or not -2 ** 63 <= value < 2 ** 64:
+        return None
+    return value
+
+
+def _macro_value(name, macros, evaluated):
+    if name not in evaluated:
+        # Guard against recursive definitions:
+        evaluated[name] = None
+        if name in macros:
+            evaluated[name] = _evaluate(macros[name], macros, evaluated)
+    return evaluated[name]
+
+
+def _integer_macros(macros):
+    """
+    Return the values of the macros which are integer constants.
+    """
+    evaluated = {}
+    values = {name: _macro_value(name, macros, evaluated) for name in macros}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def _parse(code):
+    """
+    Split preprocessed header code into its top-level declarations, and find
+    its functions and typedefs.
+    """
+    generator = pycparser.c_generator.CGenerator()
+    declarations = []
+    functions = {}
+    typedefs = []
+    for node in pycparser.CParser().parse(code).ext:
+        if isinstance(node, pycparser.c_ast.FuncDef):
+            declarations.append([generator.visit(node), None])
+            continue
+        if isinstance(node, pycparser.c_ast.Pragma):
+            declarations.append([generator.visit(node) + "\n", None])
+            continue
+        function = None
+        if isinstance(node, pycparser.c_ast.Typedef):
+            typedefs.append(node.name)
+        elif isinstance(node, pycparser.c_ast.Decl) \
+                and isinstance(node.type, pycparser.c_ast.FuncDecl):
+            function = node.name
+            params = node.type.args.params if node.type.args else []
+            functions[function] = {
+                "args": [param.name for param in params],
+                "params": [generator.visit(param.type) for param in params],
+                "result": generator.visit(node.type.type),
+            }
+        declarations.append([generator.visit(node) + ";\n", function])
+    return declarations, functions, typedefs
+
+
+class HeaderIndex:
+    """
+    Index of headers, backed by a cache directory.
+
+    :param: directory cache directory, by default ``cache_directory()``.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = pathlib.Path(directory or cache_directory())
+
+    def _preprocess(self, header, include_dirs):
+        process = subprocess.run(
+            ["gcc", "-E", "-dD", "-"] + [f"-I{inc}" for inc in include_dirs],
+            input=f'#include "{header}"\n',
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True)
+        return process.stdout
+
+    def _read(self, name):
+        try:
+            data = json.loads((self._directory / f"{name}.json").read_text())
+        except (OSError, ValueError):
+            return None
+        if data.pop("version", None) != INDEX_VERSION:
+            return None
+        return data
+
+    def _load(self, digest):
+        data = self._read(digest)
+        return None if data is None else HeaderEntry(**data)
+
+    def _write(self, name, data):
+        """
+        Write a JSON file atomically, so concurrent test processes never read
+        a partial file.
+        """
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    "w", dir=self._directory, suffix=".tmp",
+                    delete=False) as stream:
+                json.dump(data, stream)
+            os.replace(stream.name, self._directory / f"{name}.json")
+        except OSError as error:
+            LOGGER.debug("Could not store the index entry: %s", error)
+
+    def _store(self, entry):
+        self._write(entry.digest, entry.as_dict())
+
+    def _unchanged(self, stamp):
+        """
+        Return the digest of the entry of a lookup (`stamp`, see ``lookup``)
+        if none of the files it depends on changed since, otherwise None.
+        """
+        data = self._read(stamp)
+        if data is None or _stat(data["files"]) != data["files"]:
+            return None
+        return data["digest"]
+
+    def lookup(self, header, include_dirs):
+        """
+        Return the ``HeaderEntry`` of `header`, parsing it only if it is not
+        in the index yet.
+        """
+        # The files and include directories of the last lookup of the header
+        # (a header added to a directory changes its modification time):
+        stamp = "lookup-" + hashlib.sha256(json.dumps(
+            [INDEX_VERSION, str(header), list(map(str, include_dirs)),
+             os.getcwd()]).encode()).hexdigest()
+        digest = self._unchanged(stamp)
+        entry = None
+        if digest is not None:
+            entry = _ENTRIES.get(digest) or self._load(digest)
+        if entry is not None:
+            _ENTRIES[digest] = entry
+            return entry
+        start = time.time_ns()
+        code, macros, files = _split(self._preprocess(header, include_dirs))
+        digest = hashlib.sha256(
+            json.dumps([INDEX_VERSION, code, macros]).encode()).hexdigest()
+        stats = _stat(files + [str(inc) for inc in include_dirs])
+        # A file modified while (or just before) it was preprocessed may be
+        # modified again without its modification time changing:
+        if all(stat is None or stat[0] < start for stat in stats.values()):
+            self._write(
+                stamp, {"version": INDEX_VERSION, "digest": digest, "files": stats})
+        entry = _ENTRIES.get(digest) or self._load(digest)
+        if entry is None:
+            try:
+                declarations, functions, typedefs = _parse(code)
+            except pycparser.c_parser.ParseError as error:
+                LOGGER.debug("Header %s cannot be indexed: %s", header, error)
+                declarations, functions, typedefs = None, {}, []
+            entry = HeaderEntry(
+                digest, declarations, functions, typedefs,
+                _integer_macros(macros))
+            self._store(entry)
+        _ENTRIES[digest] = entry
+        return entry
+
+    def lookup_all(self, headers, include_dirs):
+        """
+        Return the ``HeaderEntry`` of each header (preprocessed in parallel).
+        """
+        if len(headers) <= 1:
+            return [self.lookup(header, include_dirs) for header in headers]
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            return list(executor.map(
+                lambda header: self.lookup(header, include_dirs), headers))
+
+
+def declarations(entries, local_functions):
+    """
+    Return the ``cdef`` of the headers of `entries`, where each declaration
+    is only included once. Functions that are not local to the code under test
+    are declared as ``extern "Python+C"``, so they can be mocked.
+    """
+    seen = set()
+    result = []
+    for entry in entries:
+        for text, function in entry.declarations:
+            if text in seen:
+                continue
+            seen.add(text)
+            if function is not None and function not in local_functions:
+                text = 'extern "Python+C" ' + text
+            result.append(text)
+    return "".join(result)
+
+
+def macros(entries):
+    """
+    Return the integer macros of the headers of `entries`, excluding any that
+    would clash with a declared name.
+    """
+    declared = set()
+    values = {}
+    for entry in entries:
+        declared.update(entry.functions)
+        declared.update(entry.typedefs)
+        values.update(entry.macros)
+    return {name: value for name, value in values.items() if name not in declared}
+
+
+def macro_definitions(values):
+    """
+    Return the ``cdef`` and the C source defining the macros `values`. The C
+    source only defines a macro if the code under test did not include it,
+    as cffi checks the value of each macro against the compiler.
+    """
+    cdef = "".join(f"#define {name} {value}\n" for name, value in values.items())
+    source = "".join(
+        f"#ifndef {name}\n#define {name} {value}{'ULL' if value >= 2 ** 63 else ''}\n"
+        "#endif\n"
+        for name, value in values.items())
+    return cdef, source
@@ -1,8 +1,13 @@
 import io
 import logging
+import logging.handlers
+import os
 import sys
+import types
 
 DEFAULT_FORMAT = "[%(asctime)s] %(levelname)-20s: %(message)s"
+# The colorised level names include 13 characters of escape codes:
+DEFAULT_PLAIN_FORMAT = "[%(asctime)s] %(levelname)-7s: %(message)s"
 DEFAULT_DATEFMT = "%Y-%m-%d %H:%M:%S"
 DEFAULT_LEVEL = logging.INFO
 DEFAULT_LOGFILE = ""
@@ -13,6 +18,9 @@ LOG_RUNNING_LEVEL = 220
 LOG_PASSED_LEVEL = 221
 LOG_FAILED_LEVEL = 222
 
+# Queue of the running `TestLogListener`, which all processes log through.
+_QUEUE = None
+
 
 class Colors:
     """
@@ -33,6 +41,9 @@ class MyFormatter(logging.Formatter):
     """
     A log formatter with the option to colorise log entries using ANSI escape
     codes.
+
+    The escape codes of each level are computed once, and records are never
+    modified, so other handlers of the same records are not affected.
     Args:
         colorise (bool): True if the logging formatter should apply colors
             to the log messages (not recommended when directing to logfiles).
@@ -50,6 +61,9 @@ class MyFormatter(logging.Formatter):
         "CRITICAL": Colors.RED,
     }
 
+    # Levels whose message is also colorised:
+    _COLORISED_MESSAGES = ("RUNNING", "FAILED", "PASSED")
+
     # ANSI escape codes that format output:
     _ESCAPE_CODE = {
         "COLOR": "\033[%dm",
@@ -60,50 +74,86 @@ class MyFormatter(logging.Formatter):
     def __init__(self, colorise=False, **kwargs):
         self._colorise = colorise
         super().__init__(**kwargs)
+        escape = type(self)._ESCAPE_CODE
+        # Level name -> (colorised level name, prefix of the message or "")
+        self._levels = {}
+        if colorise:
+            for name, color in type(self)._COLOR_MAP.items():
+                prefix = escape["COLOR"] % color
+                self._levels[name] = (
+                    f"{prefix}{escape['BOLD']}{name}{escape['RESET']}",
+                    prefix if name in type(self)._COLORISED_MESSAGES else "")
+        self._reset = escape["RESET"]
+        self._time = (None, None)
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is None:
+            # The default format includes the milliseconds:
+            return super().formatTime(record, datefmt)
+        # Records are logged many times per second, only format the time of
+        # each second once:
+        second = int(record.created)
+        if self._time[0] != second:
+            self._time = (second, super().formatTime(record, datefmt))
+        return self._time[1]
+
+    def formatMessage(self, record):
+        level = self._levels.get(record.levelname)
+        if level is None:
+            return super().formatMessage(record)
+        # Format a copy of the record's attributes, not the record itself:
+        values = dict(vars(record), levelname=level[0])
+        if level[1]:
+            values["message"] = f"{level[1]}{record.message}{self._reset}"
+        return self._style.format(types.SimpleNamespace(**values))
+
 
-    def format(self, record):
-        if self._colorise:
-            color = type(self)._COLOR_MAP.get(record.levelname)
-            if color:
-                record.levelname = "{}{}{}{}".format(
-                    type(self)._ESCAPE_CODE["COLOR"] % color,
-                    type(self)._ESCAPE_CODE["BOLD"],
-                    record.levelname,
-                    type(self)._ESCAPE_CODE["RESET"])
-                # Colorise the message part of the custom log levels:
-                colorised_levels = [
-                    logging.RUNNING,
-                    logging.FAILED,
-                    logging.PASSED]
-                if record.levelno in colorised_levels:
-                    record.msg = "{}{}{}".format(
-                        type(self)._ESCAPE_CODE["COLOR"] % color,
-                        record.msg,
-                        type(self)._ESCAPE_CODE["RESET"])
-        return logging.Formatter.format(self, record)
+# Handler added to the root logger by `configure_logger`.
+_HANDLER = None
 
 
 def configure_logger(
         level: int = DEFAULT_LEVEL,
-        fmt: str = DEFAULT_FORMAT,
+        fmt: str = None,
         datefmt: str = DEFAULT_DATEFMT,
-        stream: io.TextIOWrapper = DEFAULT_STREAM):
+        stream: io.TextIOWrapper = DEFAULT_STREAM,
+        colorise: bool = None):
     """
-    Configure the Python logger.
+    Configure the Python logger. Calling it again replaces the configuration,
+    rather than adding another handler.
     Args:
         level (int): Specify the minimum log level for messages emitted
             by the logger.
-        fmt (str): Use the specified format string for the log messages.
+        fmt (str): Use the specified format string for the log messages, by
+            default `DEFAULT_FORMAT` (or `DEFAULT_PLAIN_FORMAT` when the log
+            messages are not colorised).
         datefmt (str): Use the specified date/time format, as accepted by
             `time.strftime()`.
         stream (str): If specified, indicates the output stream to which log
             messages shall be emitted.
+        colorise (bool): True to colorise the log messages, by default only
+            if `stream` is a terminal.
     """
+    global _HANDLER
     _configure_custom_log_levels()
     root = logging.getLogger("")
     root.setLevel(level)
+    if _HANDLER is not None:
+        root.removeHandler(_HANDLER)
+        _HANDLER = None
     if stream:
-        _configure_stream_handler(root, stream, fmt, datefmt)
+        if colorise is None:
+            colorise = _is_terminal(stream)
+        if fmt is None:
+            fmt = DEFAULT_FORMAT if colorise else DEFAULT_PLAIN_FORMAT
+        _HANDLER = _configure_stream_handler(root, stream, fmt, datefmt, colorise)
+
+
+def _is_terminal(stream):
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
 
 
 def add_log_level(name: str, level: int, fname: str = None):
@@ -128,12 +178,18 @@ def add_log_level(name: str, level: int, fname: str = None):
                 logger.logfoo("a log message with log level `FOO`")
                 logging.logfoo("another log message with log level `FOO`")
                 assert logging.FOO == 15, "logging.FOO is not as expected"
+    Adding a level that was already added (with the same value and function)
+    does nothing.
     Raises:
         AttributeError: If the level name is already an attribute of the
             `logging` module or if the method name is already present
     """
     if fname is None:
         fname = name.lower()
+    if getattr(logging, name, None) == level \
+            and getattr(logging.getLoggerClass(), fname, None) is not None \
+            and logging.getLevelName(level) == name:
+        return
     if hasattr(logging, name):
         raise AttributeError('Log level `{}` already exists'.format(name))
     if hasattr(logging, fname):
@@ -161,11 +217,136 @@ def _configure_custom_log_levels():
     add_log_level("RUNNING", LOG_RUNNING_LEVEL)
 
 
-def _configure_stream_handler(root, stream, fmt, datefmt):
+def _configure_stream_handler(root, stream, fmt, datefmt, colorise=True):
     console_stream = logging.StreamHandler(stream=stream)
     console_stream.setFormatter(
         MyFormatter(
-            colorise=True,
+            colorise=colorise,
             fmt=fmt,
             datefmt=datefmt))
     root.addHandler(console_stream)
+    return console_stream
+
+
+class _TestFilter(logging.Filter):
+    """
+    Tags each record with the test being run by this process (if any), as
+    ``record.ctestpy_test``, i.e. ``(pid, test name)``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.test = None
+
+    def filter(self, record):
+        if self.test is not None and not hasattr(record, "ctestpy_test"):
+            record.ctestpy_test = self.test
+        return True
+
+
+_TEST_FILTER = _TestFilter()
+
+
+def begin_test(name):
+    """
+    Mark the start of a test (run by this process), the records logged until
+    ``end_test`` belong to the test.
+    """
+    _TEST_FILTER.test = (os.getpid(), name)
+
+
+def end_test(passed, test=None):
+    """
+    Mark the end of a test, its buffered records are then output together.
+
+    Args:
+        passed (bool): True if the test passed.
+        test (tuple): the test, by default the test run by this process; e.g.
+            the test of a worker that crashed, as ``(pid, test name)``.
+    """
+    if test is None:
+        test, _TEST_FILTER.test = _TEST_FILTER.test, None
+    if _QUEUE is not None and test is not None:
+        _QUEUE.put_nowait(("end", test, passed))
+
+
+def flush():
+    """
+    Wait for the records logged by this process to be sent to the listener.
+    Test processes exit with `os._exit`, which would otherwise discard them.
+    """
+    if _QUEUE is not None:
+        _QUEUE.close()
+        _QUEUE.join_thread()
+
+
+class TestLogListener(logging.handlers.QueueListener):
+    """
+    Context manager which routes the records logged by this process, and the
+    test processes it starts, through a queue to the handlers of the root
+    logger. Logging never blocks the test processes, and output is only
+    written by the listener's thread.
+
+    The records of each test are buffered, and output together once the test
+    has finished, so the output of tests run concurrently is not interleaved.
+
+    Args:
+        failed_only (bool): if True, only the result of each passing test is
+            output, along with all records of failing tests.
+    """
+
+    def __init__(self, failed_only=False):
+        self._root = logging.getLogger()
+        self._failed_only = failed_only
+        self._buffers = {}
+        self._queue_handler = None
+        import multiprocessing
+        super().__init__(
+            multiprocessing.Queue(), *self._root.handlers,
+            respect_handler_level=True)
+
+    def start(self):
+        global _QUEUE
+        self._queue_handler = logging.handlers.QueueHandler(self.queue)
+        self._queue_handler.addFilter(_TEST_FILTER)
+        for handler in self.handlers:
+            self._root.removeHandler(handler)
+        self._root.addHandler(self._queue_handler)
+        _QUEUE = self.queue
+        super().start()
+
+    def stop(self):
+        global _QUEUE
+        super().stop()
+        # Output the records of any test which never finished:
+        for records in self._buffers.values():
+            for record in records:
+                super().handle(record)
+        self._buffers = {}
+        self._root.removeHandler(self._queue_handler)
+        for handler in self.handlers:
+            self._root.addHandler(handler)
+        _QUEUE = None
+        self.queue.close()
+
+    def handle(self, record):
+        if isinstance(record, tuple):
+            _, test, passed = record
+            records = self._buffers.pop(test, [])
+            if passed and self._failed_only:
+                records = [
+                    record for record in records
+                    if record.levelno >= LOG_PASSED_LEVEL]
+            for record in records:
+                super().handle(record)
+        elif hasattr(record, "ctestpy_test"):
+            self._buffers.setdefault(record.ctestpy_test, []).append(record)
+        else:
+            super().handle(record)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
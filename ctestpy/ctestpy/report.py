@@ -0,0 +1,110 @@
+"""
+Machine readable results of a test run.
+
+With ``ctestpy --report-jsonl PATH`` the result of each test is written to
+`PATH` as a line of JSON as soon as the test completes, so a run which is
+killed still leaves the results of the tests it completed. Each line has:
+
+    * suite, test: names of the suite and of the test (case).
+    * passed: True if the test passed, and error (if it did not).
+    * wall, cpu: wall clock and CPU time taken by the test, in seconds.
+    * maxrss: peak resident set size of the test process so far, in KiB.
+    * builds: hits and misses of the build cache of the test process, and
+      the misses loaded from the artifact store (see ``ctestpy.artifacts``).
+    * timestamp: when the test completed (ISO 8601).
+
+A test whose process crashed only has its wall time. With ``ctestpy
+--junit-xml PATH`` the results are also written as JUnit XML once all suites
+have run.
+"""
+import datetime
+import json
+import pathlib
+import xml.etree.ElementTree as ElementTree
+
+# Fields of a test's report (see `ctestpy.test.TestMethod.run_case`) which are
+# part of its result.
+FIELDS = ("passed", "error", "wall", "cpu", "maxrss", "builds")
+
+
+class Results:
+    """
+    Collects the result of each test of a run, streaming them to `jsonl` (a
+    path) if given.
+
+    :example:
+        >>> with Results("results.jsonl") as results:
+        >>>     TestSuite("tests/test_foo.py", results=results).run()
+        >>> write_junit(results.results, "results.xml")
+    """
+
+    def __init__(self, jsonl=None):
+        self.results = []
+        self._stream = None
+        if jsonl is not None:
+            # Line buffered, so each result is written as soon as it is added:
+            self._stream = open(jsonl, "w", buffering=1)
+
+    def add(self, suite, test, report):
+        """
+        Add the result of `test` (of `suite`) from its report.
+        """
+        result = {"suite": suite, "test": test}
+        result.update(
+            (field, report[field]) for field in FIELDS if field in report)
+        result["timestamp"] = datetime.datetime.now().isoformat(timespec="seconds")
+        self.results.append(result)
+        if self._stream is not None:
+            self._stream.write(json.dumps(result) + "\n")
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+def write_junit(results, path):
+    """
+    Write `results` (see ``Results``) as JUnit XML, with a ``testsuite`` per
+    suite. The resource usage of each test is written as its properties.
+    """
+    root = ElementTree.Element("testsuites")
+    suites = {}
+    for result in results:
+        suite = suites.get(result["suite"])
+        if suite is None:
+            suite = suites[result["suite"]] = ElementTree.SubElement(
+                root, "testsuite", name=result["suite"])
+        case = ElementTree.SubElement(
+            suite, "testcase", name=result["test"], classname=result["suite"],
+            time=f"{result.get('wall', 0.0):.6f}")
+        properties = [
+            ("cpu", result.get("cpu")),
+            ("maxrss", result.get("maxrss")),
+            ("build_cache_hits", result.get("builds", {}).get("hits")),
+            ("build_cache_misses", result.get("builds", {}).get("misses")),
+        ]
+        if any(value is not None for _, value in properties):
+            element = ElementTree.SubElement(case, "properties")
+            for name, value in properties:
+                if value is not None:
+                    ElementTree.SubElement(
+                        element, "property", name=name, value=str(value))
+        if not result["passed"]:
+            failure = ElementTree.SubElement(
+                case, "failure", message=result.get("error") or "failed")
+            failure.text = result.get("error")
+    for suite in suites.values():
+        cases = suite.findall("testcase")
+        suite.set("tests", str(len(cases)))
+        suite.set("failures", str(sum(
+            1 for case in cases if case.find("failure") is not None)))
+        suite.set("time", f"{sum(float(case.get('time')) for case in cases):.6f}")
+    ElementTree.ElementTree(root).write(
+        pathlib.Path(path), encoding="utf-8", xml_declaration=True)
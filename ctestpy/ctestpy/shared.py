@@ -0,0 +1,142 @@
+"""
+Datasets shared by the tests of a suite, without copies.
+
+A shared fixture loads its data once, in the ``ctestpy`` process, before the
+test processes are started. The data is published in shared memory, which the
+test processes inherit, so each test gets a (read-only) view of the same
+memory rather than re-loading or receiving a copy of the data:
+
+.. code-block:: python
+
+    @ctestpy.shared_fixture
+    def adc_capture():
+        return numpy.fromfile("vectors/adc_capture.bin", dtype=numpy.int16)
+
+    def test_filter(adc_capture):
+        with builder() as build:
+            build.batch.filter_sample(adc_capture)
+
+The data may be any C-contiguous object supporting the buffer protocol
+(``bytes``, ``array.array``, NumPy arrays, ...), which is copied into shared
+memory once; or the path of a file, which is mapped into memory (without
+being read). Tests receive a NumPy array if the data was a NumPy array, and a
+typed ``memoryview`` otherwise, either of which can be passed to the code
+under test without being copied (e.g. to ``ffi.from_buffer``).
+"""
+import contextlib
+import functools
+import mmap
+import os
+
+from logging import getLogger
+
+LOGGER = getLogger("shared")
+
+
+def shared_fixture(func):
+    """
+    Decorator used within test suites to define a fixture whose data is
+    loaded once and shared by all tests of the suite (see
+    ``ctestpy.shared``).
+
+    :example:
+        >>> import ctestpy
+        >>>
+        >>> @ctestpy.shared_fixture
+        >>> def image():
+        >>>     return pathlib.Path("vectors/image.raw")
+    """
+    shared = SharedData(func)
+
+    @contextlib.contextmanager
+    @functools.wraps(func)
+    def wrapper():
+        yield shared.view()
+    wrapper.__ctestpy_fixture__ = True
+    wrapper.__ctestpy_shared__ = shared
+    return wrapper
+
+
+class SharedData:
+    """
+    The data of a shared fixture, published in shared memory.
+
+    :param: load function returning the data (or the path of a file)
+    """
+
+    def __init__(self, load):
+        self._load = load
+        self._mapping = None
+        self._size = 0
+        self._format = "B"
+        self._shape = None
+        self._dtype = None
+
+    @property
+    def published(self):
+        """
+        True if the data is in shared memory.
+        """
+        return self._mapping is not None
+
+    def publish(self):
+        """
+        Load the data into shared memory (unless it already is), must be
+        called before the test processes are started.
+        """
+        if self.published:
+            return
+        data = self._load()
+        if isinstance(data, (str, os.PathLike)):
+            with open(data, "rb") as stream:
+                self._size = os.fstat(stream.fileno()).st_size
+                # A file mapping is shared with the page cache, so the file is
+                # never copied (an empty file cannot be mapped):
+                self._mapping = mmap.mmap(
+                    stream.fileno(), 0, access=mmap.ACCESS_READ) \
+                    if self._size else mmap.mmap(-1, 1)
+            self._shape = (self._size,)
+            LOGGER.debug("Mapped %s (%d bytes)", data, self._size)
+            return
+        with memoryview(data) as view:
+            if not view.c_contiguous:
+                raise ValueError(
+                    f"The data of shared fixture `{self._load.__name__}` must "
+                    "be C-contiguous")
+            self._size = view.nbytes
+            self._format = view.format
+            self._shape = view.shape
+            self._dtype = getattr(data, "dtype", None)
+            # An anonymous shared mapping, inherited by the test processes:
+            self._mapping = mmap.mmap(-1, max(self._size, 1))
+            with view.cast("B") as source:
+                self._mapping[:self._size] = source
+        LOGGER.debug(
+            "Published shared fixture `%s` (%d bytes)",
+            self._load.__name__, self._size)
+
+    def view(self):
+        """
+        Return a read-only view of the data, publishing it first if needed
+        (e.g. when a test is run in-process).
+        """
+        self.publish()
+        view = memoryview(self._mapping)[:self._size].toreadonly()
+        if self._dtype is not None:
+            import numpy
+            return numpy.frombuffer(view, dtype=self._dtype).reshape(self._shape)
+        return view.cast(self._format, self._shape)
+
+    def close(self):
+        """
+        Release the shared memory, once the test processes have exited.
+        """
+        if self._mapping is None:
+            return
+        try:
+            self._mapping.close()
+        except BufferError:
+            # Views of the data are still in use by this process, the memory
+            # is released once they are garbage collected:
+            pass
+        self._mapping = None
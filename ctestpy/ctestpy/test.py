@@ -4,15 +4,28 @@ import functools
 import importlib
 import inspect
 import pathlib
+import resource
 import sys
+import time
 import traceback
-import io
 import os
 
 from logging import getLogger
 
+from ctestpy import allocations, capture, collect
+from ctestpy import logging as test_logging
+from ctestpy.benchmark import Benchmark
+
 LOGGER = getLogger("test")
 
+# Functions called before a test process exits, as test processes exit with
+# `os._exit` (which skips `atexit`).
+_EXIT_HOOKS = []
+
+# The case run by this test process, and the connection its report is sent
+# through, so that `fail` can report it before exiting.
+_CURRENT_CASE = {}
+
 
 def fixture(func):
     """
@@ -37,14 +50,131 @@ def fixture(func):
     return wrapper
 
 
+def parametrize(argnames, argvalues, ids=None):
+    """
+    Decorator used within test suites to run a test method once for each set
+    of argument values (a "case").
+
+    Each case is reported individually, but the cases are executed one after
+    the other in a single worker process; if a case crashes the worker, the
+    remaining cases are run in a fresh worker.
+
+    :param argnames: comma separated string (or list) of parameter names.
+    :param argvalues: list of values for each case; a tuple of values when
+        there is more than one parameter name.
+    :param ids: optional list of names for the cases, by default each case is
+        named after its values.
+
+    :example:
+        >>> import ctestpy
+        >>>
+        >>> @ctestpy.parametrize("first, second, total", [(1, 2, 3), (5, 6, 11)])
+        >>> def test_add(first, second, total):
+        >>>     with builder() as build:
+        >>>         assert build.testing.add(first, second) == total
+    """
+    if isinstance(argnames, str):
+        argnames = [name.strip() for name in argnames.split(",") if name.strip()]
+    argnames = list(argnames)
+    if len(argnames) == 1:
+        cases = [(value,) for value in argvalues]
+    else:
+        cases = [tuple(values) for values in argvalues]
+    if any(len(case) != len(argnames) for case in cases):
+        raise ValueError(
+            f"Each case must provide a value for each of: {', '.join(argnames)}")
+    if ids is None:
+        ids = ["-".join(_case_id(name, value, index)
+                        for name, value in zip(argnames, case))
+               for index, case in enumerate(cases)]
+
+    def decorator(func):
+        func.__ctestpy_parametrize__ = (argnames, cases, list(ids))
+        return func
+    return decorator
+
+
+def _case_id(name, value, index):
+    if isinstance(value, (int, float, str, bool, type(None))):
+        return str(value)
+    return f"{name}{index}"
+
+
+def at_exit(hook):
+    """
+    Register a function to be called before the test process exits, e.g. to
+    write coverage counters. Unlike ``atexit``, the hooks are also called
+    when a test fails.
+    """
+    _EXIT_HOOKS.append(hook)
+
+
+def _run_exit_hooks():
+    for hook in _EXIT_HOOKS:
+        try:
+            hook()
+        except Exception as error:
+            LOGGER.error("Exit hook %s failed: %s", hook.__name__, error)
+    test_logging.flush()
+
+
+def _resource_usage(start, usage):
+    """
+    Return the resource usage of this process since `start` (see
+    `time.perf_counter`) and `usage` (see `resource.getrusage`).
+    """
+    end = resource.getrusage(resource.RUSAGE_SELF)
+    # macOS reports the maximum resident set size in bytes, Linux in KiB:
+    maxrss = end.ru_maxrss // 1024 if sys.platform == "darwin" else end.ru_maxrss
+    return {
+        "wall": time.perf_counter() - start,
+        "cpu": (end.ru_utime + end.ru_stime) - (usage.ru_utime + usage.ru_stime),
+        "maxrss": maxrss,
+        "builds": _collect_build_stats(),
+    }
+
+
+def _collect_build_stats():
+    # Nothing was built if the builder was never imported:
+    builder = sys.modules.get("ctestpy.builder")
+    if builder is None:
+        return {"hits": 0, "misses": 0, "stored": 0}
+    return builder.collect_build_stats()
+
+
 def fail(message):
     """
     fail method to be called by anything that raises a ctestpy failure.
     """
+    output = capture.stop()
     LOGGER.error(message)
+    if output:
+        LOGGER.info("captured output:\n%s", output.rstrip())
+    _report_failure(message)
+    _run_exit_hooks()
     os._exit(1)
 
 
+def _report_failure(message):
+    """
+    Send the report of the case run by this test process (if any), failed
+    with `message`, as the process is about to exit.
+    """
+    connection = _CURRENT_CASE.pop("connection", None)
+    if connection is None or "index" not in _CURRENT_CASE:
+        return
+    LOGGER.failed("%s: %s", _CURRENT_CASE["name"], message)
+    test_logging.end_test(False)
+    report = {"passed": False, "error": message}
+    report.update(_resource_usage(_CURRENT_CASE["start"], _CURRENT_CASE["usage"]))
+    # Tells the parent the process exits after this case, without crashing:
+    report["exiting"] = True
+    try:
+        connection.send((_CURRENT_CASE["index"], report))
+    except OSError as error:
+        LOGGER.error("Failed to report %s: %s", _CURRENT_CASE["name"], error)
+
+
 class TestMethod:
     """
     Represents a ctestpy unittest.
@@ -53,12 +183,20 @@ class TestMethod:
     which allow the test to depend on common functionality as defined by the
     test suite developer. It is important when running the test, that these
     requested fixtures are first called (in the order they are defined).
+
+    A parametrized test method has a number of cases, each of which is run
+    (with its own fixtures) and reported as an individual test. A benchmark
+    test method (see ``ctestpy.benchmark``) is given a ``Benchmark`` as its
+    `bench` parameter.
     """
 
-    def __init__(self, name, reference, requests):
+    def __init__(self, name, reference, requests, parameters=None):
         self._name = name
         self._reference = reference
         self._requests = requests
+        self._argnames, self._cases, self._ids = \
+            parameters if parameters else ([], [()], None)
+        self._benchmark = getattr(reference, "__ctestpy_benchmark__", None)
 
     @property
     def name(self):
@@ -67,17 +205,101 @@ class TestMethod:
         """
         return self._name
 
+    @property
+    def cases(self):
+        """
+        Number of cases to run for the unittest (1 unless parametrized).
+        """
+        return len(self._cases)
+
+    @property
+    def fixtures(self):
+        """
+        The fixtures requested by the unittest.
+        """
+        return list(self._requests.values())
+
+    def case_name(self, index):
+        """
+        Name of the case at `index`, e.g. `test_add[1-2-3]`.
+        """
+        if self._ids is None:
+            return self.name
+        return f"{self.name}[{self._ids[index]}]"
+
+    def run_case(self, index):
+        """
+        Run the case at `index`, returns a report (dict) of the case, with:
+
+            * passed: True if the case passed.
+            * benchmarks: results of a benchmark test method, as dicts.
+            * error: why the case failed.
+            * allocations: allocations made by the code under test, when
+              profiled (see ``ctestpy.allocations.collect``).
+            * wall, cpu, maxrss, builds: resource usage of the case (see
+              ``ctestpy.report``).
+        """
+        name = self.case_name(index)
+        report = {"passed": False}
+        start = time.perf_counter()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # Only count the builds of this case:
+        _collect_build_stats()
+        _CURRENT_CASE.update(index=index, name=name, start=start, usage=usage)
+        test_logging.begin_test(name)
+        LOGGER.running(f"{name}")
+        error = None
+        output = capture.OutputCapture()
+        # Created before the fixtures, which may fail:
+        bench = None if self._benchmark is None else Benchmark(**self._benchmark)
+        try:
+            with output, contextlib.ExitStack() as stack:
+                kwargs = {
+                    request: stack.enter_context(fixture())
+                    for request, fixture in self._requests.items()}
+                kwargs.update(zip(self._argnames, self._cases[index]))
+                if bench is not None:
+                    kwargs["bench"] = bench
+                self._reference(**kwargs)
+        except Exception as exception:
+            error = exception
+        else:
+            report["passed"] = True
+        if output.output and (error is not None or capture.show_output()):
+            LOGGER.info("%s: captured output:\n%s", name, output.output.rstrip())
+        if error is not None:
+            report["error"] = str(error)
+            LOGGER.failed("%s: %s", name, str(error))
+        else:
+            LOGGER.passed("%s", name)
+        if bench is not None:
+            report["benchmarks"] = [
+                dict(result.as_dict(), threshold=bench.threshold)
+                for result in bench.results]
+            for result in bench.results:
+                LOGGER.info("%s", result)
+        profiled = allocations.collect()
+        if profiled is not None:
+            report["allocations"] = profiled
+        report.update(_resource_usage(start, usage))
+        test_logging.end_test(report["passed"])
+        return report
+
+    def run(self, start, connection):
+        """
+        Run the cases from `start` onwards, sending `(index, report)` for each
+        completed case through `connection`.
+        """
+        _CURRENT_CASE["connection"] = connection
+        for index in range(start, self.cases):
+            connection.send((index, self.run_case(index)))
+        _CURRENT_CASE.clear()
+        _run_exit_hooks()
+        connection.close()
+
     def __call__(self, *args, **kwargs):
-        with contextlib.redirect_stderr(io.StringIO()):
-            LOGGER.running(f"{self.name}")
-            try:
-                with contextlib.ExitStack() as stack:
-                    args = [stack.enter_context(req()) for req in self._requests]
-                    self._reference(*args)
-            except Exception as error:
-                LOGGER.failed("%s: %s", self.name, str(error))
-            else:
-                LOGGER.passed("%s", self.name)
+        for index in range(self.cases):
+            self.run_case(index)
 
 
 class TestSuite:
@@ -88,11 +310,50 @@ class TestSuite:
     tests are defined by the name of the method and must have `test_` prefix.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, baseline=None, results=None):
         self._path = pathlib.Path(path)
-        module_path = self._path.as_posix().replace("/", ".").strip(".py")
-        self._module = importlib.import_module(module_path)
-        self._methods = self._find_test_methods(self._module)
+        self._baseline = baseline
+        self._results = results
+        self.allocations = {}
+        # The suite is only imported once it runs:
+        self._methods = None
+
+    @property
+    def path(self):
+        """
+        Path of the suite, relative to the working directory.
+        """
+        return self._path
+
+    @property
+    def module_name(self):
+        """
+        Name of the suite's module, e.g. `tests.test_foo`.
+        """
+        return self._path.with_suffix("").as_posix().replace("/", ".")
+
+    def collect(self):
+        """
+        Return the tests of the suite (see ``ctestpy.collect.collect``),
+        without importing it.
+        """
+        return collect.collect(self._path)
+
+    def _load(self):
+        """
+        Import the suite, returns its test methods.
+        """
+        if self._methods is None:
+            module = importlib.import_module(self.module_name)
+            self._methods = self._find_test_methods(module)
+        return self._methods
+
+    @property
+    def methods(self):
+        """
+        The test methods of the suite (it is imported if it was not yet).
+        """
+        return self._load()
 
     @staticmethod
     def _discover_test_methods(module):
@@ -125,16 +386,24 @@ class TestSuite:
         """
         result = []
         for test_method, reference in test_methods.items():
-            requests = inspect.signature(reference).parameters
-            if not all(arg in fixtures.keys() for arg in requests):
-                raise Exception(
-                    f"Test method `{test_method}` is attempting to request "
-                    f"fixture `{arg}` that does not exist")
+            parameters = getattr(reference, "__ctestpy_parametrize__", None)
+            argnames = parameters[0] if parameters else []
+            if hasattr(reference, "__ctestpy_benchmark__"):
+                argnames = argnames + ["bench"]
+            requests = [
+                arg for arg in inspect.signature(reference).parameters
+                if arg not in argnames]
+            for arg in requests:
+                if arg not in fixtures:
+                    raise Exception(
+                        f"Test method `{test_method}` is attempting to request "
+                        f"fixture `{arg}` that does not exist")
             result.append(
                 TestMethod(
                     test_method,
                     reference,
-                    [fixtures[req] for req in requests]))
+                    {req: fixtures[req] for req in requests},
+                    parameters))
         return result
 
     @staticmethod
@@ -156,11 +425,124 @@ class TestSuite:
     def run(self):
         """
         Method to run the test suite.
+
+        The shared fixtures requested by its tests (see ``ctestpy.shared``)
+        are loaded before any test process is started, and released once
+        they have all exited.
         """
         LOGGER.running(f"{self.name}")
-        for method in self._methods:
-            test_process = multiprocessing.Process(target=method)
+        methods = self._load()
+        with self.shared_fixtures():
+            for method in methods:
+                self._run_method(
+                    method,
+                    functools.partial(self._report_case, method))
+
+    @contextlib.contextmanager
+    def shared_fixtures(self):
+        """
+        Context manager which publishes the shared fixtures requested by the
+        tests of the suite (see ``ctestpy.shared``), and releases them on
+        exit. Test processes must only be started within it.
+        """
+        shared = []
+        for method in self._load():
+            for fixture in method.fixtures:
+                data = getattr(fixture, "__ctestpy_shared__", None)
+                if data is not None and data not in shared:
+                    shared.append(data)
+        try:
+            for data in shared:
+                data.publish()
+            yield
+        finally:
+            for data in shared:
+                data.close()
+
+    def method(self, name):
+        """
+        Return the test method `name` of the suite.
+        """
+        for method in self._load():
+            if method.name == name:
+                return method
+        raise KeyError(f"Suite `{self.name}` has no test method `{name}`")
+
+    def _report_case(self, method, index, report):
+        """
+        Check the benchmark results of a case against the baseline, keep the
+        allocations it made and add its result to the `results` (see
+        ``ctestpy.report.Results``).
+
+        A case with a benchmark regression is reported as failed, with the
+        regressions as its error.
+        """
+        regressions = []
+        for result in report.get("benchmarks", []):
+            if self._baseline is None:
+                continue
+            name = f"{method.case_name(index)}::{result['name']}"
+            regression = self._baseline.check(
+                f"{self.name}::{name}", result, result["threshold"])
+            if regression:
+                LOGGER.failed("%s: %s", name, regression)
+                regressions.append(f"{result['name']}: {regression}")
+        if regressions:
+            report["passed"] = False
+            report["error"] = "; ".join(
+                ([report["error"]] if report.get("error") else []) + regressions)
+        if self._results is not None:
+            self._results.add(self.name, method.case_name(index), report)
+        if "allocations" in report:
+            name = f"{self.name}::{method.case_name(index)}"
+            self.allocations[name] = report["allocations"]
+
+    @staticmethod
+    def _run_method(method, on_report=None, start=0):
+        """
+        Run the cases of a test method (from `start` onwards) in a worker
+        process. A case that crashes the worker is reported as failed, and the
+        remaining cases are run in a fresh worker.
+
+        `on_report` is called with the index and report of each case; the
+        report of a case that crashed only has its result, error and wall
+        time.
+        """
+        while start < method.cases:
+            started = time.perf_counter()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            test_process = multiprocessing.Process(
+                target=method.run, args=(start, sender))
             test_process.start()
+            sender.close()
+            exiting = False
+            with receiver:
+                while True:
+                    try:
+                        index, report = receiver.recv()
+                    except EOFError:
+                        break
+                    exiting = report.pop("exiting", False)
+                    start = index + 1
+                    started = time.perf_counter()
+                    if on_report is not None:
+                        on_report(index, report)
             test_process.join()
-            if test_process.exitcode != 0:
-                LOGGER.failed("%s", self.name)
+            if start < method.cases and not exiting:
+                # The worker crashed, output the case's records with its result:
+                test = (test_process.pid, method.case_name(start))
+                output = capture.recover(test_process.pid)
+                if output:
+                    LOGGER.info(
+                        "%s: captured output:\n%s", test[1], output.rstrip(),
+                        extra={"ctestpy_test": test})
+                LOGGER.failed("%s", test[1], extra={"ctestpy_test": test})
+                test_logging.end_test(False, test)
+                if on_report is not None:
+                    on_report(start, {
+                        "passed": False,
+                        "error": "the test process exited with code "
+                        f"{test_process.exitcode}",
+                        "wall": time.perf_counter() - started,
+                    })
+                start += 1
@@ -1,6 +1,8 @@
 from contextlib import contextmanager
+import array
 import pathlib
 
+import ctestpy
 from ctestpy.builder import Builder, CodeUnderTest
 
 
@@ -9,7 +11,8 @@ def builder():
     with Builder(
             testing=CodeUnderTest(
                 source=pathlib.Path('src/calculator.c'),
-                header=pathlib.Path('src/calculator.h'))) as builder:
+                header=pathlib.Path('src/calculator.h'),
+                batch=['add'])) as builder:
         yield builder
 
 
@@ -23,3 +26,36 @@ def test_two():
     with builder() as build:
         actual = build.testing.sub(8, 6)
         assert actual == -2, "failed"
+
+
+def test_add_table():
+    # `add` has a batch wrapper, so the whole table is checked in one call
+    # into the code under test:
+    with builder() as build:
+        first = array.array('i', range(-5000, 5000))
+        second = array.array('i', range(10000))
+        actual = build.batch.add(first, second)
+        expected = [a + b for a, b in zip(first, second)]
+        assert list(actual) == expected, "add() failed for some inputs"
+
+
+@ctestpy.parametrize("first, second, total", [
+    (0, 0, 0),
+    (1, 2, 3),
+    (-7, 7, 0),
+    (2147483640, 7, 2147483647),
+])
+def test_add_cases(first, second, total):
+    # Each case is reported individually, all cases run in one worker which
+    # only builds the code under test once:
+    with builder() as build:
+        actual = build.testing.add(first, second)
+        assert actual == total, f"Got: add({first}, {second}) = {actual}"
+
+
+@ctestpy.benchmark(samples=50)
+def test_add_latency(bench):
+    # Reported as failed when slower than the baseline, see
+    # `ctestpy --benchmark-save`:
+    with builder() as build:
+        bench(build.testing.add, 5, 6)
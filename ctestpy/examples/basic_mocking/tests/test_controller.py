@@ -4,16 +4,6 @@ from ctestpy.builder import Builder, CodeUnderTest
 from ctestpy.test import fail
 
 
-# CTestPy does not support pulling #define derivitives from the source code.
-# To make the tests easier to read, they have been re-defined manually:
-POWER_GPIO = 0x1a
-LED_GPIO = 0x2b
-SUCCESS = 0x0
-FAILURE = 0xFF
-HIGH = 0xFF
-LOW = 0x00
-
-
 @contextmanager
 def builder():
     """
@@ -77,29 +67,38 @@ def builder():
         yield builder
 
 
+# The integer #define constants of the headers (e.g. `GPIO_POWER`) are
+# available from the built module, i.e. `build.testing.GPIO_POWER`.
+
+
 def test_power_on_when_power_gpio_is_low():
     with builder() as build:
-        # Expect code under test to get the current direction for POWER_GPIO.
-        # This pretends that POWER_GPIO is held low:
-        build.mocking.get_gpio.expect_and_return(POWER_GPIO, retval=SUCCESS)
-        # Expect code under test to set the current direction for POWER_GPIO.
-        # The expects that POWER_GPIO is going to the be driven high:
-        build.mocking.set_gpio.expect_and_return(POWER_GPIO, HIGH, retval=SUCCESS)
+        c = build.testing
+        # Expect code under test to get the current direction for GPIO_POWER.
+        # This pretends that GPIO_POWER is held low:
+        build.mocking.get_gpio.expect_and_return(c.GPIO_POWER, retval=c.GPIO_LOW)
+        # Expect code under test to set the current direction for GPIO_POWER.
+        # The expects that GPIO_POWER is going to the be driven high:
+        build.mocking.set_gpio.expect_and_return(
+            c.GPIO_POWER, c.GPIO_HIGH, retval=c.GPIO_SUCCESS)
         # Call the code under test:
-        actual = build.testing.power_on()
+        actual = c.power_on()
         # Ensure return value is as expected:
-        assert actual == SUCCESS, "Power on failed, expected it to succeed"
+        assert actual == c.CONTROLLER_SUCCESS, \
+            "Power on failed, expected it to succeed"
 
 
 def test_power_on_expect_failure_due_to_missing_expectation():
     with builder() as build:
-        # Expect code under test to get the current direction for POWER_GPIO.
-        # This pretends that POWER_GPIO is held low:
-        build.mocking.get_gpio.expect_and_return(POWER_GPIO, retval=SUCCESS)
+        c = build.testing
+        # Expect code under test to get the current direction for GPIO_POWER.
+        # This pretends that GPIO_POWER is held low:
+        build.mocking.get_gpio.expect_and_return(c.GPIO_POWER, retval=c.GPIO_LOW)
         # The following expectation is missing, and should cause the test to fail:
-        # build.mocking.set_gpio.expect_and_return(POWER_GPIO, HIGH, retval=SUCCESS)
+        # build.mocking.set_gpio.expect_and_return(
+        #     c.GPIO_POWER, c.GPIO_HIGH, retval=c.GPIO_SUCCESS)
         # Call the code under test:
-        actual = build.testing.power_on()
+        actual = c.power_on()
         # Sould never get this far...
         print("yeah we are here")
         fail("Expected mock `set_gpio` to fail this test (missing expectation)")
@@ -107,51 +106,60 @@ def test_power_on_expect_failure_due_to_missing_expectation():
 
 def test_power_on_expect_failure_due_to_unsatisfied_expectation():
     with builder() as build:
-        # Expect code under test to get the current direction for POWER_GPIO.
-        # This pretends that POWER_GPIO is held low:
-        build.mocking.get_gpio.expect_and_return(POWER_GPIO, retval=SUCCESS)
-        # Expect code under test to set the current direction for POWER_GPIO.
-        # The expects that POWER_GPIO is going to the be driven high:
-        build.mocking.set_gpio.expect_and_return(POWER_GPIO, HIGH, retval=SUCCESS)
+        c = build.testing
+        # Expect code under test to get the current direction for GPIO_POWER.
+        # This pretends that GPIO_POWER is held low:
+        build.mocking.get_gpio.expect_and_return(c.GPIO_POWER, retval=c.GPIO_LOW)
+        # Expect code under test to set the current direction for GPIO_POWER.
+        # The expects that GPIO_POWER is going to the be driven high:
+        build.mocking.set_gpio.expect_and_return(
+            c.GPIO_POWER, c.GPIO_HIGH, retval=c.GPIO_SUCCESS)
         # The following expectation is superflous (i.e. the code under test is not
         # expected to satisfy this expectation); this should cause the test to fail.
-        build.mocking.set_gpio.expect_and_return(POWER_GPIO, HIGH, retval=SUCCESS)
+        build.mocking.set_gpio.expect_and_return(
+            c.GPIO_POWER, c.GPIO_HIGH, retval=c.GPIO_SUCCESS)
         # Call the code under test:
-        actual = build.testing.power_on()
+        actual = c.power_on()
         assert False, \
             "Expected mock `set_gpio` to fail this test (unsatisfied expectation)"
 
 
 def test_power_on_expect_failure_due_to_unexpected_arg_value():
     with builder() as build:
+        c = build.testing
         # Code under test should try to get the current direction for
-        # POWER_GPIO. The following expectation is intentionally wrong as it
-        # expects code under test to get the current direction for LED_GPIO.
+        # GPIO_POWER. The following expectation is intentionally wrong as it
+        # expects code under test to get the current direction for GPIO_LED.
         # This should cause the test to fail.
-        build.mocking.get_gpio.expect_and_return(LED_GPIO, retval=SUCCESS)
+        build.mocking.get_gpio.expect_and_return(c.GPIO_LED, retval=c.GPIO_LOW)
         # Call the code under test:
-        actual = build.testing.power_on()
+        actual = c.power_on()
         assert False, \
             "Expected mock `get_gpio` to fail this test (unexpected arg value)"
 
 
 def test_power_on_when_power_gpio_is_high():
     with builder() as build:
-        build.mocking.get_gpio.expect_and_return(POWER_GPIO, retval=HIGH)
+        c = build.testing
+        build.mocking.get_gpio.expect_and_return(c.GPIO_POWER, retval=c.GPIO_HIGH)
         # Call the code under test:
-        actual = build.testing.power_on()
-        assert actual == SUCCESS, "Power on failed, expected it to succeed"
+        actual = c.power_on()
+        assert actual == c.CONTROLLER_SUCCESS, \
+            "Power on failed, expected it to succeed"
 
 
 def test_power_on_when_power_gpio_is_low_but_fails_to_drive_high():
     with builder() as build:
-        # Expect code under test to get the current direction for POWER_GPIO.
-        # This pretends that POWER_GPIO is held high:
-        build.mocking.get_gpio.expect_and_return(POWER_GPIO, retval=SUCCESS)
-        # Expect code under test to set the current direction for POWER_GPIO.
-        # The expects that POWER_GPIO is going to the be driven high:
-        build.mocking.set_gpio.expect_and_return(POWER_GPIO, HIGH, retval=FAILURE)
+        c = build.testing
+        # Expect code under test to get the current direction for GPIO_POWER.
+        # This pretends that GPIO_POWER is held low:
+        build.mocking.get_gpio.expect_and_return(c.GPIO_POWER, retval=c.GPIO_LOW)
+        # Expect code under test to set the current direction for GPIO_POWER.
+        # The expects that GPIO_POWER is going to the be driven high:
+        build.mocking.set_gpio.expect_and_return(
+            c.GPIO_POWER, c.GPIO_HIGH, retval=c.GPIO_FAILURE)
         # Call the code under test:
-        actual = build.testing.power_on()
+        actual = c.power_on()
         # Ensure return value is as expected:
-        assert actual == FAILURE, "Power on succeeded, expected it to fail"
+        assert actual == c.CONTROLLER_FAILURE, \
+            "Power on succeeded, expected it to fail"
@@ -0,0 +1,19 @@
+import pytest
+
+from ctestpy import artifacts, index
+
+
+@pytest.fixture(autouse=True)
+def header_cache(tmp_path_factory, monkeypatch):
+    # Keep the header index of the builds out of the developer's cache:
+    path = tmp_path_factory.getbasetemp() / "cache"
+    monkeypatch.setenv(index.CACHE_ENVIRONMENT_VARIABLE, str(path))
+    return path
+
+
+@pytest.fixture
+def artifact_store(tmp_path, monkeypatch):
+    # Restored after the test, as enabling the store sets the environment:
+    path = tmp_path / "artifacts"
+    monkeypatch.setenv(artifacts.ENVIRONMENT_VARIABLE, str(path))
+    return artifacts.enable(path)
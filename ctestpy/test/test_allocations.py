@@ -0,0 +1,96 @@
+import pathlib
+
+import pytest
+
+from ctestpy import allocations
+from ctestpy.builder import Builder, CodeUnderTest
+
+MOCK_BUFFER_H = """
+int sum(int count);
+char *grow(int count);
+void release(char *buffer);
+"""
+
+# pycparser cannot parse the system headers, so declare the allocators:
+MOCK_BUFFER = """#include "buffer.h"
+void *calloc(unsigned long count, unsigned long size);
+void *realloc(void *ptr, unsigned long size);
+void free(void *ptr);
+int sum(int count)
+{
+    int total = 0;
+    for (int i = 0; i < count; i++)
+        total += i;
+    return total;
+}
+char *grow(int count)
+{
+    char *buffer = calloc(1, 8);
+    for (int i = 1; i < count; i++)
+        buffer = realloc(buffer, 8 * (i + 1));
+    return buffer;
+}
+void release(char *buffer)
+{
+    free(buffer);
+}
+"""
+
+
+@pytest.fixture
+def buffer(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "buffer.h").write_text(MOCK_BUFFER_H)
+    (src / "buffer.c").write_text(MOCK_BUFFER)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield lambda option=True: Builder(CodeUnderTest(
+        pathlib.Path("src/buffer.c"), pathlib.Path("src/buffer.h"),
+        allocations=option))
+    allocations.collect()
+
+
+def test_allocations_are_counted(buffer):
+    with buffer() as build:
+        with build.allocations.assert_none():
+            assert build.testing.sum(4) == 6
+        with build.allocations.measure() as measured:
+            block = build.testing.grow(3)
+        [stats] = measured
+        assert stats == allocations.AllocationStats(
+            count=3, frees=0, bytes=8 + 16 + 24, peak=24, blocks=1)
+        with pytest.raises(AssertionError, match="1 allocation"):
+            with build.allocations.assert_none():
+                build.testing.release(build.testing.grow(1))
+        build.testing.release(block)
+        assert build.allocations.stats().blocks == 0
+    report = allocations.collect()
+    assert report["count"] == 4 and report["leaked"] == 0
+
+
+def test_leaks_are_reported(buffer):
+    with pytest.raises(AssertionError, match="1 block"):
+        with buffer() as build:
+            build.testing.grow(2)
+    # The counters are reset for each test:
+    with buffer() as build:
+        assert build.allocations.stats().count == 0
+
+
+def test_allocations_per_call(buffer):
+    with buffer(allocations.PER_CALL) as build:
+        build.testing.release(build.testing.grow(2))
+        build.testing.sum(1)
+    assert allocations.collect()["calls"] == {
+        "grow": [1, 2, 24], "release": [1, 0, 0], "sum": [1, 0, 0]}
+
+
+def test_only_the_cli_option_tracks_calls(buffer, monkeypatch):
+    with buffer() as build:
+        build.testing.sum(1)
+    assert allocations.collect()["calls"] == {}
+    monkeypatch.setenv(allocations.ENVIRONMENT_VARIABLE, "1")
+    with buffer(None) as build:
+        build.testing.sum(1)
+    assert allocations.collect()["calls"] == {"sum": [1, 0, 0]}
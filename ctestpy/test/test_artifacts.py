@@ -0,0 +1,36 @@
+import pathlib
+
+from ctestpy import artifacts, builder
+from ctestpy.builder import Builder, CodeUnderTest
+
+ADD_H = "int add(int a, int b);\n"
+
+ADD = """#include "add.h"
+int add(int a, int b)
+{
+    return a + b;
+}
+"""
+
+
+def test_builds_are_loaded_from_the_store(tmp_path, monkeypatch, artifact_store):
+    (tmp_path / "add.h").write_text(ADD_H)
+    (tmp_path / "add.c").write_text(ADD)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    store = artifacts.ArtifactStore(artifact_store)
+    monkeypatch.setattr(builder, "_BUILD_CACHE", {})
+    builder.collect_build_stats()
+    cut = CodeUnderTest(pathlib.Path("add.c"), pathlib.Path("add.h"))
+    with Builder(cut) as build:
+        assert build.testing.add(1, 2) == 3
+    assert builder.collect_build_stats() == {"hits": 0, "misses": 1, "stored": 0}
+    [key] = store.keys()
+    # As in a fresh test process (or on another host, once installed):
+    monkeypatch.setattr(builder, "_BUILD_CACHE", {})
+    copy = artifacts.ArtifactStore(tmp_path / "copy")
+    copy.install(key, store.export(key))
+    monkeypatch.setenv(artifacts.ENVIRONMENT_VARIABLE, str(tmp_path / "copy"))
+    with Builder(cut) as build:
+        assert build.testing.add(2, 3) == 5
+    assert builder.collect_build_stats() == {"hits": 0, "misses": 1, "stored": 1}
@@ -0,0 +1,101 @@
+import array
+import pathlib
+
+import pytest
+
+from ctestpy.builder import CodeUnderTest
+
+MOCK_CALC_H = """
+int add(int first, int second);
+double scale(const double value);
+int *first_of(int *values);
+struct point { int x; int y; };
+int norm1(struct point point);
+int answer(void);
+"""
+
+MOCK_CALC = """
+#include "calc.h"
+int add(int first, int second)
+{
+    return first + second;
+}
+double scale(const double value)
+{
+    return value * 2.5;
+}
+int *first_of(int *values)
+{
+    return values;
+}
+int norm1(struct point point)
+{
+    return point.x + point.y;
+}
+int answer(void)
+{
+    return 42;
+}
+"""
+
+
+@pytest.fixture
+def calc(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "calc.h").write_text(MOCK_CALC_H)
+    (src / "calc.c").write_text(MOCK_CALC)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def build(batch):
+        cut = CodeUnderTest(
+            pathlib.Path("src/calc.c"), pathlib.Path("src/calc.h"), batch)
+        testing, _ = cut.generate([])
+        return testing, cut.batched
+    yield build
+
+
+def test_batch_wrapper_calls_function_for_each_element(calc):
+    testing, batched = calc(["add", "scale"])
+    first = array.array("i", range(1000))
+    second = array.array("i", range(0, 3000, 3))
+    result = batched.add(first, second)
+    assert result.format == "i"
+    assert list(result) == [4 * value for value in range(1000)]
+    assert testing.add__batch is not None
+    assert list(batched.scale(array.array("d", [1.0, 2.0]))) == [2.5, 5.0]
+
+
+def test_batch_wrapper_stores_results_in_out(calc):
+    _, batched = calc(["add"])
+    out = array.array("i", [0] * 3)
+    values = array.array("i", [1, 2, 3])
+    assert batched.add(values, values, out=out) is out
+    assert list(out) == [2, 4, 6]
+
+
+def test_batch_wrapper_rejects_mismatched_arrays(calc):
+    _, batched = calc(["add"])
+    with pytest.raises(TypeError):
+        batched.add(array.array("d", [1.0]), array.array("d", [1.0]))
+    with pytest.raises(ValueError):
+        batched.add(array.array("i", [1]), array.array("i", [1, 2]))
+
+
+def test_batch_wrapper_requires_scalar_signature(calc):
+    with pytest.raises(ValueError):
+        calc(["first_of"])
+    with pytest.raises(ValueError):
+        calc(["not_defined"])
+    with pytest.raises(ValueError, match="`norm1`.*struct point"):
+        calc(["norm1"])
+
+
+def test_batch_wrapper_without_parameters(calc):
+    _, batched = calc(["answer"])
+    assert list(batched.answer(count=3)) == [42, 42, 42]
+    out = array.array("i", [0] * 2)
+    assert list(batched.answer(out=out)) == [42, 42]
+    with pytest.raises(TypeError, match="count"):
+        batched.answer()
@@ -0,0 +1,115 @@
+import contextlib
+import logging
+import re
+
+import ctestpy
+from ctestpy.benchmark import Baseline, Benchmark, BenchmarkResult
+from ctestpy.logging import _configure_custom_log_levels
+from ctestpy.report import Results
+from ctestpy import test as ctest
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+
+def test_result_statistics():
+    result = BenchmarkResult("f", [float(value) for value in range(100, 0, -1)], 10, 2.0)
+    assert result.min == 1.0
+    assert result.median_low <= result.median <= result.median_high
+    assert result.p99_low <= result.p99 <= result.p99_high == 100.0
+    assert str(result).startswith("f: min 1.0ns")
+
+
+def test_result_below_the_overhead_resolution():
+    result = BenchmarkResult("f", [-2.0, -1.0, 0.5, 3.0, 4.0], 10, 170.0, 1.0)
+    assert not result.resolved
+    assert not re.search(r"-\d", str(result))
+    assert str(result).startswith("f: min <1.0ns, median <1.0ns [<1.0, 4.0]")
+    assert BenchmarkResult("f", [3.0] * 5, 10, 170.0, 1.0).resolved
+
+
+def test_benchmark_python_function():
+    bench = Benchmark(samples=5, sample_time=0.0001, warmup=0)
+    result = bench(max, 1, 2, name="max")
+    assert bench.results == [result]
+    assert result.name == "max"
+    assert result.samples == 5
+    assert result.overhead == 0.0
+
+
+def test_baseline_reports_regressions_only(tmp_path):
+    path = tmp_path / "baseline.json"
+    fast = BenchmarkResult("f", [10.0] * 20, 1, 0.0).as_dict()
+    slow = BenchmarkResult("f", [20.0] * 20, 1, 0.0).as_dict()
+    baseline = Baseline(path)
+    assert baseline.check("suite::f", fast) is None
+    baseline.save()
+    baseline = Baseline(path, threshold=0.5)
+    assert baseline.check("suite::f", fast) is None
+    assert "slower than the baseline" in baseline.check("suite::f", slow)
+    assert baseline.check("suite::f", slow, threshold=1.5) is None
+
+
+def test_baseline_below_the_overhead(tmp_path):
+    # A function cheaper than the FFI call overhead is compared with its raw
+    # timings, not against a baseline of about 0:
+    path = tmp_path / "baseline.json"
+    baseline = Baseline(path)
+    baseline.check("suite::f", BenchmarkResult("f", [-2.0] * 20, 1, 170.0).as_dict())
+    baseline.save()
+    baseline = Baseline(path)
+    same = BenchmarkResult("f", [3.0] * 20, 1, 168.0).as_dict()
+    slow = BenchmarkResult("f", [60.0] * 20, 1, 170.0).as_dict()
+    assert baseline.check("suite::f", same) is None
+    assert "slower than the baseline" in baseline.check("suite::f", slow)
+
+
+def test_benchmark_method_reports_results():
+    @ctestpy.benchmark(samples=3, sample_time=0.0001, warmup=0)
+    def test_me(bench):
+        bench(abs, -1)
+
+    method = ctest.TestMethod("test_me", test_me, {})
+    reports = []
+    ctest.TestSuite._run_method(method, lambda index, report: reports.append(report))
+    [report] = reports
+    assert report["passed"]
+    [result] = report["benchmarks"]
+    assert result["name"] == "abs"
+    assert result["samples"] == 3
+
+
+def test_benchmark_method_fixture_error():
+    @contextlib.contextmanager
+    def broken():
+        raise RuntimeError("fixture failed")
+        yield  # pylint:disable=unreachable
+
+    @ctestpy.benchmark(samples=3, sample_time=0.0001, warmup=0)
+    def test_me(bench, fixture):
+        bench(abs, -1)
+
+    method = ctest.TestMethod("test_me", test_me, {"fixture": broken})
+    reports = []
+    ctest.TestSuite._run_method(method, lambda index, report: reports.append(report))
+    [report] = reports
+    assert not report["passed"]
+    assert report["error"] == "fixture failed"
+    assert report["benchmarks"] == []
+
+
+def test_benchmark_regression_fails_the_case(tmp_path):
+    path = tmp_path / "baseline.json"
+    baseline = Baseline(path)
+    baseline.check(
+        "suite::test_me::f", BenchmarkResult("f", [10.0] * 20, 1, 0.0).as_dict())
+    baseline.save()
+    results = Results()
+    suite = ctest.TestSuite("suite.py", Baseline(path), results)
+    case = {"passed": True, "benchmarks": [
+        dict(BenchmarkResult("f", [20.0] * 20, 1, 0.0).as_dict(), threshold=None)]}
+    suite._report_case(ctest.TestMethod("test_me", lambda: None, {}), 0, case)
+    [result] = results.results
+    assert not result["passed"]
+    assert result["error"].startswith(
+        "f: median 20.0ns is slower than the baseline")
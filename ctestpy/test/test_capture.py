@@ -0,0 +1,61 @@
+import logging
+import os
+import sys
+
+import cffi
+import pytest
+
+from ctestpy import capture
+from ctestpy import test as ctest
+from ctestpy.logging import _configure_custom_log_levels
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+ffi = cffi.FFI()
+ffi.cdef("int printf(const char *format, ...);")
+libc = ffi.dlopen(None)
+
+
+@pytest.fixture
+def records(caplog):
+    caplog.set_level(logging.INFO)
+    return caplog
+
+
+def test_captures_c_and_python_output():
+    with capture.OutputCapture() as output:
+        libc.printf(b"from C %d\n", ffi.cast("int", 42))
+        print("from Python", file=sys.__stdout__)
+        os.write(2, b"from stderr\n")
+    assert output.output == "from C 42\nfrom Python\nfrom stderr\n"
+    assert not capture.output_path().exists()
+
+
+def test_keeps_head_and_tail_of_large_output():
+    with capture.OutputCapture(limit=8) as output:
+        os.write(1, b"head1234" + b"x" * 1000 + b"tail5678")
+    assert output.output == "head1234\n[... 1000 bytes omitted ...]\ntail5678"
+
+
+def test_output_is_only_logged_for_failing_tests(records):
+    def test_pass():
+        libc.printf(b"pass output\n")
+
+    def test_fail():
+        libc.printf(b"fail output\n")
+        assert False
+
+    ctest.TestMethod("test_pass", test_pass, {})()
+    ctest.TestMethod("test_fail", test_fail, {})()
+    assert "test_fail: captured output:\nfail output" in records.messages
+    assert not any("pass output" in record for record in records.messages)
+
+
+def test_output_of_crashed_worker_is_logged(records):
+    def test_crash():
+        libc.printf(b"before the crash\n")
+        os._exit(1)
+
+    ctest.TestSuite._run_method(ctest.TestMethod("test_crash", test_crash, {}))
+    assert "test_crash: captured output:\nbefore the crash" in records.messages
@@ -0,0 +1,89 @@
+import sys
+
+from ctestpy import collect
+from ctestpy import test as ctest
+
+SUITE = '''
+import ctestpy
+from ctestpy import fixture
+
+raise ImportError("the suite must not be imported")
+
+
+@fixture
+def builder():
+    yield None
+
+
+def helper():
+    pass
+
+
+def test_plain(builder):
+    pass
+
+
+@ctestpy.parametrize("first, second", [(1, 2), (3, 4), (5, 6)])
+def test_literal_cases(builder, first, second):
+    pass
+
+
+@ctestpy.parametrize("value", range(6))
+def test_computed_cases(value):
+    pass
+
+
+@ctestpy.benchmark(samples=10)
+def test_latency(bench, builder):
+    pass
+
+
+class TestNotCollected:
+    def test_method(self):
+        pass
+'''
+
+
+def test_collects_tests_without_importing(tmp_path):
+    path = tmp_path / "test_py.py"
+    path.write_text(SUITE)
+    tests = collect.collect(path)
+    assert [(test.name, test.requests, test.cases) for test in tests] == [
+        ("test_plain", ["builder"], 1),
+        ("test_literal_cases", ["builder"], 3),
+        ("test_computed_cases", [], None),
+        ("test_latency", ["builder"], 1),
+    ]
+    assert tests[0].line == 17
+    suite = ctest.TestSuite(path.relative_to(tmp_path))
+    assert suite.module_name == "test_py"
+    assert "test_py" not in sys.modules
+
+
+KEYWORD_SUITE = '''
+import ctestpy
+
+
+@ctestpy.parametrize(argnames="first, second", argvalues=[(1, 2), (3, 4)])
+def test_keywords(first, second):
+    pass
+
+
+@ctestpy.parametrize("value", argvalues=[1, 2, 3], ids=["a", "b", "c"])
+def test_keyword_values(value):
+    pass
+'''
+
+
+def test_collects_keyword_cases(tmp_path, monkeypatch):
+    path = tmp_path / "test_keywords.py"
+    path.write_text(KEYWORD_SUITE)
+    tests = collect.collect(path)
+    assert [(test.name, test.requests, test.cases) for test in tests] == [
+        ("test_keywords", [], 2),
+        ("test_keyword_values", [], 3),
+    ]
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    methods = ctest.TestSuite("test_keywords.py").methods
+    assert [method.cases for method in methods] == [test.cases for test in tests]
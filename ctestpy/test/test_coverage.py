@@ -0,0 +1,70 @@
+import logging
+import pathlib
+
+import pytest
+
+from ctestpy import coverage
+from ctestpy.builder import Builder, CodeUnderTest
+from ctestpy.logging import _configure_custom_log_levels
+from ctestpy import test as ctest
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+MOCK_SIGN_H = """
+int sign(int value);
+"""
+
+MOCK_SIGN = """#include "sign.h"
+int sign(int value)
+{
+    if (value < 0)
+        return -1;
+    if (value > 0)
+        return 1;
+    return 0;
+}
+"""
+
+
+@pytest.fixture
+def sign(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "sign.h").write_text(MOCK_SIGN_H)
+    (src / "sign.c").write_text(MOCK_SIGN)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv(coverage.ENVIRONMENT_VARIABLE, "")
+    yield (src / "sign.c").resolve()
+
+
+def test_coverage_is_merged_across_workers(sign):
+    path = coverage.enable("coverage")
+
+    def test_me(value):
+        with Builder(CodeUnderTest(
+                pathlib.Path("src/sign.c"), pathlib.Path("src/sign.h"))) as build:
+            assert build.testing.sign(value) == value
+
+    # Each test method runs in its own worker process:
+    for value in (-1, 1):
+        method = ctest.TestMethod("test_me", test_me, {}, (["value"], [(value,)], None))
+        ctest.TestSuite._run_method(method)
+    assert len(list((path / "counters").iterdir())) == 2
+    assert not list(pathlib.Path().glob("*.gcno"))
+
+    merged = coverage.merge()
+    assert list(merged) == [str(sign)]
+    lines = merged[str(sign)]["lines"]
+    assert lines[5] == 1 and lines[6] == 1 and lines[8] == 0
+    assert merged[str(sign)]["functions"] == {"sign": [2, 2]}
+
+    lcov = coverage.report()
+    assert "DA:8,0" in lcov.read_text().splitlines()
+
+
+def test_filter_is_a_posix_regex():
+    options = coverage.build_options("/tmp/my-project (v1.0)/src/cut.c")
+    assert "-fprofile-filter-files=^/tmp/my-project \\(v1\\.0\\)/src/" in \
+        options["extra_compile_args"]
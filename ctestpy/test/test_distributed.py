@@ -0,0 +1,75 @@
+import logging
+import multiprocessing.connection
+import socket
+import threading
+
+from ctestpy import distributed, report
+from ctestpy import test as ctest
+from ctestpy.logging import _configure_custom_log_levels
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+SUITE = '''
+import ctestpy
+
+
+@ctestpy.parametrize("value", range(3))
+def test_cases(value):
+    assert value != 1, "one"
+
+
+def test_pass():
+    pass
+'''
+
+
+def test_lost_workers_are_replaced(tmp_path, monkeypatch, artifact_store):
+    (tmp_path / "test_remote.py").write_text(SUITE)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    results = report.Results()
+    coordinator = distributed.Coordinator(
+        [ctest.TestSuite("test_remote.py", results=results)], authkey=b"key")
+
+    def lost_worker():
+        # Takes a test method, reports its first case then disconnects, the
+        # remaining cases are handed out again:
+        with multiprocessing.connection.Client(
+                coordinator.address, authkey=b"key") as connection:
+            connection.send(("ready", {}, set()))
+            _, path, name, start, _ = connection.recv()
+            assert (path, name, start) == ("test_remote.py", "test_cases", 0)
+            connection.send(("report", start, {"passed": True}))
+        distributed.run_worker(coordinator.address, b"key")
+
+    worker = threading.Thread(target=lost_worker)
+    worker.start()
+    coordinator.run()
+    worker.join()
+    assert [(result["test"], result["passed"]) for result in results.results] == [
+        ("test_cases[0]", True), ("test_cases[1]", False), ("test_cases[2]", True),
+        ("test_pass", True)]
+
+
+def test_stray_connections_are_ignored(tmp_path, monkeypatch, artifact_store):
+    (tmp_path / "test_remote.py").write_text(SUITE)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    results = report.Results()
+    coordinator = distributed.Coordinator(
+        [ctest.TestSuite("test_remote.py", results=results)], authkey=b"key")
+
+    def worker_after_stray_connection():
+        # A peer connecting and closing before the handshake (e.g. a port
+        # scan) must not stop the coordinator from accepting workers:
+        socket.create_connection(coordinator.address).close()
+        distributed.run_worker(coordinator.address, b"key")
+
+    worker = threading.Thread(target=worker_after_stray_connection, daemon=True)
+    worker.start()
+    run = threading.Thread(target=coordinator.run, daemon=True)
+    run.start()
+    run.join(timeout=60)
+    assert not run.is_alive(), "the coordinator stopped accepting workers"
+    assert len(results.results) == 4
@@ -0,0 +1,72 @@
+import pathlib
+
+import pytest
+
+from ctestpy.builder import CodeUnderTest
+from ctestpy.fuzz import Fuzzer, FuzzTarget, bind_default_returns
+
+MOCK_TARGET_H = """
+long probe(int a, const unsigned char *buf, unsigned long len, short b);
+int check(const unsigned char *buf, unsigned long len);
+"""
+
+MOCK_DEPS_H = """
+int dep(int value);
+"""
+
+MOCK_TARGET = """
+#include "target.h"
+#include "deps.h"
+long probe(int a, const unsigned char *buf, unsigned long len, short b)
+{
+    return a * 1000000L + (len ? buf[len - 1] : 0) * 1000L + len * 10 + b;
+}
+int check(const unsigned char *buf, unsigned long len)
+{
+    unsigned long index;
+    for (index = 0; index < len; index++) {
+        if (buf[index] & 0x80) {
+            *(volatile int *)0 = dep(index);
+        }
+    }
+    return dep(0);
+}
+"""
+
+
+@pytest.fixture
+def target(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "target.h").write_text(MOCK_TARGET_H)
+    (src / "deps.h").write_text(MOCK_DEPS_H)
+    (src / "target.c").write_text(MOCK_TARGET)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    cut = CodeUnderTest(pathlib.Path("src/target.c"), pathlib.Path("src/target.h"))
+    lib, mocking = cut.generate([pathlib.Path("src/deps.h")])
+    bind_default_returns(cut.ffi, lib, mocking._methods)
+    yield cut.ffi, lib
+
+
+def test_target_decodes_scalars_and_buffers(target):
+    ffi, lib = target
+    fuzz_target = FuzzTarget(ffi, lib.probe, max_len=64)
+    assert fuzz_target.header_size == 6
+    data = bytearray(b"\x02\x00\x00\x00\x03\x00abc" + bytes(8))
+    assert fuzz_target.execute(data, 9) == 2000000 + ord("c") * 1000 + 30 + 3
+    # Inputs shorter than the scalars are padded with zeros:
+    assert fuzz_target.execute(data, 2) == 2000000
+
+
+def test_fuzzer_finds_and_minimises_crash(target, tmp_path):
+    ffi, lib = target
+    assert lib.check(b"\x01\x02", 2) == 0
+    fuzzer = Fuzzer(FuzzTarget(ffi, lib.check, 32), tmp_path / "corpus", 32, seed=1)
+    crashes = fuzzer.run(100000)
+    assert len(crashes) == 1
+    assert crashes[0].parent == tmp_path / "corpus" / "crashes"
+    minimised = list(crashes[0].parent.glob("*.min"))
+    assert len(minimised) == 1
+    data = minimised[0].read_bytes()
+    assert len(data) == 1 and data[0] & 0x80
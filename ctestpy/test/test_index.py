@@ -0,0 +1,127 @@
+import pathlib
+
+import pytest
+
+from ctestpy import index
+from ctestpy.builder import CodeUnderTest, preprocess
+
+MOCK_TYPES_H = """
+#ifndef TYPES_H
+#define TYPES_H
+typedef unsigned char u8;
+#define MASK (0x0f << 4)
+#endif
+"""
+
+MOCK_REG_H = """
+#include "types.h"
+#define REG_BASE 0x4000
+#define REG_CTRL (REG_BASE + 4)
+#define REG_COUNT 010
+#define REG_NAME "reg"
+#define REG_READ(x) (x)
+#define REG_NEG (-1)
+#define REG_DIV (-7 / 2)
+u8 reg_read(int address);
+"""
+
+MOCK_DEV_H = """
+#include "types.h"
+#define DEV_READY 1u
+int dev_poll(u8 mask);
+"""
+
+MOCK_DEV = """
+#include "dev.h"
+#include "reg.h"
+int dev_poll(u8 mask)
+{
+    return (reg_read(REG_CTRL) & mask) ? DEV_READY : 0;
+}
+"""
+
+
+@pytest.fixture
+def headers(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "types.h").write_text(MOCK_TYPES_H)
+    (src / "reg.h").write_text(MOCK_REG_H)
+    (src / "dev.h").write_text(MOCK_DEV_H)
+    (src / "dev.c").write_text(MOCK_DEV)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setenv(index.CACHE_ENVIRONMENT_VARIABLE, str(tmp_path / "cache"))
+    monkeypatch.setattr(index, "_ENTRIES", {})
+    yield src
+
+
+def test_header_entry(headers):
+    entry = index.HeaderIndex().lookup("reg.h", [str(headers)])
+    # Strings, function-like macros and expressions that cannot be evaluated
+    # exactly are not indexed:
+    assert entry.macros == {
+        "MASK": 0xf0, "REG_BASE": 0x4000, "REG_CTRL": 0x4004, "REG_COUNT": 8,
+        "REG_NEG": -1}
+    assert entry.functions == {
+        "reg_read": {"args": ["address"], "params": ["int"], "result": "u8"}}
+    assert entry.typedefs == ["u8"]
+
+
+def test_entries_are_reused_across_processes(headers, monkeypatch):
+    first = index.HeaderIndex().lookup("reg.h", [str(headers)])
+    assert list((headers.parent / "cache" / "headers").glob("*.json"))
+    # A new process loads the entry without parsing the header:
+    monkeypatch.setattr(index, "_ENTRIES", {})
+    monkeypatch.setattr(index, "_parse", None)
+    second = index.HeaderIndex().lookup("reg.h", [str(headers)])
+    assert second.as_dict() == first.as_dict()
+
+
+def test_shared_declarations_are_declared_once(headers):
+    entries = index.HeaderIndex().lookup_all(["reg.h", "dev.h"], [str(headers)])
+    cdef = index.declarations(entries, {"dev_poll"})
+    assert cdef.count("typedef unsigned char u8;") == 1
+    assert 'extern "Python+C" u8 reg_read(int address);' in cdef
+    assert "\nint dev_poll(u8 mask);" in cdef
+
+
+def test_macros_are_constants_of_the_module(headers):
+    cut = CodeUnderTest(pathlib.Path("src/dev.c"), pathlib.Path("src/dev.h"))
+    testing, mocking = cut.generate([pathlib.Path("src/reg.h")])
+    assert testing.REG_CTRL == 0x4004
+    assert testing.MASK == 0xf0
+    assert testing.DEV_READY == 1
+    assert not hasattr(testing, "REG_NAME")
+    mocking.reg_read.expect_and_return(testing.REG_CTRL, retval=0x10)
+    assert testing.dev_poll(testing.MASK) == testing.DEV_READY
+    mocking.verify()
+
+
+def test_only_the_source_is_parsed(headers):
+    include_dirs = [str(headers)]
+    entries = index.HeaderIndex().lookup_all(["reg.h", "dev.h"], include_dirs)
+    preprocessed = preprocess(MOCK_DEV, include_dirs, markers=True)
+    assert "reg_read(int address);" not in index.source_code(preprocessed)
+    local_functions, externs, referenced = CodeUnderTest._functions(
+        entries, preprocessed)
+    assert [fn.name for fn in local_functions] == ["dev_poll"]
+    assert [(fn.name, fn.args, fn.params, fn.result) for fn in externs] == [
+        ("reg_read", ["address"], ["int"], "u8")]
+    assert "reg_read" in referenced
+
+
+def test_unchanged_headers_are_not_preprocessed(headers, monkeypatch):
+    first = index.HeaderIndex().lookup("reg.h", [str(headers)])
+    original = index.HeaderIndex._preprocess
+
+    def preprocess_once(*args):
+        monkeypatch.setattr(index.HeaderIndex, "_preprocess", None)
+        return original(*args)
+    monkeypatch.setattr(index.HeaderIndex, "_preprocess", None)
+    monkeypatch.setattr(index, "_ENTRIES", {})
+    assert index.HeaderIndex().lookup("reg.h", [str(headers)]).digest == first.digest
+    # A header it includes changed:
+    (headers / "types.h").write_text(MOCK_TYPES_H.replace("0x0f", "0x07"))
+    monkeypatch.setattr(index.HeaderIndex, "_preprocess", preprocess_once)
+    assert index.HeaderIndex().lookup("reg.h", [str(headers)]).macros["MASK"] == 0x70
@@ -0,0 +1,115 @@
+import io
+import logging
+import multiprocessing
+import os
+
+import pytest
+
+from ctestpy import logging as test_logging
+
+if not hasattr(logging, "RUNNING"):
+    test_logging._configure_custom_log_levels()
+
+
+class _Capture(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def capture():
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    level = root.level
+    for handler in handlers:
+        root.removeHandler(handler)
+    handler = _Capture()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    yield handler
+    root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _run_test(name, passed):
+    logger = logging.getLogger("test")
+    test_logging.begin_test(name)
+    logger.running("%s", name)
+    logger.info("%s: details", name)
+    if passed:
+        logger.passed("%s", name)
+    else:
+        logger.failed("%s", name)
+    test_logging.end_test(passed)
+
+
+def _crash(name):
+    test_logging.begin_test(name)
+    logging.getLogger("test").error("%s: crashed", name)
+    test_logging.flush()
+    os._exit(1)
+
+
+def test_records_buffered_until_end_of_test(capture):
+    with test_logging.TestLogListener():
+        logger = logging.getLogger("test")
+        test_logging.begin_test("test_a")
+        logger.info("test_a: details")
+        logger.info("test_a: more details")
+        test_logging.end_test(True)
+        logger.info("untagged")
+    assert capture.messages == ["test_a: details", "test_a: more details", "untagged"]
+
+
+def test_failed_only_drops_logs_of_passing_tests(capture):
+    with test_logging.TestLogListener(failed_only=True):
+        _run_test("test_pass", True)
+        _run_test("test_fail", False)
+    assert capture.messages == [
+        "test_pass",
+        "test_fail", "test_fail: details", "test_fail",
+    ]
+
+
+def test_records_of_crashed_process_are_output(capture):
+    with test_logging.TestLogListener(failed_only=True):
+        process = multiprocessing.Process(target=_crash, args=("test_crash",))
+        process.start()
+        process.join()
+        test = (process.pid, "test_crash")
+        logging.getLogger("test").failed("%s", "test_crash", extra={"ctestpy_test": test})
+        test_logging.end_test(False, test)
+    assert capture.messages == ["test_crash: crashed", "test_crash"]
+
+
+def test_formatter_does_not_modify_records():
+    formatter = test_logging.MyFormatter(
+        colorise=True, fmt=test_logging.DEFAULT_FORMAT)
+    record = logging.getLogger("test").makeRecord(
+        "test", logging.FAILED, __file__, 0, "test_%s", ("a",), None)
+    assert "\033[31m" in formatter.format(record)
+    assert record.levelname == "FAILED"
+    assert record.msg == "test_%s"
+    assert record.getMessage() == "test_a"
+
+
+def test_configure_logger_is_idempotent(capture):
+    stream = io.StringIO()
+    handlers = logging.getLogger().handlers[:]
+    test_logging.configure_logger(stream=stream)
+    test_logging.configure_logger(stream=stream)
+    try:
+        assert len(logging.getLogger().handlers) == len(handlers) + 1
+        logging.getLogger("test").passed("test_a")
+    finally:
+        test_logging.configure_logger(stream=None)
+    # Not a terminal, so not colorised:
+    assert stream.getvalue().endswith("] PASSED : test_a\n")
+    assert logging.getLogger().handlers == handlers
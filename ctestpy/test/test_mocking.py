@@ -0,0 +1,103 @@
+import pathlib
+
+import pytest
+
+from ctestpy.builder import CodeUnderTest, MockedMethods
+
+MOCK_HAL_H = """
+int hal_read(int reg);
+int hal_write(int reg, int value);
+int hal_reset(void);
+int hal_send(const unsigned char *buf, unsigned long len);
+"""
+
+MOCK_CUT_H = """
+int cut_read(int reg);
+int cut_send(const unsigned char *buf, unsigned long len);
+"""
+
+MOCK_CUT = """
+#include "cut.h"
+#include "hal.h"
+int cut_read(int reg)
+{
+    return hal_read(reg);
+}
+int cut_send(const unsigned char *buf, unsigned long len)
+{
+    return hal_send(buf + 1, len - 1);
+}
+"""
+
+
+@pytest.fixture
+def cut(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "hal.h").write_text(MOCK_HAL_H)
+    (src / "cut.h").write_text(MOCK_CUT_H)
+    (src / "cut.c").write_text(MOCK_CUT)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    testing = CodeUnderTest(
+        pathlib.Path("src/cut.c"), pathlib.Path("src/cut.h"))
+    yield testing.generate([pathlib.Path("src/hal.h")])
+
+
+def test_referenced_mocks_are_bound_up_front(cut):
+    _, mocking = cut
+    assert "hal_read" in vars(mocking)
+    assert "hal_write" not in vars(mocking)
+    assert "hal_send" in vars(mocking)
+
+
+def test_mocks_are_created_on_first_access(cut):
+    _, mocking = cut
+    mock = mocking.hal_write
+    assert mocking.hal_write is mock
+    assert "hal_write" in vars(mocking)
+    with pytest.raises(AttributeError):
+        mocking.not_a_mock
+
+
+def test_verify_only_visits_mocks_with_expectations(cut):
+    testing, mocking = cut
+    mocking.hal_read.expect_and_return(7, retval=42)
+    assert list(mocking._expecting) == ["hal_read"]
+    assert testing.cut_read(7) == 42
+    mocking.verify()
+
+
+def test_mocks_can_be_indexed_once(cut):
+    _, mocking = cut
+    mocks = MockedMethods(mocking._ffi, mocking._methods, {"hal_read"})
+    assert mocks._methods is mocking._methods
+    assert "hal_reset" not in vars(mocks)
+
+
+def test_pointer_arguments_match_expected_buffers(cut):
+    testing, mocking = cut
+    payload = bytearray(b"\x00framed-payload")
+    mocking.hal_send.expect_and_return(
+        payload[1:], len(payload) - 1, retval=3)
+    buf = mocking._ffi.from_buffer("unsigned char[]", payload)
+    assert testing.cut_send(buf, len(payload)) == 3
+    mocking.verify()
+
+
+def test_only_pointer_arguments_are_compared_as_buffers(cut):
+    _, mocking = cut
+    actual = mocking._ffi.from_buffer("unsigned char[]", b"abcd")
+    mock = mocking.hal_send
+    assert mock._pointed_to(b"abcd", actual) == b"abcd"
+    assert mock._pointed_to(4, actual) is None
+    assert mock._pointed_to(b"abcd", 4) is None
+
+
+def test_non_contiguous_expected_buffers_are_copied(cut):
+    _, mocking = cut
+    actual = mocking._ffi.from_buffer("unsigned char[]", b"ace")
+    mock = mocking.hal_send
+    assert mock._pointed_to(memoryview(b"abcdef")[::2], actual) == b"ace"
+    grid = memoryview(bytearray(b"abcdef")).cast("B", (3, 2))
+    assert mock._pointed_to(grid[::2], actual) == b"abef"
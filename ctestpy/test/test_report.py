@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+import xml.etree.ElementTree as ElementTree
+
+from ctestpy import report
+from ctestpy import test as ctest
+from ctestpy.logging import _configure_custom_log_levels
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+
+def test_results_are_streamed(tmp_path):
+    path = tmp_path / "results.jsonl"
+
+    def test_pass():
+        pass
+
+    def test_fail():
+        assert False, "wrong"
+
+    def test_crash():
+        os._exit(3)
+
+    with report.Results(path) as results:
+        for function in (test_pass, test_fail, test_crash):
+            method = ctest.TestMethod(function.__name__, function, {})
+            ctest.TestSuite._run_method(
+                method,
+                lambda index, case, name=method.name: results.add("suite", name, case))
+            # Each result is written as soon as it is added:
+            assert len(path.read_text().splitlines()) == len(results.results)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line["test"], line["passed"]) for line in lines] == [
+        ("test_pass", True), ("test_fail", False), ("test_crash", False)]
+    assert lines[0]["cpu"] >= 0 and lines[0]["maxrss"] > 0
+    assert lines[0]["builds"] == {"hits": 0, "misses": 0, "stored": 0}
+    assert lines[1]["error"].startswith("wrong")
+    assert lines[2]["error"] == "the test process exited with code 3"
+    assert "cpu" not in lines[2] and lines[2]["wall"] > 0
+
+
+def test_junit_xml(tmp_path):
+    results = [
+        {"suite": "suite", "test": "test_pass", "passed": True, "wall": 0.5,
+         "cpu": 0.25, "maxrss": 1024, "builds": {"hits": 1, "misses": 0}},
+        {"suite": "suite", "test": "test_crash", "passed": False, "wall": 0.25,
+         "error": "the test process exited with code 1"},
+    ]
+    report.write_junit(results, tmp_path / "results.xml")
+    suite = ElementTree.parse(tmp_path / "results.xml").getroot().find("testsuite")
+    assert suite.get("tests") == "2" and suite.get("failures") == "1"
+    assert suite.get("time") == "0.750000"
+    passed, crashed = suite.findall("testcase")
+    assert {
+        element.get("name"): element.get("value")
+        for element in passed.iter("property")} == {
+        "cpu": "0.25", "maxrss": "1024", "build_cache_hits": "1",
+        "build_cache_misses": "0"}
+    assert crashed.find("failure").get("message") == results[1]["error"]
@@ -0,0 +1,71 @@
+import logging
+import os
+
+import pytest
+
+from ctestpy import report
+from ctestpy import shared
+from ctestpy import test as ctest
+from ctestpy.logging import _configure_custom_log_levels
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+SUITE = '''
+import array
+import os
+import pathlib
+
+import ctestpy
+
+DIRECTORY = pathlib.Path(__file__).parent
+
+
+@ctestpy.shared_fixture
+def samples():
+    with (DIRECTORY / "loads").open("a") as stream:
+        stream.write(f"{os.getpid()}\\n")
+    return array.array("h", range(1000))
+
+
+@ctestpy.shared_fixture
+def raw():
+    return DIRECTORY / "raw.bin"
+
+
+def test_samples(samples):
+    assert samples.readonly
+    assert samples.format == "h" and samples[999] == 999
+
+
+def test_raw(raw, samples):
+    assert bytes(raw) == b"\\x01\\x02\\x03"
+    assert len(samples) == 1000
+'''
+
+
+def test_shared_fixture_is_loaded_once(tmp_path, monkeypatch):
+    (tmp_path / "test_shared_suite.py").write_text(SUITE)
+    (tmp_path / "raw.bin").write_bytes(b"\x01\x02\x03")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    with report.Results() as results:
+        ctest.TestSuite("test_shared_suite.py", results=results).run()
+    assert [(result["test"], result["passed"]) for result in results.results] == [
+        ("test_samples", True), ("test_raw", True)]
+    # Loaded by this process, before the test processes were started:
+    assert (tmp_path / "loads").read_text() == f"{os.getpid()}\n"
+
+
+def test_numpy_data_is_a_read_only_array():
+    numpy = pytest.importorskip("numpy")
+
+    @shared.shared_fixture
+    def image():
+        return numpy.arange(12, dtype=numpy.uint16).reshape(3, 4)
+
+    with image() as data:
+        assert data.dtype == numpy.uint16 and data.shape == (3, 4)
+        assert data[2, 3] == 11
+        assert not data.flags.writeable
+    image.__ctestpy_shared__.close()
@@ -0,0 +1,72 @@
+import logging
+import os
+
+import pytest
+
+import ctestpy
+from ctestpy.logging import _configure_custom_log_levels
+from ctestpy import test as ctest
+
+if not hasattr(logging, "RUNNING"):
+    _configure_custom_log_levels()
+
+
+def test_parametrize_names_cases():
+    @ctestpy.parametrize("first, second", [(1, 2), ("a", object())])
+    def test_me(first, second):
+        pass
+
+    method = ctest.TestMethod("test_me", test_me, {}, test_me.__ctestpy_parametrize__)
+    assert method.cases == 2
+    assert method.case_name(0) == "test_me[1-2]"
+    assert method.case_name(1) == "test_me[a-second1]"
+
+
+def test_parametrize_single_argname():
+    @ctestpy.parametrize("value", [(1, 2), 3], ids=["pair", "three"])
+    def test_me(value):
+        pass
+
+    argnames, cases, ids = test_me.__ctestpy_parametrize__
+    assert argnames == ["value"]
+    assert cases == [((1, 2),), (3,)]
+    assert ids == ["pair", "three"]
+
+
+def test_parametrize_rejects_missing_values():
+    with pytest.raises(ValueError):
+        ctestpy.parametrize("first, second", [(1,)])
+
+
+def test_cases_after_a_crash_run_in_a_fresh_worker(tmp_path):
+    parent = os.getpid()
+
+    @ctestpy.parametrize("value", range(6))
+    def test_me(value):
+        (tmp_path / f"{value}-{os.getpid()}").touch()
+        if value in (1, 2):
+            os._exit(1)
+        assert value != 4
+
+    method = ctest.TestMethod("test_me", test_me, {}, test_me.__ctestpy_parametrize__)
+    ctest.TestSuite._run_method(method)
+    runs = sorted(path.name.split("-") for path in tmp_path.iterdir())
+    assert [int(value) for value, _ in runs] == list(range(6))
+    workers = {pid for _, pid in runs}
+    assert str(parent) not in workers
+    # Cases 0-1, 2 and 3-5 each ran in their own worker:
+    assert len(workers) == 3
+
+
+def test_fail_reports_the_case():
+    @ctestpy.parametrize("value", range(3))
+    def test_me(value):
+        if value == 1:
+            ctest.fail("unexpected call")
+
+    method = ctest.TestMethod("test_me", test_me, {}, test_me.__ctestpy_parametrize__)
+    reports = {}
+    ctest.TestSuite._run_method(method, reports.__setitem__)
+    assert [reports[index]["passed"] for index in range(3)] == [True, False, True]
+    assert reports[1]["error"] == "unexpected call"
+    assert {"cpu", "maxrss", "builds"} <= reports[1].keys()
@@ -2,42 +2,162 @@
 #pylint:enable=missing-docstring
 
 
-import time
+import argparse
 
+from fun_async.coroutines.coroutines import AsyncRunner
+from fun_async.engine.benchmark import (
+    DEFAULT_BACKENDS, DEFAULT_COUNTS, WORKLOADS, compare, compare_waits)
+from fun_async.engine.engine import BACKENDS, Engine
+from fun_async.instrumentation.instrumentation import Recorder
 from fun_async.threads.threads import ThreadingDemo
+from fun_async.workloads.workloads import BlockingMethod
 
 
-class BlockingMethod:
+def _positive_int(value):
     """
-    A method that blocks for some time
+    An argparse type for integers of at least 1
     """
-    block_for = 5
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
 
-    def __init__(self, uid):
-        self._uid = uid
 
-    def __call__(self):
-        print(f"  {self._uid}: Started")
-        time.sleep(type(self).block_for)
-        print(f"  {self._uid}: Finished")
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        prog="fun_async", description="Demonstrations of concurrency in Python")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("threads", help="start a thread per task (the default)")
+    engine = commands.add_parser(
+        "engine", help="run tasks with a backend of the concurrency engine")
+    engine.add_argument(
+        "--backend", choices=sorted(BACKENDS), default="threads",
+        help="how to run the tasks (default: %(default)s)")
+    engine.add_argument(
+        "--tasks", type=int, default=10,
+        help="number of tasks (default: %(default)s)")
+    compare_backends = commands.add_parser(
+        "compare", help="compare the backends as the number of tasks scales")
+    compare_backends.add_argument(
+        "--counts", type=int, nargs="+", default=list(DEFAULT_COUNTS),
+        help="numbers of tasks (default: %(default)s)")
+    compare_backends.add_argument(
+        "--backends", choices=sorted(BACKENDS), nargs="+",
+        default=list(DEFAULT_BACKENDS), help="backends to compare (default: "
+        "%(default)s)")
+    coroutines = commands.add_parser(
+        "coroutines", help="run tasks as the asyncio tasks of one thread")
+    coroutines.add_argument(
+        "--tasks", type=int, default=10,
+        help="number of tasks (default: %(default)s)")
+    coroutines.add_argument(
+        "--limit", type=int,
+        help="maximum number of tasks running at a time (default: no limit)")
+    coroutines.add_argument(
+        "--timeout", type=float,
+        help="seconds after which a task is cancelled (default: no timeout)")
+    coroutines.add_argument(
+        "--block-for", type=float, default=1.0,
+        help="seconds each task waits for (default: %(default)s)")
+    waits = commands.add_parser(
+        "waits", help="compare concurrent waits in one thread against a thread "
+        "per wait")
+    waits.add_argument(
+        "--counts", type=int, nargs="+", default=list(DEFAULT_COUNTS),
+        help="numbers of concurrent waits (default: %(default)s)")
+    waits.add_argument(
+        "--block-for", type=float, default=1.0,
+        help="seconds each task waits for (default: %(default)s)")
+    waits.add_argument(
+        "--max-threads", type=int, default=10000,
+        help="do not start more threads than this (default: %(default)s)")
+    cpu = commands.add_parser(
+        "cpu", help="measure the speedup of CPU-bound work with threads and "
+        "processes (requires NumPy)")
+    cpu.add_argument(
+        "--kernels", choices=["python", "numpy"], nargs="+",
+        default=["python", "numpy"], help="kernels to run (default: all)")
+    cpu.add_argument(
+        "--size", type=_positive_int, default=1000000,
+        help="number of elements of the array (default: %(default)s)")
+    cpu.add_argument(
+        "--workers", type=_positive_int, nargs="+",
+        help="numbers of threads and processes (default: powers of two up to "
+        "the number of cores)")
+    cpu.add_argument(
+        "--pickle", action="store_true",
+        help="return the results pickled rather than through shared memory")
+    cpu.add_argument(
+        "--repeat", type=_positive_int, default=3,
+        help="runs of each measurement, the fastest is kept (default: "
+        "%(default)s)")
+    for command in (engine, coroutines):
+        command.add_argument(
+            "--trace", metavar="PATH",
+            help="record how the tasks are scheduled, and write a Chrome trace "
+            "of the run to PATH")
+        command.add_argument(
+            "--sample-interval", type=float, default=0.001,
+            help="seconds between samples of the live threads and tasks, with "
+            "--trace (default: %(default)s)")
+    for command in (engine, compare_backends):
+        command.add_argument(
+            "--workload", choices=sorted(WORKLOADS), default="blocking",
+            help="blocking (time.sleep) or async (asyncio.sleep) tasks "
+            "(default: %(default)s)")
+        command.add_argument(
+            "--workers", type=int, default=32,
+            help="threads, processes or concurrent tasks of the backend "
+            "(default: %(default)s)")
+        command.add_argument(
+            "--block-for", type=float, default=0.001,
+            help="seconds each task blocks for (default: %(default)s)")
+    return parser.parse_args()
 
-    @classmethod
-    def create_methods(cls, num):
-        """
-        Create a list of @num BlockingMethod instances
-        """
-        blocking_methods = []
-        for uid in range(num):
-            blocking_methods.append(BlockingMethod(uid))
-        return blocking_methods
+
+def _run(backend, methods, args):
+    """
+    Run @methods with the Engine and @backend, recording the run if a --trace
+    is requested
+    """
+    recorder = Recorder(args.sample_interval) if args.trace else None
+    print(Engine(backend, recorder).run(methods))
+    if recorder is not None:
+        print(recorder)
+        recorder.write_chrome_trace(args.trace)
+        print(f"Chrome trace written to {args.trace}")
 
 
 def main():
     """
     Entry point for the demonstrations
     """
-    threading_demo = ThreadingDemo(methods=BlockingMethod.create_methods(10))
-    threading_demo.run()
+    args = _parse_args()
+    if args.command == "engine":
+        methods = WORKLOADS[args.workload].create_methods(
+            args.tasks, args.block_for, verbose=False)
+        _run(BACKENDS[args.backend](args.workers), methods, args)
+    elif args.command == "compare":
+        compare(
+            args.counts, args.backends, args.block_for, args.workers,
+            args.workload)
+    elif args.command == "coroutines":
+        methods = WORKLOADS["async"].create_methods(
+            args.tasks, args.block_for, verbose=args.tasks <= 10)
+        _run(AsyncRunner(args.limit, args.timeout), methods, args)
+    elif args.command == "waits":
+        compare_waits(args.counts, args.block_for, args.max_threads)
+    elif args.command == "cpu":
+        # NumPy is optional, only import it when needed
+        from fun_async.cpu.cpu import scaling  # pylint:disable=import-outside-toplevel
+        scaling(
+            args.kernels, args.size, args.workers, not args.pickle, args.repeat)
+    else:
+        threading_demo = ThreadingDemo(methods=BlockingMethod.create_methods(10))
+        threading_demo.run()
 
 
 if __name__ == "__main__":
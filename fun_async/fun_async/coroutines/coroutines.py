@@ -0,0 +1,145 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import asyncio
+import concurrent.futures
+import functools
+import operator
+import signal
+import time
+
+from fun_async.engine.tasks import Hooks, TaskResult, is_coroutine
+
+
+class AsyncRunner:
+    """
+    Run tasks as the asyncio tasks of one event loop, in a single thread: a
+    task waiting (e.g. on asyncio.sleep, or a socket) costs a coroutine rather
+    than a thread. Coroutine functions are awaited, blocking callables are
+    bridged to a pool of threads (see blocking)
+
+    Args:
+        limit: maximum number of tasks running at a time (None: no limit).
+            Tasks are only created as others complete, so at most @limit
+            coroutines exist at a time
+        timeout: seconds a task may run before it is cancelled (None: no limit)
+        executor: concurrent.futures.Executor running the blocking callables
+            (default: a pool of @limit threads, or the event loop's default)
+    """
+    name = "asyncio"
+
+    def __init__(self, limit=None, timeout=None, executor=None):
+        self._limit = limit
+        self._timeout = timeout
+        self._executor = executor
+        self._tasks = set()
+        self._cancelled = False
+
+    def run(self, methods, hooks=None):
+        """
+        Run each of @methods in a new event loop, returns the TaskResult of
+        each method that was run (in order), calling @hooks (see gather).
+        Ctrl-C cancels the run
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.cancel)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on this platform, or not the main thread
+            pass
+        try:
+            return loop.run_until_complete(self.gather(methods, hooks))
+        finally:
+            loop.close()
+
+    def cancel(self):
+        """
+        Cancel the running tasks (but the task calling it, if any), and do not
+        start any more
+        """
+        self._cancelled = True
+        try:
+            current = asyncio.current_task()
+        except RuntimeError:
+            # Not called from the event loop
+            current = None
+        for task in list(self._tasks):
+            # A task cancelling itself would be cancelled as it returns, and
+            # its result lost
+            if task is not current:
+                task.cancel()
+
+    def blocking(self, method):
+        """
+        Return a coroutine function calling the blocking @method in the
+        runner's executor (loop.run_in_executor), so that awaiting it does not
+        block the event loop. A blocking call cannot be interrupted: when its
+        task is cancelled (or times out) the call still runs to completion
+        """
+        async def bridge():
+            return await asyncio.get_event_loop().run_in_executor(
+                self._executor, method)
+        return bridge
+
+    async def gather(self, methods, hooks=None):
+        """
+        Run each of @methods (an iterable, only consumed as tasks are started)
+        as a task of the running event loop, returns the TaskResult of each
+        method that was run (in order). @hooks (see Hooks) are called as the
+        tasks are created and completed
+        """
+        hooks = hooks or Hooks()
+        loop = asyncio.get_event_loop()
+        self._cancelled = False
+        semaphore = asyncio.Semaphore(self._limit) if self._limit else None
+        owned = None
+        if self._executor is None and self._limit:
+            owned = self._executor = concurrent.futures.ThreadPoolExecutor(self._limit)
+        results = []
+        submitted = time.perf_counter()
+        try:
+            for index, method in enumerate(methods):
+                if semaphore is not None:
+                    await semaphore.acquire()
+                if self._cancelled:
+                    break
+                hooks.task_submitted(index, submitted)
+                task = loop.create_task(self._run_task(index, method, submitted))
+                self._tasks.add(task)
+                task.add_done_callback(functools.partial(
+                    self._done, results, semaphore, hooks, index, submitted))
+            if self._tasks:
+                await asyncio.wait(self._tasks)
+        finally:
+            if owned is not None:
+                # Do not block the event loop on the calls which timed out
+                owned.shutdown(wait=False)
+                self._executor = None
+        results.sort(key=operator.attrgetter("index"))
+        return results
+
+    async def _run_task(self, index, method, submitted):
+        # The tasks share the event loop's thread, so they have no worker
+        started = time.perf_counter()
+        try:
+            call = method if is_coroutine(method) else self.blocking(method)
+            value = await asyncio.wait_for(call(), self._timeout)
+        except (Exception, asyncio.CancelledError) as error:  # pylint:disable=broad-except
+            return TaskResult(
+                index, None, error, submitted, time.perf_counter(), started)
+        return TaskResult(index, value, None, submitted, time.perf_counter(), started)
+
+    def _done(self, results, semaphore, hooks, index, submitted, task):
+        #pylint:disable=too-many-arguments
+        self._tasks.discard(task)
+        if task.cancelled():
+            # Cancelled before it started
+            results.append(TaskResult(
+                index, None, asyncio.CancelledError(), submitted,
+                time.perf_counter()))
+        else:
+            results.append(task.result())
+        hooks.task_completed(results[-1])
+        if semaphore is not None:
+            semaphore.release()
@@ -0,0 +1,230 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import concurrent.futures
+import contextlib
+import math
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy
+
+DEFAULT_SIZE = 1000000
+
+# Number of chunks each worker is given (more chunks balance the load better,
+# at the cost of more tasks)
+CHUNKS_PER_WORKER = 4
+
+
+def python_kernel(values, out):
+    """
+    Pure Python loop over the elements of @values (memoryviews of doubles),
+    which holds the GIL for the whole chunk
+    """
+    for index, value in enumerate(values):
+        out[index] = math.sqrt(value) * math.sin(value) + math.log1p(value)
+
+
+def numpy_kernel(values, out):
+    """
+    The same computation as python_kernel, vectorised with NumPy: the loops
+    run in C, and release the GIL
+    """
+    values = numpy.frombuffer(values, dtype=numpy.float64)
+    out = numpy.frombuffer(out, dtype=numpy.float64)
+    numpy.sqrt(values, out=out)
+    out *= numpy.sin(values)
+    out += numpy.log1p(values)
+
+
+KERNELS = {"python": python_kernel, "numpy": numpy_kernel}
+
+
+def cpu_count():
+    """
+    Number of cores this process may run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+@contextlib.contextmanager
+def _doubles(memory, start, stop):
+    """
+    Context manager giving a memoryview of the doubles [@start, @stop) of the
+    SharedMemory @memory, released on exit (so the memory can be closed)
+    """
+    with memoryview(memory.buf) as raw, raw.cast("d") as doubles, \
+            doubles[start:stop] as view:
+        yield view
+
+
+def _run_chunk(kernel, names, start, stop, shared):
+    """
+    Run @kernel (a name of KERNELS) over the elements [@start, @stop) of the
+    input array in the shared memory names[0]. When @shared, the result is
+    written to the output array in the shared memory names[1] and only the
+    time taken is returned, otherwise the result is returned (pickled, when
+    run by a process)
+    """
+    #pylint:disable=too-many-arguments
+    begin = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        values_memory = shared_memory.SharedMemory(names[0])
+        stack.callback(values_memory.close)
+        values = stack.enter_context(_doubles(values_memory, start, stop))
+        if shared:
+            out_memory = shared_memory.SharedMemory(names[1])
+            stack.callback(out_memory.close)
+            out = stack.enter_context(_doubles(out_memory, start, stop))
+            KERNELS[kernel](values, out)
+            return time.perf_counter() - begin
+        result = bytearray(values.nbytes)
+        with memoryview(result) as raw, raw.cast("d") as out:
+            KERNELS[kernel](values, out)
+        return result
+
+
+class CpuRunner:
+    """
+    Run a CPU-bound kernel over a large array of doubles, split into chunks
+    run concurrently by a pool of threads or processes. The input and output
+    arrays are in shared memory, so processes attach to them rather than
+    receiving a pickled copy of their chunk, and write their result in place
+    rather than returning it pickled (unless @shared is False)
+
+    Args:
+        backend: "serial" (a single chunk, in this thread), "threads" or
+            "processes"
+        workers: number of threads or processes
+        shared: return the results through shared memory, or pickled
+    """
+    #pylint:disable=too-few-public-methods
+    BACKENDS = ("serial", "threads", "processes")
+
+    def __init__(self, backend="processes", workers=None, shared=True):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}")
+        self._backend = backend
+        self._workers = 1 if backend == "serial" else workers or cpu_count()
+        self._shared = shared
+
+    def _executor(self):
+        if self._backend == "processes":
+            return concurrent.futures.ProcessPoolExecutor(self._workers)
+        return concurrent.futures.ThreadPoolExecutor(self._workers)
+
+    def run(self, kernel, values):
+        """
+        Run @kernel (a name of KERNELS) over @values (a NumPy array), returns
+        the results (a NumPy array) and the seconds taken, which includes
+        starting the workers
+        """
+        values = numpy.ascontiguousarray(values, dtype=numpy.float64)
+        # Shared memory cannot be empty, and must hold a whole double to be
+        # viewed as doubles
+        size = max(values.nbytes, values.itemsize)
+        values_memory = shared_memory.SharedMemory(create=True, size=size)
+        out_memory = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            shared_values = numpy.ndarray(
+                values.shape, numpy.float64, buffer=values_memory.buf)
+            shared_values[:] = values
+            del shared_values
+            names = (values_memory.name, out_memory.name)
+            begin = time.perf_counter()
+            if self._backend == "serial":
+                self._run_chunks(None, kernel, names, len(values), 1)
+            else:
+                with self._executor() as executor:
+                    self._run_chunks(
+                        executor, kernel, names, len(values),
+                        self._workers * CHUNKS_PER_WORKER)
+            elapsed = time.perf_counter() - begin
+            return numpy.ndarray(
+                values.shape, numpy.float64, buffer=out_memory.buf).copy(), elapsed
+        finally:
+            values_memory.close()
+            values_memory.unlink()
+            out_memory.close()
+            out_memory.unlink()
+
+    def _run_chunks(self, executor, kernel, names, length, chunks):
+        #pylint:disable=too-many-arguments
+        bounds = [
+            (length * chunk // chunks, length * (chunk + 1) // chunks)
+            for chunk in range(chunks)]
+        shared = self._shared or executor is None
+        if executor is None:
+            results = [
+                _run_chunk(kernel, names, start, stop, shared)
+                for start, stop in bounds]
+        else:
+            futures = [
+                executor.submit(_run_chunk, kernel, names, start, stop, shared)
+                for start, stop in bounds]
+            results = [future.result() for future in futures]
+        if shared:
+            return
+        # Copy the pickled results to the output array
+        out_memory = shared_memory.SharedMemory(names[1])
+        try:
+            for (start, stop), result in zip(bounds, results):
+                with _doubles(out_memory, start, stop) as out, \
+                        memoryview(result) as raw, raw.cast("d") as chunk:
+                    out[:] = chunk
+        finally:
+            out_memory.close()
+
+
+def _best(runner, kernel, values, repeat):
+    """
+    Run @kernel with @runner @repeat times, returns the results and the
+    fastest time
+    """
+    runs = [runner.run(kernel, values) for _ in range(repeat)]
+    return runs[0][0], min(elapsed for _, elapsed in runs)
+
+
+def scaling(kernels=tuple(KERNELS), size=DEFAULT_SIZE, workers=None, shared=True,
+            repeat=3):
+    """
+    Measure the speedup of running each of @kernels over @size elements with
+    threads and with processes, for each number of @workers (default: powers
+    of two up to the number of cores), against running it serially; print a
+    table of the results. Each time is the fastest of @repeat runs
+    """
+    #pylint:disable=too-many-arguments,too-many-locals
+    cores = cpu_count()
+    if workers is None:
+        workers = sorted({2 ** power for power in range(cores.bit_length())} | {cores})
+    values = numpy.random.default_rng(0).random(size) * 1000.0
+    print(
+        f"Speedup over serial, {size} elements, {cores} cores, results "
+        f"{'in shared memory' if shared else 'pickled'}")
+    print(
+        f"{'kernel':<8} {'backend':<10} {'workers':>7} {'seconds':>8} "
+        f"{'speedup':>8} {'per core':>8}")
+    rows = []
+    for kernel in kernels:
+        expected, serial = _best(CpuRunner("serial"), kernel, values, repeat)
+        print(
+            f"{kernel:<8} {'serial':<10} {1:>7} {serial:>8.3f} {1.0:>8.2f} "
+            f"{1.0:>8.2f}")
+        for backend in ("threads", "processes"):
+            for count in workers:
+                result, elapsed = _best(
+                    CpuRunner(backend, count, shared), kernel, values, repeat)
+                if not numpy.allclose(result, expected):
+                    raise AssertionError(f"{kernel} {backend} computed wrong results")
+                speedup = serial / elapsed
+                # Cores beyond those available cannot speed up the run
+                efficiency = speedup / min(count, cores)
+                rows.append((kernel, backend, count, elapsed, speedup))
+                print(
+                    f"{kernel:<8} {backend:<10} {count:>7} {elapsed:>8.3f} "
+                    f"{speedup:>8.2f} {efficiency:>8.2f}")
+    return rows
@@ -0,0 +1,108 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import multiprocessing
+
+from fun_async.engine.engine import BACKENDS, Engine
+from fun_async.workloads.workloads import AsyncBlockingMethod, BlockingMethod
+
+DEFAULT_COUNTS = (10, 100, 1000, 10000, 100000)
+
+# The backends with a bounded number of workers
+DEFAULT_BACKENDS = ("threads", "processes", "asyncio")
+
+WORKLOADS = {"blocking": BlockingMethod, "async": AsyncBlockingMethod}
+
+
+def _measure(backend, count, block_for, max_workers, workload, connection):
+    #pylint:disable=too-many-arguments
+    methods = WORKLOADS[workload].create_methods(count, block_for, verbose=False)
+    report = Engine(BACKENDS[backend](max_workers)).run(methods)
+    connection.send(report.summary())
+    connection.close()
+
+
+def measure(backend, count, block_for=0.001, max_workers=32, workload="blocking"):
+    """
+    Run @count tasks of @workload (a name of WORKLOADS) with @backend (a name of
+    BACKENDS) in a fresh process, so the peak memory is that of this run alone,
+    returns the summary of its RunReport
+    """
+    #pylint:disable=too-many-arguments
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_measure,
+        args=(backend, count, block_for, max_workers, workload, sender))
+    process.start()
+    sender.close()
+    with receiver:
+        try:
+            summary = receiver.recv()
+        except EOFError:
+            summary = None
+    process.join()
+    if summary is None:
+        raise RuntimeError(
+            f"{backend} failed to run {count} tasks (exit code {process.exitcode})")
+    return summary
+
+
+def _print_header():
+    print(
+        f"{'backend':<16} {'tasks':>7} {'errors':>6} {'wall s':>8} "
+        f"{'tasks/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'RSS KiB':>8} {'workers':>8}")
+
+
+def _print_row(summary):
+    print(
+        f"{summary['backend']:<16} {summary['tasks']:>7} {summary['errors']:>6} "
+        f"{summary['wall']:>8.3f} {summary['throughput']:>9.0f} "
+        f"{summary['p50'] * 1e3:>8.1f} {summary['p99'] * 1e3:>8.1f} "
+        f"{summary['max'] * 1e3:>8.1f} {summary['peak_rss']:>8} "
+        f"{summary['worker_rss']:>8}")
+
+
+def compare(counts=DEFAULT_COUNTS, backends=DEFAULT_BACKENDS, block_for=0.001,
+            max_workers=32, workload="blocking"):
+    """
+    Measure each of @backends as the number of tasks scales through @counts,
+    and print a table of the results
+    """
+    #pylint:disable=too-many-arguments
+    print(
+        f"Comparing backends, {workload} tasks wait for {block_for * 1e3:g}ms, "
+        f"{max_workers} workers")
+    _print_header()
+    summaries = []
+    for count in counts:
+        for backend in backends:
+            summary = measure(backend, count, block_for, max_workers, workload)
+            summaries.append(summary)
+            _print_row(summary)
+    return summaries
+
+
+def compare_waits(counts=DEFAULT_COUNTS, block_for=1.0, max_threads=10000):
+    """
+    Compare waiting on @counts tasks at once in a single thread (AsyncRunner,
+    with AsyncBlockingMethod tasks) against starting a thread per task (like
+    ThreadingDemo, with BlockingMethod tasks), and print a table of the
+    results. No more than @max_threads threads are started
+    """
+    print(f"Comparing concurrent waits of {block_for:g}s")
+    _print_header()
+    summaries = []
+    for count in counts:
+        runs = [("asyncio", "async")]
+        if count <= max_threads:
+            runs.append(("thread-per-task", "blocking"))
+        for backend, workload in runs:
+            # All tasks wait at once: the number of workers is not bounded
+            summary = measure(backend, count, block_for, None, workload)
+            summaries.append(summary)
+            _print_row(summary)
+        if count > max_threads:
+            print(f"{'thread-per-task':<16} {count:>7} skipped (--max-threads)")
+    return summaries
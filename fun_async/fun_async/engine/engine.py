@@ -0,0 +1,237 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import concurrent.futures
+import functools
+import resource
+import threading
+import time
+
+from fun_async.coroutines.coroutines import AsyncRunner
+from fun_async.engine.tasks import Hooks, TaskResult, timed_call
+
+
+def percentile(values, fraction):
+    """
+    Return the value below which @fraction of the sorted @values lie (nearest
+    rank), or 0.0 if there are no values
+    """
+    if not values:
+        return 0.0
+    rank = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[rank]
+
+
+def peak_memory():
+    """
+    Peak resident set size of this process, and of its largest (waited for)
+    child process, in KiB
+    """
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+class ThreadPoolBackend:
+    """
+    Run the tasks on a bounded pool of threads
+
+    Args:
+        max_workers: number of threads
+    """
+    name = "threads"
+
+    def __init__(self, max_workers=32):
+        self._max_workers = max_workers
+
+    def _executor(self):
+        return concurrent.futures.ThreadPoolExecutor(self._max_workers)
+
+    def run(self, methods, hooks=None):
+        """
+        Run each of @methods, returns the TaskResult of each (in order).
+        @hooks (see Hooks) are called as the tasks are submitted and completed
+        """
+        hooks = hooks or Hooks()
+        results = [None] * len(methods)
+        with self._executor() as executor:
+            for index, method in enumerate(methods):
+                submitted = time.perf_counter()
+                hooks.task_submitted(index, submitted)
+                future = executor.submit(timed_call, method)
+                future.add_done_callback(functools.partial(
+                    _complete, results, hooks, index, submitted))
+        return results
+
+
+class ProcessPoolBackend(ThreadPoolBackend):
+    """
+    Run the tasks on a pool of processes, the methods (and their results) must
+    be picklable
+
+    Args:
+        max_workers: number of processes
+    """
+    name = "processes"
+
+    def _executor(self):
+        return concurrent.futures.ProcessPoolExecutor(self._max_workers)
+
+
+def _complete(results, hooks, index, submitted, future):
+    """
+    Done callback of a future, records the TaskResult of the task at @index
+    """
+    finished = time.perf_counter()
+    error = future.exception()
+    if error is None:
+        value, error, started, worker = future.result()
+    else:
+        # The task could not be run (e.g. its worker process died)
+        value, started, worker = None, None, None
+    results[index] = TaskResult(
+        index, value, error, submitted, finished, started, worker)
+    hooks.task_completed(results[index])
+
+
+class ThreadPerTaskBackend:
+    """
+    Start a thread for each task, like ThreadingDemo: the number of threads
+    grows with the number of tasks
+
+    Args:
+        max_workers: unused, the number of threads is not bounded
+    """
+    name = "thread-per-task"
+
+    def __init__(self, max_workers=None):
+        del max_workers
+
+    @staticmethod
+    def run(methods, hooks=None):
+        """
+        Run each of @methods, returns the TaskResult of each (in order).
+        @hooks (see Hooks) are called as the tasks are submitted and completed
+        """
+        hooks = hooks or Hooks()
+        results = [None] * len(methods)
+        threads = []
+        for index, method in enumerate(methods):
+            submitted = time.perf_counter()
+            hooks.task_submitted(index, submitted)
+            thread = threading.Thread(
+                target=_run_thread,
+                args=(results, hooks, index, method, submitted))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return results
+
+
+def _run_thread(results, hooks, index, method, submitted):
+    """
+    Target of the threads of ThreadPerTaskBackend
+    """
+    #pylint:disable=too-many-arguments
+    value, error, started, worker = timed_call(method)
+    results[index] = TaskResult(
+        index, value, error, submitted, time.perf_counter(), started, worker)
+    hooks.task_completed(results[index])
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (
+        ThreadPoolBackend, ProcessPoolBackend, AsyncRunner, ThreadPerTaskBackend)
+}
+
+
+class RunReport:
+    """
+    The results of running a list of methods with a backend, and how long it
+    took
+
+    Args:
+        backend: name of the backend
+        results: TaskResult of each method
+        wall: seconds taken to run all methods
+        memory: peak memory (see peak_memory) once all methods have run
+    """
+
+    def __init__(self, backend, results, wall, memory):
+        self.backend = backend
+        self.results = results
+        self.wall = wall
+        self.memory = memory
+
+    @property
+    def errors(self):
+        """
+        The TaskResult of each method that raised
+        """
+        return [result for result in self.results if result.error is not None]
+
+    def summary(self):
+        """
+        Summarise the run as a dict: the number of tasks and errors, the
+        throughput (tasks per second), the latency percentiles (seconds) and the
+        peak memory (KiB) of the process (and of the largest worker process)
+        """
+        latencies = sorted(result.latency for result in self.results)
+        return {
+            "backend": self.backend,
+            "tasks": len(self.results),
+            "errors": len(self.errors),
+            "wall": self.wall,
+            "throughput": len(self.results) / self.wall if self.wall else 0.0,
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+            "peak_rss": self.memory[0],
+            "worker_rss": self.memory[1],
+        }
+
+    def __str__(self):
+        summary = self.summary()
+        return (
+            f"{summary['backend']}: {summary['tasks']} tasks "
+            f"({summary['errors']} errors) in {summary['wall']:.3f}s, "
+            f"{summary['throughput']:.0f} tasks/s, latency "
+            f"p50 {summary['p50'] * 1e3:.1f}ms p90 {summary['p90'] * 1e3:.1f}ms "
+            f"p99 {summary['p99'] * 1e3:.1f}ms max {summary['max'] * 1e3:.1f}ms, "
+            f"peak RSS {summary['peak_rss']} KiB "
+            f"(workers {summary['worker_rss']} KiB)")
+
+
+class Engine:
+    """
+    Run tasks with an interchangeable backend, collecting their results and
+    errors, and measuring the run
+
+    Args:
+        backend: a backend instance, e.g. ThreadPoolBackend(max_workers=8)
+        hooks: instrumentation hooks called during each run (see Hooks), e.g.
+            a fun_async.instrumentation Recorder
+    """
+    #pylint:disable=too-few-public-methods
+
+    def __init__(self, backend, hooks=None):
+        self._backend = backend
+        self._hooks = hooks or Hooks()
+
+    def run(self, methods):
+        """
+        Run each of @methods (callables taking no arguments), returns a
+        RunReport. A method that raises does not stop the others, its exception
+        is collected in its TaskResult
+        """
+        start = time.perf_counter()
+        self._hooks.run_started(start)
+        results = self._backend.run(methods, self._hooks)
+        end = time.perf_counter()
+        self._hooks.run_finished(end)
+        wall = end - start
+        return RunReport(self._backend.name, results, wall, peak_memory())
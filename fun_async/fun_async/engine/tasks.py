@@ -0,0 +1,122 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import asyncio
+import os
+import threading
+import time
+
+
+def is_coroutine(method):
+    """
+    Whether calling @method (a function, or a callable object) returns a
+    coroutine
+    """
+    return asyncio.iscoroutinefunction(method) \
+        or asyncio.iscoroutinefunction(getattr(method, "__call__", None))
+
+
+def call(method):
+    """
+    Call @method, if it is a coroutine function its coroutine is run to
+    completion in a new event loop, so that backends using threads or
+    processes can run coroutine functions too
+    """
+    if not is_coroutine(method):
+        return method()
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(method())
+    finally:
+        loop.close()
+
+
+def timed_call(method):
+    """
+    Call @method (see call) in the worker running its task, returns the value
+    it returned, the exception it raised, when it started and the worker (the
+    process and thread ids). It never raises, so the timing of a failed task
+    is kept
+    """
+    started = time.perf_counter()
+    worker = (os.getpid(), threading.get_native_id())
+    try:
+        return call(method), None, started, worker
+    except Exception as error:  # pylint:disable=broad-except
+        return None, error, started, worker
+
+
+class Hooks:
+    """
+    Instrumentation hooks called by the backends of an Engine, in the process
+    running the backend (see fun_async.instrumentation). These hooks do
+    nothing, subclasses override them; task_submitted and task_completed may
+    be called from any thread
+    """
+
+    def run_started(self, when):
+        """
+        The run started, at @when (perf_counter)
+        """
+
+    def task_submitted(self, index, when):
+        """
+        The task at @index was submitted to the backend at @when
+        """
+
+    def task_completed(self, result):
+        """
+        A task completed, with its TaskResult @result
+        """
+
+    def run_finished(self, when):
+        """
+        All tasks have completed, at @when
+        """
+
+
+class TaskResult:
+    """
+    The outcome of a task run by an Engine
+
+    Args:
+        index: position of the task's method in the list of methods
+        value: value returned by the method (None if it raised)
+        error: exception raised by the method (None if it returned)
+        submitted: when the task was submitted to the backend (perf_counter)
+        finished: when the backend completed the task (perf_counter)
+        started: when the method started, in its worker (None if unknown)
+        worker: the (process id, thread id) which ran the method, or None if
+            the worker ran tasks concurrently (e.g. the event loop's thread)
+    """
+    #pylint:disable=too-few-public-methods
+    __slots__ = (
+        "index", "value", "error", "submitted", "finished", "started", "worker")
+
+    def __init__(self, index, value, error, submitted, finished, started=None,
+                 worker=None):
+        #pylint:disable=too-many-arguments
+        self.index = index
+        self.value = value
+        self.error = error
+        self.submitted = submitted
+        self.finished = finished
+        self.started = started
+        self.worker = worker
+
+    @property
+    def latency(self):
+        """
+        Seconds from the submission of the task to its completion, including
+        the time it waited for a worker
+        """
+        return self.finished - self.submitted
+
+    @property
+    def queue_wait(self):
+        """
+        Seconds from the submission of the task to its start in a worker (None
+        if it never started)
+        """
+        return None if self.started is None else self.started - self.submitted
@@ -0,0 +1,207 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import array
+import json
+import os
+import threading
+import time
+
+from fun_async.engine.engine import percentile
+from fun_async.engine.tasks import Hooks
+
+# Worker of the tasks which shared a thread with others (e.g. asyncio tasks)
+CONCURRENT = -1
+
+
+class Recorder(Hooks):
+    """
+    Instrumentation hooks recording how the tasks of a run were scheduled, to
+    be passed to an Engine. For each task (in completion order) the recorder
+    keeps when it was submitted, started and completed, and which worker ran
+    it; while the run lasts, it samples the number of live threads and of
+    tasks in flight (submitted but not completed). Everything is kept in
+    compact arrays (array.array), rather than an object per task or sample
+
+    Args:
+        interval: seconds between samples (None: do not sample)
+    """
+    #pylint:disable=too-many-instance-attributes
+
+    def __init__(self, interval=0.001):
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._workers = {}
+        self._sampler = None
+        self._stop = threading.Event()
+        self.start = 0.0
+        self.end = 0.0
+        # Per task, in completion order:
+        self.index = array.array("q")
+        self.submitted = array.array("d")
+        self.started = array.array("d")
+        self.finished = array.array("d")
+        self.worker = array.array("l")
+        # Per sample:
+        self.sample_time = array.array("d")
+        self.sample_threads = array.array("l")
+        self.sample_in_flight = array.array("l")
+
+    @property
+    def workers(self):
+        """
+        The (process id, thread id) of each worker, by the worker numbers of
+        the tasks
+        """
+        return list(self._workers)
+
+    def run_started(self, when):
+        self.start = when
+        if self._interval is not None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def task_submitted(self, index, when):
+        with self._lock:
+            self._in_flight += 1
+
+    def task_completed(self, result):
+        with self._lock:
+            self._in_flight -= 1
+            self.index.append(result.index)
+            self.submitted.append(result.submitted)
+            # A task which never started (e.g. it was cancelled) took no time
+            self.started.append(
+                result.finished if result.started is None else result.started)
+            self.finished.append(result.finished)
+            if result.worker is None:
+                self.worker.append(CONCURRENT)
+            else:
+                self.worker.append(
+                    self._workers.setdefault(result.worker, len(self._workers)))
+
+    def run_finished(self, when):
+        self.end = when
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                self.sample_time.append(time.perf_counter())
+                # Not counting the sampling thread itself
+                self.sample_threads.append(threading.active_count() - 1)
+                self.sample_in_flight.append(self._in_flight)
+            if self._stop.wait(self._interval):
+                return
+
+    def summary(self):
+        """
+        Summarise the scheduling of the tasks as a dict: the percentiles of
+        their queue wait (from submission to start), start delay (from the
+        start of the run to the start of the task) and run time (from the
+        start of the task to its completion) in seconds, the number of workers
+        and the peak numbers of live threads and of tasks in flight
+        """
+        with self._lock:
+            queue_waits = sorted(
+                started - submitted
+                for submitted, started in zip(self.submitted, self.started))
+            start_delays = sorted(started - self.start for started in self.started)
+            run_times = sorted(
+                finished - started
+                for started, finished in zip(self.started, self.finished))
+            summary = {
+                "tasks": len(self.index),
+                "workers": len(self._workers),
+                "peak_threads": max(self.sample_threads, default=0),
+                "peak_in_flight": max(self.sample_in_flight, default=0),
+            }
+        for name, values in (
+                ("queue_wait", queue_waits), ("start_delay", start_delays),
+                ("run_time", run_times)):
+            for label, fraction in (("p50", 0.5), ("p99", 0.99), ("max", 1.0)):
+                summary[f"{name}_{label}"] = percentile(values, fraction)
+        return summary
+
+    def __str__(self):
+        summary = self.summary()
+        workers = f"{summary['workers']} workers" if summary["workers"] \
+            else "one thread"
+        return (
+            f"{summary['tasks']} tasks on {workers}, peak "
+            f"{summary['peak_threads']} threads and {summary['peak_in_flight']} "
+            "tasks in flight\n" + "\n".join(
+                f"  {title}: p50 {summary[name + '_p50'] * 1e3:.1f}ms "
+                f"p99 {summary[name + '_p99'] * 1e3:.1f}ms "
+                f"max {summary[name + '_max'] * 1e3:.1f}ms"
+                for title, name in (
+                    ("queue wait", "queue_wait"), ("start delay", "start_delay"),
+                    ("run time", "run_time"))))
+
+    def chrome_trace(self):
+        """
+        Return the run as a Chrome trace (the Trace Event Format, which
+        chrome://tracing and https://ui.perfetto.dev open): a slice for each
+        task on the thread of its worker (asynchronous slices for the tasks of
+        a concurrent worker), an asynchronous slice for the wait of each task
+        in the queue, and counters of the live threads and tasks in flight
+        """
+        pid = os.getpid()
+
+        def timestamp(when):
+            return round((when - self.start) * 1e6, 3)
+
+        with self._lock:
+            workers = list(self._workers)
+            events = [
+                {"name": "process_name", "ph": "M", "pid": pid,
+                 "args": {"name": "runner"}},
+            ]
+            for number, (worker_pid, worker_tid) in enumerate(workers):
+                events.append({
+                    "name": "thread_name", "ph": "M", "pid": worker_pid,
+                    "tid": worker_tid, "args": {"name": f"worker {number}"}})
+            for order, (index, submitted, started, finished, worker) in enumerate(zip(
+                    self.index, self.submitted, self.started, self.finished,
+                    self.worker)):
+                name = f"task {index}"
+                args = {"index": index, "order": order}
+                events.append({
+                    "name": name, "cat": "queued", "ph": "b", "id": index,
+                    "pid": pid, "ts": timestamp(submitted)})
+                events.append({
+                    "name": name, "cat": "queued", "ph": "e", "id": index,
+                    "pid": pid, "ts": timestamp(started)})
+                if worker == CONCURRENT:
+                    events.append({
+                        "name": name, "cat": "running", "ph": "b", "id": index,
+                        "pid": pid, "ts": timestamp(started), "args": args})
+                    events.append({
+                        "name": name, "cat": "running", "ph": "e", "id": index,
+                        "pid": pid, "ts": timestamp(finished)})
+                else:
+                    worker_pid, worker_tid = workers[worker]
+                    events.append({
+                        "name": name, "cat": "running", "ph": "X",
+                        "pid": worker_pid, "tid": worker_tid,
+                        "ts": timestamp(started),
+                        "dur": round((finished - started) * 1e6, 3), "args": args})
+            for when, threads, in_flight in zip(
+                    self.sample_time, self.sample_threads, self.sample_in_flight):
+                events.append({
+                    "name": "live", "ph": "C", "pid": pid, "ts": timestamp(when),
+                    "args": {"threads": threads, "tasks in flight": in_flight}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """
+        Write the Chrome trace of the run (see chrome_trace) to @path
+        """
+        with open(path, "w") as stream:
+            json.dump(self.chrome_trace(), stream)
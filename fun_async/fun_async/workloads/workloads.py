@@ -0,0 +1,57 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import asyncio
+import time
+
+
+class BlockingMethod:
+    """
+    A method that blocks for some time
+
+    Args:
+        uid: identifies the method in its output
+        block_for: seconds to block for (default: the class' block_for)
+        verbose: print when the method starts and finishes
+    """
+    block_for = 5
+
+    def __init__(self, uid, block_for=None, verbose=True):
+        self._uid = uid
+        self._block_for = type(self).block_for if block_for is None else block_for
+        self._verbose = verbose
+
+    def __call__(self):
+        if self._verbose:
+            print(f"  {self._uid}: Started")
+        time.sleep(self._block_for)
+        if self._verbose:
+            print(f"  {self._uid}: Finished")
+        return self._uid
+
+    @classmethod
+    def create_methods(cls, num, block_for=None, verbose=True):
+        """
+        Create a list of @num instances of the class
+        """
+        blocking_methods = []
+        for uid in range(num):
+            blocking_methods.append(cls(uid, block_for, verbose))
+        return blocking_methods
+
+
+class AsyncBlockingMethod(BlockingMethod):
+    """
+    An awaitable counterpart of BlockingMethod, which waits on asyncio.sleep
+    rather than blocking its thread, so a single thread can wait on many of
+    them at once
+    """
+
+    async def __call__(self):
+        if self._verbose:
+            print(f"  {self._uid}: Started")
+        await asyncio.sleep(self._block_for)
+        if self._verbose:
+            print(f"  {self._uid}: Finished")
+        return self._uid
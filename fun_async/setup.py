@@ -7,6 +7,7 @@ setuptools.setup(
     version="0.0.0",
     description="Playing around with asyncio",
     packages=setuptools.find_namespace_packages(include=['fun_async', 'fun_async.*']),
-    python_requires=">=3.6",
+    python_requires=">=3.8",
     install_requires=[],
+    extras_require={"cpu": ["numpy"]},
 )
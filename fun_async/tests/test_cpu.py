@@ -0,0 +1,24 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import numpy
+import pytest
+
+from fun_async.cpu.cpu import CpuRunner
+
+
+@pytest.mark.parametrize("shared", [True, False])
+@pytest.mark.parametrize("backend", CpuRunner.BACKENDS)
+def test_runs_kernels(backend, shared):
+    values = numpy.arange(1.0, 11.0)
+    expected = numpy.sqrt(values) * numpy.sin(values) + numpy.log1p(values)
+    for kernel in ("python", "numpy"):
+        result, _ = CpuRunner(backend, 2, shared).run(kernel, values)
+        assert numpy.allclose(result, expected)
+
+
+@pytest.mark.parametrize("backend", CpuRunner.BACKENDS)
+def test_empty_input(backend):
+    result, _ = CpuRunner(backend, 2).run("numpy", numpy.empty(0))
+    assert result.shape == (0,)
@@ -0,0 +1,120 @@
+#pylint:disable=missing-docstring
+#pylint:enable=missing-docstring
+
+
+import asyncio
+import functools
+import time
+
+import pytest
+
+from fun_async.coroutines.coroutines import AsyncRunner
+from fun_async.engine.engine import BACKENDS, Engine, percentile
+from fun_async.instrumentation.instrumentation import Recorder
+from fun_async.workloads.workloads import AsyncBlockingMethod
+
+
+def _sleep(index, block_for):
+    time.sleep(block_for)
+    return index
+
+
+def _fail(index):
+    raise ValueError(index)
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.99) == 4
+    assert percentile([1, 2, 3, 4], 1.0) == 4
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_results_are_ordered_by_index(backend):
+    # The first tasks block the longest, so they complete last:
+    methods = [functools.partial(_sleep, index, 0.01 * (5 - index)) for index in range(5)]
+    report = Engine(BACKENDS[backend](4)).run(methods)
+    assert [result.index for result in report.results] == list(range(5))
+    assert [result.value for result in report.results] == list(range(5))
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_errors_are_collected(backend):
+    methods = [
+        functools.partial(_sleep, 0, 0.001), functools.partial(_fail, 1),
+        functools.partial(_sleep, 2, 0.001)]
+    report = Engine(BACKENDS[backend](2)).run(methods)
+    assert [result.index for result in report.errors] == [1]
+    assert isinstance(report.errors[0].error, ValueError)
+    assert [result.value for result in report.results] == [0, None, 2]
+
+
+def test_limit_is_respected():
+    running = [0, 0]
+
+    async def method():
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.005)
+        running[0] -= 1
+
+    recorder = Recorder(interval=0.0005)
+    report = Engine(AsyncRunner(limit=3), recorder).run([method] * 20)
+    assert not report.errors
+    assert running[1] == 3
+    assert 1 <= recorder.summary()["peak_in_flight"] <= 3
+
+
+def test_timeouts():
+    runner = AsyncRunner(timeout=0.01)
+    results = runner.run(AsyncBlockingMethod.create_methods(3, 1.0, verbose=False))
+    assert [type(result.error) for result in results] == [asyncio.TimeoutError] * 3
+
+
+def test_cancel_stops_new_tasks():
+    runner = AsyncRunner(limit=1)
+
+    async def method():
+        await asyncio.sleep(0)
+
+    async def cancel():
+        # As Ctrl-C does, from the event loop rather than a task:
+        asyncio.get_running_loop().call_soon(runner.cancel)
+        await asyncio.sleep(1)
+
+    results = runner.run([method, method, cancel, method, method])
+    assert [result.index for result in results] == [0, 1, 2]
+    assert [result.error for result in results[:2]] == [None, None]
+    assert isinstance(results[2].error, asyncio.CancelledError)
+
+
+def test_cancel_before_tasks_start():
+    runner = AsyncRunner()
+
+    async def cancel():
+        runner.cancel()
+
+    async def method():
+        await asyncio.sleep(1)
+
+    # The tasks are all created, the first cancels the others before they
+    # start:
+    results = runner.run([cancel, method, method])
+    assert [result.index for result in results] == [0, 1, 2]
+    assert results[0].error is None and results[0].started is not None
+    for result in results[1:]:
+        assert isinstance(result.error, asyncio.CancelledError)
+        assert result.started is None
+
+
+def test_chrome_trace():
+    recorder = Recorder(interval=None)
+    Engine(BACKENDS["threads"](2), recorder).run(
+        [functools.partial(_sleep, index, 0.001) for index in range(3)])
+    events = recorder.chrome_trace()["traceEvents"]
+    slices = [event for event in events if event["ph"] == "X"]
+    assert sorted(event["args"]["index"] for event in slices) == [0, 1, 2]
+    assert all(event["dur"] >= 0 and event["ts"] >= 0 for event in slices)
+    queued = [event for event in events if event.get("cat") == "queued"]
+    assert sorted(event["ph"] for event in queued) == ["b"] * 3 + ["e"] * 3